@@ -0,0 +1,211 @@
+"""
+本地CMS实体存储替身（客户端插件）
+
+替换 Cms20240330Client，直接在本地回答分析模块用到的几种SPL查询，返回与线上相同的 data 行布局，
+用于在没有 workspace 的情况下压测CMS的扇出（成百上千个deployment/ECS节点）：
+
+    CMS_STANDIN=synthetic python main.py ...              # 随机生成的时序
+    CMS_STANDIN=series.jsonl python main.py ...           # 录制/构造的时序，缺失的部分用随机时序补齐
+    CMS_STANDIN_LATENCY_MS=200                            # 模拟每次查询的耗时
+
+支持的查询：
+- .entity_set with(domain, name, query=`a='x' and b='y' or ...`) | entity-call get_metric(..., 'metric', 'range', '1m')
+  每个匹配的实体一行: [__labels__, __name__, __ts__, __value__]
+- .entity_set ... | entity-call get_golden_metrics('range', '1m')
+  每个实体一行: [__ts__, __entity_id__, cpu_usage, memory_usage, network_receive_rate, network_transmit_rate]
+- .metricstore ... | prom-call promql_query_range('sum(irate(m{label=~"a|b"}[1m])) [by (label)]', '60s')
+  不带 by 时一行；带 by 时每个取值一行；多个指标用 or 连接时按指标分别成行
+
+时序文件为JSONL，每行一条时序：
+    {"labels": {"deployment": "cart"}, "metric": "deployment_cpu_usage_vs_requests", "ts": [秒...], "values": [...]}
+"""
+import json
+import os
+import re
+import time
+import zlib
+
+import numpy as np
+
+CMS_STANDIN = os.getenv("CMS_STANDIN", "")
+CMS_STANDIN_LATENCY_MS = float(os.getenv("CMS_STANDIN_LATENCY_MS", "0"))
+
+METRIC_HEADER = ["__labels__", "__name__", "__ts__", "__value__"]
+GOLDEN_METRICS = ["cpu_usage", "memory_usage", "network_receive_rate", "network_transmit_rate"]
+GOLDEN_HEADER = ["__ts__", "__entity_id__"] + GOLDEN_METRICS
+
+_ENTITY_SET_RE = re.compile(r"\.entity_set\s+with\((?P<args>.*?)\)\s*\|", re.S)
+_ENTITY_QUERY_RE = re.compile(r"query\s*=\s*`(?P<query>.*?)`", re.S)
+_ENTITY_CALL_RE = re.compile(r"entity-call\s+(?P<func>\w+)\((?P<args>.*)\)", re.S)
+_PROM_CALL_RE = re.compile(r"prom-call\s+promql_query_range\(\s*'(?P<expr>.*)'\s*,\s*'(?P<step>\w+)'\s*\)", re.S)
+_EQUALITY_RE = re.compile(r"(\w+)\s*=\s*''?([^']*)''?")
+_PROM_SELECTOR_RE = re.compile(r"(?P<metric>[A-Za-z_:][\w:]*)\{(?P<matchers>[^}]*)\}")
+_PROM_MATCHER_RE = re.compile(r'(\w+)\s*(=~|!~|!=|=)\s*"([^"]*)"')
+_PROM_BY_RE = re.compile(r"\bby\s*\(\s*(\w+)\s*\)")
+
+
+class StandinQueryError(Exception):
+    """替身不支持的查询"""
+
+
+def _step_seconds(step):
+    match = re.fullmatch(r"(\d+)([smh]?)", step.strip())
+    if not match:
+        return 60
+    return int(match.group(1)) * {"": 1, "s": 1, "m": 60, "h": 3600}[match.group(2)]
+
+
+def _quoted_args(text):
+    return re.findall(r"'([^']*)'", text)
+
+
+def parse_entity_filter(query):
+    """
+    把实体过滤条件解析为实体列表
+
+    `deployment='a' or deployment='b'` → [{"deployment": "a"}, {"deployment": "b"}]
+    """
+    entities = []
+    for clause in re.split(r"\s+or\s+", query.strip(), flags=re.I):
+        labels = dict(_EQUALITY_RE.findall(clause))
+        if labels:
+            entities.append(labels)
+    return entities
+
+
+class SeriesSource:
+    """
+    时序数据来源：优先使用时序文件中的数据，找不到时按 (标签, 指标) 生成确定性的随机时序
+
+    同一条时序在重叠的时间窗上取值一致，便于验证缓存和分段查询。
+    """
+
+    def __init__(self, path=None):
+        self.series = []
+        if path:
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    item = json.loads(line)
+                    ts = np.asarray(item["ts"], dtype=np.int64)
+                    # 时间戳统一为秒
+                    if len(ts) and ts.max() > 1e12:
+                        ts = ts // 1_000_000_000
+                    self.series.append((item.get("labels", {}), item["metric"], ts,
+                                        np.asarray(item["values"], dtype=float)))
+
+    def get(self, labels, metric, from_time, to_time, step=60):
+        """返回 (纳秒时间戳列表, 取值列表)"""
+        for series_labels, series_metric, ts, values in self.series:
+            if series_metric == metric and all(labels.get(k) == v for k, v in series_labels.items()):
+                mask = (ts >= from_time) & (ts <= to_time)
+                return (ts[mask] * 1_000_000_000).tolist(), values[mask].tolist()
+        return self.synthetic(labels, metric, from_time, to_time, step)
+
+    @staticmethod
+    def synthetic(labels, metric, from_time, to_time, step=60):
+        start = int(from_time) - int(from_time) % step
+        ts = np.arange(start, int(to_time) + 1, step, dtype=np.int64)
+        seed = zlib.crc32(json.dumps([labels, metric], sort_keys=True).encode("utf-8"))
+        if "usage" in metric or "_vs_" in metric:
+            base = 0.2 + (seed % 40) / 100
+        elif "gc" in metric:
+            base = 2.0
+        else:
+            base = 5.0 + seed % 10
+        phase = (seed % 628) / 100
+        noise = ((ts // step * 2654435761 + seed) % 1000) / 1000 - 0.5
+        values = base * (1 + 0.1 * np.sin(ts / 600 + phase) + 0.1 * noise)
+        return (ts * 1_000_000_000).tolist(), np.round(values, 6).tolist()
+
+
+def _series_row(labels, name, ts, values):
+    return [json.dumps(labels, ensure_ascii=False), name, json.dumps(ts), json.dumps(values)]
+
+
+class CmsStandinClient:
+    """
+    与 Cms20240330Client.get_entity_store_data_with_options 接口一致的本地实现
+    """
+
+    def __init__(self, source=None, latency_ms=CMS_STANDIN_LATENCY_MS):
+        self.source = source or SeriesSource()
+        self.latency_ms = latency_ms
+        self.queries = 0
+
+    def execute(self, query, from_time, to_time):
+        """回答一条SPL查询，返回 (header, data)"""
+        prom = _PROM_CALL_RE.search(query)
+        if prom:
+            return METRIC_HEADER, self._promql(prom.group("expr"), _step_seconds(prom.group("step")),
+                                               from_time, to_time)
+
+        entity_set = _ENTITY_SET_RE.search(query)
+        call = _ENTITY_CALL_RE.search(query)
+        if not entity_set or not call:
+            raise StandinQueryError(f"不支持的查询: {query[:100]}")
+        filter_match = _ENTITY_QUERY_RE.search(entity_set.group("args"))
+        entities = parse_entity_filter(filter_match.group("query")) if filter_match else []
+        args = _quoted_args(call.group("args"))
+        step = _step_seconds(args[-1]) if args else 60
+
+        if call.group("func") == "get_metric":
+            metric = args[2]
+            data = []
+            for labels in entities:
+                ts, values = self.source.get(labels, metric, from_time, to_time, step)
+                data.append(_series_row(labels, metric, ts, values))
+            return METRIC_HEADER, data
+        if call.group("func") == "get_golden_metrics":
+            data = []
+            for labels in entities:
+                columns = [self.source.get(labels, metric, from_time, to_time, step) for metric in GOLDEN_METRICS]
+                entity_id = labels.get("name") or next(iter(labels.values()), "")
+                data.append([json.dumps(columns[0][0]), entity_id] + [json.dumps(values) for _, values in columns])
+            return GOLDEN_HEADER, data
+        raise StandinQueryError(f"不支持的 entity-call: {call.group('func')}")
+
+    def _promql(self, expr, step, from_time, to_time):
+        by = _PROM_BY_RE.search(expr)
+        data = []
+        for selector in _PROM_SELECTOR_RE.finditer(expr):
+            metric = selector.group("metric")
+            matchers = {label: value for label, op, value in _PROM_MATCHER_RE.findall(selector.group("matchers"))
+                        if op in ("=", "=~")}
+            if by:
+                label = by.group(1)
+                for value in matchers.get(label, "").split("|"):
+                    labels = {label: value}
+                    ts, values = self.source.get(labels, metric, from_time, to_time, step)
+                    data.append(_series_row(labels, metric, ts, values))
+            else:
+                ts, values = self.source.get(matchers, metric, from_time, to_time, step)
+                data.append(_series_row({}, metric, ts, values))
+        if not data:
+            raise StandinQueryError(f"不支持的PromQL: {expr[:100]}")
+        return data
+
+    def get_entity_store_data_with_options(self, workspace, request, headers, runtime):
+        from alibabacloud_cms20240330 import models as cms_20240330_models
+
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        self.queries += 1
+        try:
+            header, data = self.execute(request.query, int(request.from_), int(request.to))
+        except StandinQueryError as e:
+            from Tea.exceptions import TeaException
+
+            raise TeaException({"code": "InvalidParameter", "message": str(e)})
+        body = cms_20240330_models.GetEntityStoreDataResponseBody(
+            header=header, data=data, request_id=f"standin-{time.time_ns()}")
+        return cms_20240330_models.GetEntityStoreDataResponse(status_code=200, body=body)
+
+
+def create_client(spec=CMS_STANDIN):
+    """根据 CMS_STANDIN 创建替身客户端：synthetic 表示全部随机生成，否则为时序文件路径"""
+    source = SeriesSource(None if spec == "synthetic" else spec)
+    print(f"🧪 使用本地CMS替身: {spec}")
+    return CmsStandinClient(source)
@@ -0,0 +1,87 @@
+"""
+单题范围内的查询合并（single-flight）
+
+同一道题的分析过程中，相同的SLS/CMS查询会被不同阶段重复发起（例如兜底逻辑再次分析同一个服务的CPU、
+内存和时延）。在 problem_scope() 内：
+
+- 多个线程同时发起的相同查询只有一个真正执行，其余线程等待并共享它的结果
+- 已经完成的查询在本题结束前直接复用，不再经过缓存和网络
+- 失败的查询（结果为None或抛出异常）不保留，之后的相同查询会重新执行
+
+作用域通过 contextvars 传递，提交到共享查询线程池（见 pool）的任务继承提交者所在的题目；
+不在任何题目作用域内的查询不合并。
+"""
+import contextvars
+import copy
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+
+class QueryScope:
+    """一道题内已发起查询的登记表：查询键 → Future"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self.executed = 0
+        self.shared = 0
+
+    def run(self, key, loader):
+        with self._lock:
+            future = self._entries.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._entries[key] = future
+                self.executed += 1
+            else:
+                self.shared += 1
+        if not owner:
+            # 结果对象在多个调用方之间共享，复制一份避免互相修改
+            return copy.deepcopy(future.result())
+
+        try:
+            result = loader()
+        except BaseException as e:
+            self._forget(key)
+            future.set_exception(e)
+            raise
+        if result is None:
+            self._forget(key)
+        future.set_result(result)
+        return result
+
+    def _forget(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+_scope = contextvars.ContextVar("query_scope", default=None)
+
+
+@contextmanager
+def problem_scope():
+    """在一道题的分析过程外层使用，范围内的相同查询被合并"""
+    scope = QueryScope()
+    token = _scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _scope.reset(token)
+        if scope.shared:
+            print(f"🔁 本题 {scope.executed} 条查询，合并了 {scope.shared} 次重复查询")
+
+
+def coalesced(key, loader):
+    """
+    在当前题目作用域内按 key 合并查询
+
+    Args:
+        key: 查询键（见 query_cache.make_key）
+        loader: 真正获取原始响应的函数，失败时返回None
+    """
+    scope = _scope.get()
+    if scope is None:
+        return loader()
+    return scope.run(key, loader)
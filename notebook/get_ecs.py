@@ -1,13 +1,12 @@
 import ast
-import json
-import os
 import sys
-import time
 from datetime import datetime, timedelta
 
 import numpy as np
-from aliyun.log import LogClient, GetLogsRequest
-from matplotlib import pyplot as plt
+
+from get_entity import get_entity_metric
+from problems import read_input_data
+from session import get_session
 
 
 sys.path.append('..')
@@ -17,163 +16,16 @@ PROJECT_NAME = "proj-xtrace-a46b97cfdc1332238f714864c014a1b-cn-qingdao"
 LOGSTORE_NAME = "logstore-tracing"
 REGION = "cn-qingdao"
 
-# Environment variables
-STS_ROLE_ARN = os.getenv('ALIBABA_CLOUD_ROLE_ARN', 'acs:ram::1672753017899339:role/tianchi-user-a')
-STS_SESSION_NAME = os.getenv('ALIBABA_CLOUD_ROLE_SESSION_NAME', 'my-sls-access')
-
-# CMS 指标配置
-CMS_WORKSPACE = "tianchi-workspace"
-CMS_ENDPOINT = os.getenv("CMS_ENDPOINT", "cms.cn-qingdao.aliyuncs.com")
-try:
-    from test_cms_query import TestCMSQuery
-
-    print("✅ TestCMSQuery imported successfully")
-except ImportError as e:
-    print(f"⚠️ Warning: Could not import TestCMSQuery: {e}")
-    print("💡 Please install required dependencies: pip install -r requirements.txt")
-    TestCMSQuery = None
-# 初始化CMS测试客户端，用于指标查询
-# 如果存在导入问题通过直接创建类修复(except)
-try:
-    if TestCMSQuery is not None:
-        cms_tester = TestCMSQuery()
-        cms_tester.setUp()
-        print(f"✅ 已通过导入的 TestCMSQuery 初始化CMS客户端")
-    else:
-        raise ImportError("TestCMSQuery is None")
-except:
-    print("⚠️  TestCMSQuery import failed, creating CMS client directly...")
-
-    import os
-    from alibabacloud_cms20240330.client import Client as Cms20240330Client
-    from alibabacloud_tea_openapi import models as open_api_models
-    from alibabacloud_cms20240330 import models as cms_20240330_models
-    from alibabacloud_tea_util import models as util_models
-
-
-    class DirectCMSClient:
-        def __init__(self):
-            self.access_key_id = os.getenv('ALIBABA_CLOUD_ACCESS_KEY_ID')
-            self.access_key_secret = os.getenv('ALIBABA_CLOUD_ACCESS_KEY_SECRET')
-            self.workspace = CMS_WORKSPACE
-            self.endpoint = CMS_ENDPOINT
-
-            if not self.access_key_id or not self.access_key_secret:
-                raise ValueError("请设置环境变量 ALIBABA_CLOUD_ACCESS_KEY_ID 和 ALIBABA_CLOUD_ACCESS_KEY_SECRET")
-
-            config = open_api_models.Config(
-                access_key_id=self.access_key_id,
-                access_key_secret=self.access_key_secret,
-            )
-            config.endpoint = self.endpoint
-            self.cms_client = Cms20240330Client(config)
-
-        def _execute_spl_query(self, query: str, from_time: int = None, to_time: int = None):
-            """执行SPL查询"""
-            if from_time is None:
-                from_time = int(time.time()) - 60 * 60 * 1
-            if to_time is None:
-                to_time = int(time.time())
-
-            try:
-                headers = cms_20240330_models.GetEntityStoreDataHeaders()
-                request = cms_20240330_models.GetEntityStoreDataRequest(
-                    query=query,
-                    from_=from_time,
-                    to=to_time
-                )
-                runtime = util_models.RuntimeOptions()
-                response = self.cms_client.get_entity_store_data_with_options(
-                    self.workspace, request, headers, runtime
-                )
-                return response.body
-            except Exception as e:
-                print(f"❌ CMS查询错误: {e}")
-                return None
-
-
-    cms_tester = DirectCMSClient()
-    print(f"✅ CMS client created directly")
-
-print(f"🔧 CMS客户端已初始化")
-print(f"🔧 workspace: {CMS_WORKSPACE}")
-print(f"🔧 Endpoint: {CMS_ENDPOINT}")
-
-
-def get_sts_credentials():
-    try:
-        from aliyunsdkcore.client import AcsClient
-        from aliyunsdksts.request.v20150401 import AssumeRoleRequest
-
-        MAIN_ACCOUNT_ACCESS_KEY_ID = os.getenv('ALIBABA_CLOUD_ACCESS_KEY_ID')
-        MAIN_ACCOUNT_ACCESS_KEY_SECRET = os.getenv('ALIBABA_CLOUD_ACCESS_KEY_SECRET')
-        ALIBABA_CLOUD_ROLE_ARN = os.getenv('ALIBABA_CLOUD_ROLE_ARN', 'acs:ram::1672753017899339:role/tianchi-user-a')
-        STS_SESSION_NAME = os.getenv('ALIBABA_CLOUD_ROLE_SESSION_NAME', 'my-sls-access')
-
-        if not MAIN_ACCOUNT_ACCESS_KEY_ID or not MAIN_ACCOUNT_ACCESS_KEY_SECRET:
-            return None, None, None
-
-        client = AcsClient(MAIN_ACCOUNT_ACCESS_KEY_ID, MAIN_ACCOUNT_ACCESS_KEY_SECRET, REGION)
-        request = AssumeRoleRequest.AssumeRoleRequest()
-        request.set_RoleArn(ALIBABA_CLOUD_ROLE_ARN)
-        request.set_RoleSessionName(STS_SESSION_NAME)
-        request.set_DurationSeconds(3600)
-
-        response = client.do_action_with_exception(request)
-        response_data = json.loads(response)
-        credentials = response_data['Credentials']
-        return (credentials['AccessKeyId'], credentials['AccessKeySecret'], credentials['SecurityToken'])
-    except Exception as e:
-        print(f"❌ 获取STS凭证失败: {e}")
-        return None, None, None
-
-
-temp_access_key_id, temp_access_key_secret, security_token = get_sts_credentials()
-if not temp_access_key_id:
-    print("❌ 无法获取STS临时凭证，分析终止")
-
-try:
-    from aliyun.log import LogClient
-
-    sls_endpoint = os.getenv("SLS_ENDPOINT", "cn-qingdao.log.aliyuncs.com")
-    log_client = LogClient(sls_endpoint, temp_access_key_id, temp_access_key_secret, security_token)
-except Exception as e:
-    print(f"❌ 创建SLS客户端失败: {e}")
-
-
-def read_input_data(input_file_path):
-    """
-    Read and parse input data from JSONL file
+# 共享的SLS/CMS客户端，凭证在第一次查询时获取并在后台自动刷新
+log_client = get_session().log_client
+cms_tester = get_session().cms_client
 
-    Args:
-        input_file_path: Path to the input JSONL file
-
-    Returns:
-        list: List of parsed JSON objects
-    """
-    data = []
-
-    try:
-        with open(input_file_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if line:  # Skip empty lines
-                    try:
-                        item = json.loads(line)
-                        data.append(item)
-                    except json.JSONDecodeError as e:
-                        print(f"⚠️ Failed to parse line: {line[:100]}... Error: {e}")
-                        continue
-
-        print(f"✅ Successfully read {len(data)} records from {input_file_path}")
-        return data
-
-    except FileNotFoundError:
-        print(f"❌ Input file not found: {input_file_path}")
-        return []
-    except Exception as e:
-        print(f"❌ Failed to read input file: {e}")
-        return []
+# ECS节点指标: 类型 → 指标名
+ECS_METRICS = {
+    "cpu": "aggregate_node_cpu_usage",
+    "memory": "aggregate_node_memory_usage",
+    "disk": "aggregate_node_disk_usage",
+}
 
 
 def detect_anomaly(normal_values, pre_values, post_values, threshold=1.5):
@@ -237,6 +89,10 @@ def split_time_period_data(timestamps, values, pre10_end, normal_end):
 def get_result(result):
     # 1. 从result中提取data列表（原始结果是字典，直接用键访问）
     # 注意：根据你的打印结果，result是字典，不是对象，所以用['data']而非.result.data
+    # 查询重试后仍失败时 result 为None
+    if result is None:
+        print(f"⚠️ 查询失败，没有返回结果")
+        return [], []
     data_list = result.data
     if not data_list:
         print(f"⚠️ 结果中 'data' 字段为空")
@@ -264,7 +120,22 @@ def get_result(result):
     return timestamps, cpu_values
 
 
-def analyze_ecs_cpu(normal_start, normal_end, Target_ECS, show):
+def get_ecs_metric(normal_start, normal_end, instances, metric):
+    """
+    一次 entity-set 查询选中所有候选ECS节点，取回同一指标的时序
+
+    Returns:
+        dict: {instance_id: (timestamps, values)}，可作为 analyze_ecs_cpu/memory/disk 的 series 参数
+    """
+    pre10_start = int((normal_start - timedelta(minutes=10)).timestamp())
+    post10_end = int((normal_end + timedelta(minutes=10)).timestamp())
+    return get_entity_metric(cms_tester, ('acs', 'acs.ecs.instance'),
+                             ('acs', 'acs.metric.prometheus_ecs_high_level_metric_node', metric), "instance_id",
+                             instances, pre10_start, post10_end)
+
+
+def analyze_ecs_cpu(normal_start, normal_end, Target_ECS, show, series=None):
+    """series 为批量查询(get_ecs_metric)取回的 (timestamps, values)，为空时单独查询"""
     # 1. 计算三个时段的时间戳（转为int类型，CMS查询要求）
     # 前10分钟：normal_start - 10min 到 normal_start
     pre10_start = int((normal_start - timedelta(minutes=10)).timestamp())
@@ -276,20 +147,23 @@ def analyze_ecs_cpu(normal_start, normal_end, Target_ECS, show):
     post10_start = int(normal_end.timestamp())
     post10_end = int((normal_end + timedelta(minutes=10)).timestamp())
 
-    # 2. CMS查询语句（查询deployment的CPU总使用率）
-    query_template = f"""
-        .entity_set with(domain='acs', name='acs.ecs.instance', query=`instance_id='{Target_ECS}'`)
-        | entity-call get_metric('acs', 'acs.metric.prometheus_ecs_high_level_metric_node', 'aggregate_node_cpu_usage', 'range', '1m')
-        """
-
-    # 3. 分别查询三个时段的数据
-    result = cms_tester._execute_spl_query(
-        query_template.strip(),
-        from_time=pre10_start,
-        to_time=post10_end
-    )
+    if series is not None:
+        timestamps, cpu = series
+    else:
+        # 2. CMS查询语句（查询ECS节点的cpu使用率）
+        query_template = f"""
+            .entity_set with(domain='acs', name='acs.ecs.instance', query=`instance_id='{Target_ECS}'`)
+            | entity-call get_metric('acs', 'acs.metric.prometheus_ecs_high_level_metric_node', 'aggregate_node_cpu_usage', 'range', '1m')
+            """
 
-    timestamps, cpu = get_result(result)
+        # 3. 分别查询三个时段的数据
+        result = cms_tester._execute_spl_query(
+            query_template.strip(),
+            from_time=pre10_start,
+            to_time=post10_end
+        )
+
+        timestamps, cpu = get_result(result)
 
 
     # 4. 分割三个时段的数据
@@ -320,6 +194,8 @@ def analyze_ecs_cpu(normal_start, normal_end, Target_ECS, show):
         print(f"🟢 异常检测: 检测时段cpu处于正常范围")
 
     if show:
+        from matplotlib import pyplot as plt
+
         plt.figure(figsize=(12, 6))
 
         plt.plot(timestamps, cpu, marker='o', linestyle='-', color='b')
@@ -338,7 +214,8 @@ def analyze_ecs_cpu(normal_start, normal_end, Target_ECS, show):
 
     return is_anomaly, max_cpu
 
-def analyze_ecs_memory(normal_start, normal_end, Target_ECS, show):
+def analyze_ecs_memory(normal_start, normal_end, Target_ECS, show, series=None):
+    """series 为批量查询(get_ecs_metric)取回的 (timestamps, values)，为空时单独查询"""
     # 1. 计算三个时段的时间戳（转为int类型，CMS查询要求）
     # 前10分钟：normal_start - 10min 到 normal_start
     pre10_start = int((normal_start - timedelta(minutes=10)).timestamp())
@@ -350,20 +227,23 @@ def analyze_ecs_memory(normal_start, normal_end, Target_ECS, show):
     post10_start = int(normal_end.timestamp())
     post10_end = int((normal_end + timedelta(minutes=10)).timestamp())
 
-    # 2. CMS查询语句（查询deployment的CPU总使用率）
-    query_template = f"""
-        .entity_set with(domain='acs', name='acs.ecs.instance', query=`instance_id='{Target_ECS}'`)
-        | entity-call get_metric('acs', 'acs.metric.prometheus_ecs_high_level_metric_node', 'aggregate_node_memory_usage', 'range', '1m')
-        """
-
-    # 3. 分别查询三个时段的数据
-    result = cms_tester._execute_spl_query(
-        query_template.strip(),
-        from_time=pre10_start,
-        to_time=post10_end
-    )
+    if series is not None:
+        timestamps, memory = series
+    else:
+        # 2. CMS查询语句（查询ECS节点的memory使用率）
+        query_template = f"""
+            .entity_set with(domain='acs', name='acs.ecs.instance', query=`instance_id='{Target_ECS}'`)
+            | entity-call get_metric('acs', 'acs.metric.prometheus_ecs_high_level_metric_node', 'aggregate_node_memory_usage', 'range', '1m')
+            """
+
+        # 3. 分别查询三个时段的数据
+        result = cms_tester._execute_spl_query(
+            query_template.strip(),
+            from_time=pre10_start,
+            to_time=post10_end
+        )
 
-    timestamps, memory = get_result(result)
+        timestamps, memory = get_result(result)
 
     # 4. 分割三个时段的数据
     pre10_end_dt = datetime.fromtimestamp(pre10_end)
@@ -393,6 +273,8 @@ def analyze_ecs_memory(normal_start, normal_end, Target_ECS, show):
         print(f"🟢 异常检测: 检测时段memory处于正常范围")
 
     if show:
+        from matplotlib import pyplot as plt
+
         plt.figure(figsize=(12, 6))
 
         plt.plot(timestamps, memory, marker='o', linestyle='-', color='b')
@@ -410,7 +292,8 @@ def analyze_ecs_memory(normal_start, normal_end, Target_ECS, show):
 
     return is_anomaly, max_memory
 
-def analyze_ecs_disk(normal_start, normal_end, Target_ECS, show):
+def analyze_ecs_disk(normal_start, normal_end, Target_ECS, show, series=None):
+    """series 为批量查询(get_ecs_metric)取回的 (timestamps, values)，为空时单独查询"""
     # 1. 计算三个时段的时间戳（转为int类型，CMS查询要求）
     # 前10分钟：normal_start - 10min 到 normal_start
     pre10_start = int((normal_start - timedelta(minutes=10)).timestamp())
@@ -422,20 +305,23 @@ def analyze_ecs_disk(normal_start, normal_end, Target_ECS, show):
     post10_start = int(normal_end.timestamp())
     post10_end = int((normal_end + timedelta(minutes=10)).timestamp())
 
-    # 2. CMS查询语句（查询deployment的CPU总使用率）
-    query_template = f"""
-        .entity_set with(domain='acs', name='acs.ecs.instance', query=`instance_id='{Target_ECS}'`)
-        | entity-call get_metric('acs', 'acs.metric.prometheus_ecs_high_level_metric_node', 'aggregate_node_disk_usage', 'range', '1m')
-        """
-
-    # 3. 分别查询三个时段的数据
-    result = cms_tester._execute_spl_query(
-        query_template.strip(),
-        from_time=pre10_start,
-        to_time=post10_end
-    )
+    if series is not None:
+        timestamps, disk = series
+    else:
+        # 2. CMS查询语句（查询ECS节点的disk使用率）
+        query_template = f"""
+            .entity_set with(domain='acs', name='acs.ecs.instance', query=`instance_id='{Target_ECS}'`)
+            | entity-call get_metric('acs', 'acs.metric.prometheus_ecs_high_level_metric_node', 'aggregate_node_disk_usage', 'range', '1m')
+            """
+
+        # 3. 分别查询三个时段的数据
+        result = cms_tester._execute_spl_query(
+            query_template.strip(),
+            from_time=pre10_start,
+            to_time=post10_end
+        )
 
-    timestamps, disk = get_result(result)
+        timestamps, disk = get_result(result)
 
 
     # 4. 分割三个时段的数据
@@ -466,6 +352,8 @@ def analyze_ecs_disk(normal_start, normal_end, Target_ECS, show):
         print(f"🟢 异常检测: 检测时段disk处于正常范围")
 
     if show:
+        from matplotlib import pyplot as plt
+
         plt.figure(figsize=(12, 6))
 
         plt.plot(timestamps, disk, marker='o', linestyle='-', color='b')
@@ -1,13 +1,14 @@
 import ast
 import json
-import os
 import sys
-import time
 from datetime import datetime, timedelta
 
 import numpy as np
-from aliyun.log import LogClient, GetLogsRequest
-from matplotlib import pyplot as plt
+
+import negative_cache
+import series_cache
+from problems import read_input_data
+from session import get_session
 
 sys.path.append('..')
 
@@ -16,163 +17,12 @@ PROJECT_NAME = "proj-xtrace-a46b97cfdc1332238f714864c014a1b-cn-qingdao"
 LOGSTORE_NAME = "logstore-tracing"
 REGION = "cn-qingdao"
 
-# Environment variables
-STS_ROLE_ARN = os.getenv('ALIBABA_CLOUD_ROLE_ARN', 'acs:ram::1672753017899339:role/tianchi-user-a')
-STS_SESSION_NAME = os.getenv('ALIBABA_CLOUD_ROLE_SESSION_NAME', 'my-sls-access')
-
-# CMS 指标配置
-CMS_WORKSPACE = "tianchi-workspace"
-CMS_ENDPOINT = os.getenv("CMS_ENDPOINT", "cms.cn-qingdao.aliyuncs.com")
-try:
-    from test_cms_query import TestCMSQuery
-
-    print("✅ TestCMSQuery imported successfully")
-except ImportError as e:
-    print(f"⚠️ Warning: Could not import TestCMSQuery: {e}")
-    print("💡 Please install required dependencies: pip install -r requirements.txt")
-    TestCMSQuery = None
-# 初始化CMS测试客户端，用于指标查询
-# 如果存在导入问题通过直接创建类修复(except)
-try:
-    if TestCMSQuery is not None:
-        cms_tester = TestCMSQuery()
-        cms_tester.setUp()
-        print(f"✅ 已通过导入的 TestCMSQuery 初始化CMS客户端")
-    else:
-        raise ImportError("TestCMSQuery is None")
-except:
-    print("⚠️  TestCMSQuery import failed, creating CMS client directly...")
-
-    import os
-    from alibabacloud_cms20240330.client import Client as Cms20240330Client
-    from alibabacloud_tea_openapi import models as open_api_models
-    from alibabacloud_cms20240330 import models as cms_20240330_models
-    from alibabacloud_tea_util import models as util_models
-
-
-    class DirectCMSClient:
-        def __init__(self):
-            self.access_key_id = os.getenv('ALIBABA_CLOUD_ACCESS_KEY_ID')
-            self.access_key_secret = os.getenv('ALIBABA_CLOUD_ACCESS_KEY_SECRET')
-            self.workspace = CMS_WORKSPACE
-            self.endpoint = CMS_ENDPOINT
-
-            if not self.access_key_id or not self.access_key_secret:
-                raise ValueError("请设置环境变量 ALIBABA_CLOUD_ACCESS_KEY_ID 和 ALIBABA_CLOUD_ACCESS_KEY_SECRET")
-
-            config = open_api_models.Config(
-                access_key_id=self.access_key_id,
-                access_key_secret=self.access_key_secret,
-            )
-            config.endpoint = self.endpoint
-            self.cms_client = Cms20240330Client(config)
-
-        def _execute_spl_query(self, query: str, from_time: int = None, to_time: int = None):
-            """执行SPL查询"""
-            if from_time is None:
-                from_time = int(time.time()) - 60 * 60 * 1
-            if to_time is None:
-                to_time = int(time.time())
-
-            try:
-                headers = cms_20240330_models.GetEntityStoreDataHeaders()
-                request = cms_20240330_models.GetEntityStoreDataRequest(
-                    query=query,
-                    from_=from_time,
-                    to=to_time
-                )
-                runtime = util_models.RuntimeOptions()
-                response = self.cms_client.get_entity_store_data_with_options(
-                    self.workspace, request, headers, runtime
-                )
-                return response.body
-            except Exception as e:
-                print(f"❌ CMS查询错误: {e}")
-                return None
-
-
-    cms_tester = DirectCMSClient()
-    print(f"✅ CMS client created directly")
-
-print(f"🔧 CMS客户端已初始化")
-print(f"🔧 workspace: {CMS_WORKSPACE}")
-print(f"🔧 Endpoint: {CMS_ENDPOINT}")
-
-
-def get_sts_credentials():
-    try:
-        from aliyunsdkcore.client import AcsClient
-        from aliyunsdksts.request.v20150401 import AssumeRoleRequest
-
-        MAIN_ACCOUNT_ACCESS_KEY_ID = os.getenv('ALIBABA_CLOUD_ACCESS_KEY_ID')
-        MAIN_ACCOUNT_ACCESS_KEY_SECRET = os.getenv('ALIBABA_CLOUD_ACCESS_KEY_SECRET')
-        ALIBABA_CLOUD_ROLE_ARN = os.getenv('ALIBABA_CLOUD_ROLE_ARN', 'acs:ram::1672753017899339:role/tianchi-user-a')
-        STS_SESSION_NAME = os.getenv('ALIBABA_CLOUD_ROLE_SESSION_NAME', 'my-sls-access')
-
-        if not MAIN_ACCOUNT_ACCESS_KEY_ID or not MAIN_ACCOUNT_ACCESS_KEY_SECRET:
-            return None, None, None
-
-        client = AcsClient(MAIN_ACCOUNT_ACCESS_KEY_ID, MAIN_ACCOUNT_ACCESS_KEY_SECRET, REGION)
-        request = AssumeRoleRequest.AssumeRoleRequest()
-        request.set_RoleArn(ALIBABA_CLOUD_ROLE_ARN)
-        request.set_RoleSessionName(STS_SESSION_NAME)
-        request.set_DurationSeconds(3600)
-
-        response = client.do_action_with_exception(request)
-        response_data = json.loads(response)
-        credentials = response_data['Credentials']
-        return (credentials['AccessKeyId'], credentials['AccessKeySecret'], credentials['SecurityToken'])
-    except Exception as e:
-        print(f"❌ 获取STS凭证失败: {e}")
-        return None, None, None
-
-
-temp_access_key_id, temp_access_key_secret, security_token = get_sts_credentials()
-if not temp_access_key_id:
-    print("❌ 无法获取STS临时凭证，分析终止")
-
-try:
-    from aliyun.log import LogClient
+# 共享的SLS/CMS客户端，凭证在第一次查询时获取并在后台自动刷新
+log_client = get_session().log_client
+cms_tester = get_session().cms_client
 
-    sls_endpoint = os.getenv("SLS_ENDPOINT", "cn-qingdao.log.aliyuncs.com")
-    log_client = LogClient(sls_endpoint, temp_access_key_id, temp_access_key_secret, security_token)
-except Exception as e:
-    print(f"❌ 创建SLS客户端失败: {e}")
-
-
-def read_input_data(input_file_path):
-    """
-    Read and parse input data from JSONL file
-
-    Args:
-        input_file_path: Path to the input JSONL file
-
-    Returns:
-        list: List of parsed JSON objects
-    """
-    data = []
-
-    try:
-        with open(input_file_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if line:  # Skip empty lines
-                    try:
-                        item = json.loads(line)
-                        data.append(item)
-                    except json.JSONDecodeError as e:
-                        print(f"⚠️ Failed to parse line: {line[:100]}... Error: {e}")
-                        continue
-
-        print(f"✅ Successfully read {len(data)} records from {input_file_path}")
-        return data
-
-    except FileNotFoundError:
-        print(f"❌ Input file not found: {input_file_path}")
-        return []
-    except Exception as e:
-        print(f"❌ Failed to read input file: {e}")
-        return []
+CPU_METRIC = "deployment_cpu_usage_vs_requests"
+MEMORY_METRIC = "deployment_memory_usage_vs_limits"
 
 
 def detect_anomaly(normal_values, pre_values, post_values, threshold=1.5, upper=True):
@@ -267,6 +117,10 @@ def get_info(start_time, end_time, Target_service):
 def get_result(result):
     # 1. 从result中提取data列表（原始结果是字典，直接用键访问）
     # 注意：根据你的打印结果，result是字典，不是对象，所以用['data']而非.result.data
+    # 查询重试后仍失败时 result 为None
+    if result is None:
+        print(f"⚠️ 查询失败，没有返回结果")
+        return [], []
     data_list = result.data
     if not data_list:
         print(f"⚠️ 结果中 'data' 字段为空")
@@ -294,7 +148,107 @@ def get_result(result):
     return timestamps, cpu_values
 
 
-def analyze_cpu(normal_start, normal_end, Target_service, show, upper=True):
+def parse_labels(labels_str):
+    """解析 __labels__ 列，无法解析时返回空字典"""
+    try:
+        labels = json.loads(labels_str)
+    except (TypeError, ValueError):
+        try:
+            labels = ast.literal_eval(labels_str)
+        except (ValueError, SyntaxError):
+            return {}
+    return labels if isinstance(labels, dict) else {}
+
+
+def split_series_by_entity(result, entities, label):
+    """
+    把多个实体的 get_metric 结果按实体拆开
+
+    Args:
+        result: CMS查询结果，每个实体一行
+        entities: 查询的实体名列表
+        label: 实体名所在的标签，如 deployment
+
+    Returns:
+        dict: {实体名: (timestamps, values)}，与 get_result 的返回值相同；没有数据的实体不出现
+    """
+    data_list = result.data or []
+    header = list(result.header or [])
+    labels_index = header.index("__labels__") if "__labels__" in header else 0
+    ts_index = header.index("__ts__") if "__ts__" in header else 2
+    value_index = header.index("__value__") if "__value__" in header else 3
+
+    series = {}
+    for row in data_list:
+        labels = parse_labels(row[labels_index])
+        name = labels.get(label)
+        if name not in entities:
+            name = next((value for value in labels.values() if value in entities), None)
+        if name is None and len(data_list) == 1 and len(entities) == 1:
+            name = entities[0]
+        if name is None or name in series:
+            continue
+        timestamps = [datetime.fromtimestamp(ts / 1e9) for ts in ast.literal_eval(row[ts_index])]
+        values = [float(val) for val in ast.literal_eval(row[value_index])]
+        series[name] = (timestamps, values)
+    return series
+
+
+def get_entity_metric(client, entity_set, metric_call, label, entities, from_time, to_time):
+    """
+    一次 entity-set 查询选中多个实体，取回同一指标的时序；已知没有数据的实体不再查询（见 negative_cache），
+    开启 --series-cache 时只查询缓存中缺失的时间段
+
+    Args:
+        client: CMS客户端（各模块的 cms_tester）
+        entity_set: (domain, name)，如 ('k8s', 'k8s.deployment')
+        metric_call: (domain, metric_set, metric)，即 get_metric 的前三个参数
+        label: 实体名所在的标签，同时用于拼接实体过滤条件
+
+    Returns:
+        dict: {实体名: (timestamps, values)}，没有数据的实体不出现；查询失败时为空
+    """
+    def fetch(entities, from_time, to_time):
+        entity_filter = " or ".join(f"{label}='{entity}'" for entity in entities)
+        query = f"""
+        .entity_set with(domain='{entity_set[0]}', name='{entity_set[1]}', query=`{entity_filter}`)
+        | entity-call get_metric('{metric_call[0]}', '{metric_call[1]}', '{metric_call[2]}', 'range', '1m')
+        """
+        result = client._execute_spl_query(
+            query.strip(),
+            from_time=from_time,
+            to_time=to_time
+        )
+        if result is None:
+            return None
+        return split_series_by_entity(result, entities, label)
+
+    def fetch_cached(entities, from_time, to_time):
+        return series_cache.fetch_series(source, entities, from_time, to_time, fetch)
+
+    source = (entity_set, metric_call, label)
+    entities = list(dict.fromkeys(entities))
+    if not entities:
+        return {}
+    return negative_cache.fetch_series(source, entities, from_time, to_time, fetch_cached) or {}
+
+
+def get_deployment_metric(normal_start, normal_end, services, metric):
+    """
+    一次 entity-set 查询选中所有候选 deployment，取回同一指标的时序
+
+    Returns:
+        dict: {service: (timestamps, values)}，可作为 analyze_cpu/analyze_memory 的 series 参数
+    """
+    pre10_start = int((normal_start - timedelta(minutes=10)).timestamp())
+    post10_end = int((normal_end + timedelta(minutes=10)).timestamp())
+    return get_entity_metric(cms_tester, ('k8s', 'k8s.deployment'),
+                             ('k8s', 'k8s.metric.high_level_metric_deployment', metric), "deployment",
+                             services, pre10_start, post10_end)
+
+
+def analyze_cpu(normal_start, normal_end, Target_service, show, upper=True, series=None):
+    """series 为批量查询(get_deployment_metric)取回的 (timestamps, values)，为空时单独查询"""
     # 1. 计算三个时段的时间戳（转为int类型，CMS查询要求）
     # 前10分钟：normal_start - 10min 到 normal_start
     pre10_start = int((normal_start - timedelta(minutes=10)).timestamp())
@@ -306,20 +260,23 @@ def analyze_cpu(normal_start, normal_end, Target_service, show, upper=True):
     post10_start = int(normal_end.timestamp())
     post10_end = int((normal_end + timedelta(minutes=10)).timestamp())
 
-    # 2. CMS查询语句（查询deployment的CPU总使用率）
-    query_template = f"""
-        .entity_set with(domain='k8s', name='k8s.deployment', query=`deployment='{Target_service}'`)
-        | entity-call get_metric('k8s', 'k8s.metric.high_level_metric_deployment', 'deployment_cpu_usage_vs_requests', 'range', '1m')
-        """
+    if series is not None:
+        timestamps, cpu = series
+    else:
+        # 2. CMS查询语句（查询deployment的CPU总使用率）
+        query_template = f"""
+            .entity_set with(domain='k8s', name='k8s.deployment', query=`deployment='{Target_service}'`)
+            | entity-call get_metric('k8s', 'k8s.metric.high_level_metric_deployment', '{CPU_METRIC}', 'range', '1m')
+            """
 
-    # 3. 分别查询三个时段的数据
-    result = cms_tester._execute_spl_query(
-        query_template.strip(),
-        from_time=pre10_start,
-        to_time=post10_end
-    )
+        # 3. 分别查询三个时段的数据
+        result = cms_tester._execute_spl_query(
+            query_template.strip(),
+            from_time=pre10_start,
+            to_time=post10_end
+        )
 
-    timestamps, cpu = get_result(result)
+        timestamps, cpu = get_result(result)
 
     # 4. 分割三个时段的数据
     pre10_end_dt = datetime.fromtimestamp(pre10_end)
@@ -335,7 +292,7 @@ def analyze_cpu(normal_start, normal_end, Target_service, show, upper=True):
         is_anomaly, normal_avg, pre_avg, post_avg = detect_anomaly(
             normal_values, pre_values, post_values
         )
-        max_cpu = max(normal_values)
+        max_cpu = max(normal_values, default=0)
 
         # 6. 输出异常检测结果
         print(f"\ncpu异常检测结果:")
@@ -368,6 +325,8 @@ def analyze_cpu(normal_start, normal_end, Target_service, show, upper=True):
             print(f"🟢 异常检测: 检测时段cpu处于正常范围")
 
     if show:
+        from matplotlib import pyplot as plt
+
         plt.figure(figsize=(12, 6))
 
         plt.plot(timestamps, cpu, marker='o', linestyle='-', color='b')
@@ -387,7 +346,8 @@ def analyze_cpu(normal_start, normal_end, Target_service, show, upper=True):
     return is_anomaly, max_cpu, cpu
 
 
-def analyze_memory(normal_start, normal_end, Target_service, show):
+def analyze_memory(normal_start, normal_end, Target_service, show, series=None):
+    """series 为批量查询(get_deployment_metric)取回的 (timestamps, values)，为空时单独查询"""
     # 1. 计算三个时段的时间戳（转为int类型，CMS查询要求）
     # 前10分钟：normal_start - 10min 到 normal_start
     pre10_start = int((normal_start - timedelta(minutes=10)).timestamp())
@@ -399,20 +359,23 @@ def analyze_memory(normal_start, normal_end, Target_service, show):
     post10_start = int(normal_end.timestamp())
     post10_end = int((normal_end + timedelta(minutes=10)).timestamp())
 
-    # 2. CMS查询语句（查询deployment的CPU总使用率）
-    query_template = f"""
-        .entity_set with(domain='k8s', name='k8s.deployment', query=`deployment='{Target_service}'`)
-        | entity-call get_metric('k8s', 'k8s.metric.high_level_metric_deployment', 'deployment_memory_usage_vs_limits', 'range', '1m')
-        """
+    if series is not None:
+        timestamps, memory = series
+    else:
+        # 2. CMS查询语句（查询deployment的内存使用率）
+        query_template = f"""
+            .entity_set with(domain='k8s', name='k8s.deployment', query=`deployment='{Target_service}'`)
+            | entity-call get_metric('k8s', 'k8s.metric.high_level_metric_deployment', '{MEMORY_METRIC}', 'range', '1m')
+            """
 
-    # 3. 分别查询三个时段的数据
-    result = cms_tester._execute_spl_query(
-        query_template.strip(),
-        from_time=pre10_start,
-        to_time=post10_end
-    )
+        # 3. 分别查询三个时段的数据
+        result = cms_tester._execute_spl_query(
+            query_template.strip(),
+            from_time=pre10_start,
+            to_time=post10_end
+        )
 
-    timestamps, memory = get_result(result)
+        timestamps, memory = get_result(result)
     print(timestamps)
 
     # 4. 分割三个时段的数据
@@ -426,7 +389,7 @@ def analyze_memory(normal_start, normal_end, Target_service, show):
     is_anomaly, normal_avg, pre_avg, post_avg = detect_anomaly(
         normal_values, pre_values, post_values
     )
-    max_memory = max(normal_values)
+    max_memory = max(normal_values, default=0)
 
     # 6. 输出异常检测结果
     print(f"\nmemory异常检测结果:")
@@ -441,6 +404,8 @@ def analyze_memory(normal_start, normal_end, Target_service, show):
         print(f"🟢 异常检测: 检测时段memory处于正常范围")
 
     if show:
+        from matplotlib import pyplot as plt
+
         plt.figure(figsize=(12, 6))
 
         plt.plot(timestamps, memory, marker='o', linestyle='-', color='b')
@@ -484,7 +449,7 @@ def get_pod_metrics(normal_start, normal_end, Target_pod, show):
         to_time=post10_end
     )
     print(result)
-    data_list = result.data
+    data_list = result.data if result is not None else None
     if not data_list:
         print(f"⚠️ 结果中 'data' 字段为空")
         return True, []
@@ -512,7 +477,7 @@ def get_pod_metrics(normal_start, normal_end, Target_pod, show):
     is_anomaly, normal_avg, pre_avg, post_avg = detect_anomaly(
         normal_values, pre_values, post_values
     )
-    max_cpu = max(normal_values)
+    max_cpu = max(normal_values, default=0)
 
     # 6. 输出异常检测结果
     print(f"\ncpu异常检测结果:")
@@ -527,6 +492,8 @@ def get_pod_metrics(normal_start, normal_end, Target_pod, show):
         print(f"🟢 异常检测: 检测时段cpu处于正常范围")
 
     if show:
+        from matplotlib import pyplot as plt
+
         plt.figure(figsize=(12, 6))
 
         plt.plot(timestamps, cpu, marker='o', linestyle='-', color='b')
@@ -544,6 +511,78 @@ def get_pod_metrics(normal_start, normal_end, Target_pod, show):
 
     return cpu
 
+def count_pod_points(normal_start, normal_end, pods):
+    """
+    一次 entity-set 查询取回所有 pod 的黄金指标，统计每个 pod 的数据点数
+
+    Returns:
+        tuple: (预期点数, {pod: 实际点数})；没有数据的 pod 不出现，查询失败时字典为空。
+               查询有结果但无法按 pod 拆分时，字典为 None
+    """
+    pre10_start = int((normal_start - timedelta(minutes=10)).timestamp())
+    post10_end = int((normal_end + timedelta(minutes=10)).timestamp())
+    expected_points = (post10_end - pre10_start) // 60  # 1分钟间隔，理论数据点数量
+    pods = list(dict.fromkeys(pods))
+    if not pods:
+        return expected_points, {}
+
+    entity_filter = " or ".join(f"name='{pod}'" for pod in pods)
+    query = f"""
+            .entity_set with(domain='k8s', name='k8s.pod', query=`{entity_filter}`)
+            | entity-call get_golden_metrics('range', '1m')
+            """
+    result = cms_tester._execute_spl_query(
+        query.strip(),
+        from_time=pre10_start,
+        to_time=post10_end
+    )
+    if result is None:
+        return expected_points, {}
+    data_list = result.data or []
+    header = list(result.header or [])
+    ts_index = header.index("__ts__") if "__ts__" in header else 0
+
+    counts = {}
+    for row in data_list:
+        # pod 名可能出现在 __entity_id__、name 等列或 __labels__ 中
+        names = set(str(value) for value in row)
+        if "__labels__" in header:
+            names.update(str(value) for value in parse_labels(row[header.index("__labels__")]).values())
+        pod = next((pod for pod in pods if pod in names), None)
+        # 一个pod有多行黄金指标时与 get_pod 一致，只看第一行的 __ts__
+        if pod is None or pod in counts:
+            continue
+        try:
+            counts[pod] = len(ast.literal_eval(row[ts_index]))
+        except (ValueError, SyntaxError):
+            print(f"⚠️ 无法解析ts_str: {row[ts_index]}")
+            counts[pod] = 0
+    if data_list and not counts:
+        return expected_points, None
+    return expected_points, counts
+
+
+def check_pods_complete(normal_start, normal_end, pods):
+    """
+    批量版的 get_pod：一次查询检查所有 pod 的数据点是否完整（pod 被终止时数据点会缺失）
+
+    没有数据的 pod 视为完整，与 get_pod 一致；结果无法按 pod 拆分时逐个调用 get_pod。
+
+    Returns:
+        dict: {pod: 是否完整}
+    """
+    expected_points, counts = count_pod_points(normal_start, normal_end, pods)
+    pods = list(dict.fromkeys(pods))
+    if counts is None:
+        return {pod: get_pod(normal_start, normal_end, pod, False)[0] for pod in pods}
+    points = np.array([counts.get(pod, expected_points) for pod in pods], dtype=int)
+    complete = points >= expected_points
+    for pod, count in zip(pods, points.tolist()):
+        if count < expected_points:
+            print(f"⚠️ {pod} 数据点不完整：预期{expected_points}个，实际{count}个")
+    return dict(zip(pods, complete.tolist()))
+
+
 def get_pod(normal_start, normal_end, Target_pod, show):
     # 1. 计算三个时段的时间戳（转为int类型，CMS查询要求）
     # 前10分钟：normal_start - 10min 到 normal_start
@@ -570,7 +609,7 @@ def get_pod(normal_start, normal_end, Target_pod, show):
         to_time=post10_end
     )
     print(result)
-    data_list = result.data
+    data_list = result.data if result is not None else None
     if not data_list:
         print(f"⚠️ 结果中 'data' 字段为空")
         return True, []
@@ -1,50 +1,16 @@
-import json
-import os
-import time
 from datetime import datetime, timedelta, timezone
 
-from aliyun.log import LogClient, GetLogsRequest
-from matplotlib import pyplot as plt
+import sls_query
+from get_log import latency_periods, latency_windows
+from problems import read_input_data
+from session import get_session
+from sls_query import parse_window_stats, window_stats_query
 
 # SLS configuration
 PROJECT_NAME = "proj-xtrace-a46b97cfdc1332238f714864c014a1b-cn-qingdao"
 LOGSTORE_NAME = "logstore-tracing"
 REGION = "cn-qingdao"
 
-def read_input_data(input_file_path):
-    """
-    Read and parse input data from JSONL file
-
-    Args:
-        input_file_path: Path to the input JSONL file
-
-    Returns:
-        list: List of parsed JSON objects
-    """
-    data = []
-
-    try:
-        with open(input_file_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if line:  # Skip empty lines
-                    try:
-                        item = json.loads(line)
-                        data.append(item)
-                    except json.JSONDecodeError as e:
-                        print(f"⚠️ Failed to parse line: {line[:100]}... Error: {e}")
-                        continue
-
-        print(f"✅ Successfully read {len(data)} records from {input_file_path}")
-        return data
-
-    except FileNotFoundError:
-        print(f"❌ Input file not found: {input_file_path}")
-        return []
-    except Exception as e:
-        print(f"❌ Failed to read input file: {e}")
-        return []
-
 def datetime_to_timestamp(time_str):
     # 解析时间字符串为datetime对象（默认本地时区，如需UTC可指定tzinfo）
     dt = datetime.strptime(time_str, "%Y-%m-%d %H:%M:%S")
@@ -57,48 +23,14 @@ def datetime_to_timestamp(time_str):
 
 def dt_to_ms(dt):
     return int(dt.timestamp() * 1000)
-def get_sts_credentials():
-    try:
-        from aliyunsdkcore.client import AcsClient
-        from aliyunsdksts.request.v20150401 import AssumeRoleRequest
-
-        MAIN_ACCOUNT_ACCESS_KEY_ID = os.getenv('ALIBABA_CLOUD_ACCESS_KEY_ID')
-        MAIN_ACCOUNT_ACCESS_KEY_SECRET = os.getenv('ALIBABA_CLOUD_ACCESS_KEY_SECRET')
-        ALIBABA_CLOUD_ROLE_ARN = os.getenv('ALIBABA_CLOUD_ROLE_ARN', 'acs:ram::1672753017899339:role/tianchi-user-a')
-        STS_SESSION_NAME = os.getenv('ALIBABA_CLOUD_ROLE_SESSION_NAME', 'my-sls-access')
-
-        if not MAIN_ACCOUNT_ACCESS_KEY_ID or not MAIN_ACCOUNT_ACCESS_KEY_SECRET:
-            return None, None, None
-
-        client = AcsClient(MAIN_ACCOUNT_ACCESS_KEY_ID, MAIN_ACCOUNT_ACCESS_KEY_SECRET, REGION)
-        request = AssumeRoleRequest.AssumeRoleRequest()
-        request.set_RoleArn(ALIBABA_CLOUD_ROLE_ARN)
-        request.set_RoleSessionName(STS_SESSION_NAME)
-        request.set_DurationSeconds(3600)
-
-        response = client.do_action_with_exception(request)
-        response_data = json.loads(response)
-        credentials = response_data['Credentials']
-        return (credentials['AccessKeyId'], credentials['AccessKeySecret'], credentials['SecurityToken'])
-    except Exception as e:
-        print(f"❌ 获取STS凭证失败: {e}")
-        return None, None, None
-
-
-temp_access_key_id, temp_access_key_secret, security_token = get_sts_credentials()
-if not temp_access_key_id:
-    print("❌ 无法获取STS临时凭证，分析终止")
-
-try:
-    from aliyun.log import LogClient
-
-    sls_endpoint = os.getenv("SLS_ENDPOINT", "cn-qingdao.log.aliyuncs.com")
-    log_client = LogClient(sls_endpoint, temp_access_key_id, temp_access_key_secret, security_token)
-except Exception as e:
-    print(f"❌ 创建SLS客户端失败: {e}")
+
+# 共享的SLS客户端，凭证在第一次查询时获取并在后台自动刷新
+log_client = get_session().log_client
 
 def get_errorInfo(log_client, project, logstore, service, start, end):
     """获取指定时间段内特定节点上各hostname的平均duration"""
+    from aliyun.log import GetLogsRequest
+
     start_dt = datetime.strptime(start, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone(timedelta(hours=8)))
     end_dt = datetime.strptime(end, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone(timedelta(hours=8)))
     start = int(start_dt.timestamp()) * 1000000000
@@ -123,8 +55,68 @@ def get_errorInfo(log_client, project, logstore, service, start, end):
     print(logs[0].get_contents().get("info"))
     return logs[0].get_contents().get("info")
 
+
+def query_window_stats(log_client, project, logstore, search, value_sql, statistic, start, end):
+    """
+    时段统计模式（--window-stats）：每分钟的 value_sql 在 前10分钟/目标时段/后10分钟 上的统计值直接在SLS里算好
+
+    Returns:
+        dict: {"before"/"target"/"after": 统计值}，没有数据的时段不出现
+    """
+    from aliyun.log import GetLogsRequest
+
+    start_minus_5, _, _, end_plus_5 = latency_windows(start, end)
+    query = window_stats_query(search, value_sql, latency_periods(start, end), statistic)
+    print(query)
+    request = GetLogsRequest(
+        project=project,
+        logstore=logstore,
+        query=query,
+        fromTime=start_minus_5.timestamp(),
+        toTime=end_plus_5.timestamp()
+    )
+    response = log_client.get_logs(request)
+    return parse_window_stats([log.get_contents() for log in response.get_logs()])
+
+
+def compare_errors(before_stat, target_stat, after_stat, start, end):
+    """判断目标时段的报错相比前后两个时段是否明显上升；前后时段没有报错而目标时段有报错时也视为异常"""
+    start_minus_5, start_dt, end_dt, end_plus_5 = latency_windows(start, end)
+
+    # 4. 输出统计结果
+    print("\n=== 报错统计对比 ===")
+    print(f"前5分钟（{start_minus_5.strftime('%H:%M:%S')}至{start_dt.strftime('%H:%M:%S')}）: "
+          f"{before_stat:.2f}" if before_stat else "前5分钟无数据")
+    print(f"目标时段（{start}至{end}）: "
+          f"{target_stat:.2f}" if target_stat else "目标时段无数据")
+    print(f"后5分钟（{end_dt.strftime('%H:%M:%S')}至{end_plus_5.strftime('%H:%M:%S')}）: "
+          f"{after_stat:.2f}" if after_stat else "后5分钟无数据")
+
+    # 5. 判断是否明显上升
+    threshold = 1.5
+    if target_stat and before_stat and after_stat:
+        rise_ratio_before = (target_stat - before_stat) / before_stat * 100
+        rise_ratio_after = (target_stat - after_stat) / after_stat * 100
+        if target_stat > before_stat * threshold and target_stat > after_stat * threshold:
+            print(
+                f"\n⚠️ 目标时段报错相比前10分钟上升{rise_ratio_before:.1f}%，相比后10分钟上升{rise_ratio_after:.1f}%，超过{int((threshold - 1) * 100)}%，存在明显上升！")
+            return True
+        else:
+            print(
+                f"\n✅ 目标时段报错相比前10分钟上升{rise_ratio_before:.1f}%，相比后10分钟上升{rise_ratio_after:.1f}%，未超过{int((threshold - 1) * 100)}%，无明显上升。")
+    elif target_stat and (not before_stat or not after_stat):
+        print(f"\n⚠️ 存在异常报错，请检查日志。")
+        return True
+    else:
+        print("\n⚠️ 数据不足，无法判断时延变化。")
+
+    return False
+
+
 def get_span_error(log_client, project, logstore, service, start, end, isMedian=True):
     """获取指定时间段内特定节点上各hostname的平均duration"""
+    from aliyun.log import GetLogsRequest
+
     start_dt = datetime.strptime(start, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone(timedelta(hours=8)))
     end_dt = datetime.strptime(end, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone(timedelta(hours=8)))
     start_minus_5 = start_dt - timedelta(minutes=10)
@@ -134,9 +126,17 @@ def get_span_error(log_client, project, logstore, service, start, end, isMedian=
     start_minus = int(start_minus_5.timestamp()) * 1000000000
     end_plus = int(end_plus_5.timestamp()) * 1000000000
 
+    search = ('(statusCode : 2 or statusCode : 3) and spanName : "grpc.oteldemo.CurrencyService/GetSupportedCurrencies" '
+              'and attributes.grpc.error_message : "14 UNAVAILABLE: read ECONNRESET"')
+    if sls_query.SLS_WINDOW_STATS:
+        # 时段统计模式：每分钟报错数在三个时段上的中位数/平均值在SLS里算好
+        stats = query_window_stats(log_client, project, logstore, search, "count(statusCode)",
+                                   "median" if isMedian else "mean", start, end)
+        return compare_errors(stats.get("before"), stats.get("target"), stats.get("after"), start, end)
+
     # 构建查询语句，筛选特定节点并按hostname分组
     query = f"""
-    (statusCode : 2 or statusCode : 3) and spanName : "grpc.oteldemo.CurrencyService/GetSupportedCurrencies" and attributes.grpc.error_message : "14 UNAVAILABLE: read ECONNRESET"
+    {search}
     | SELECT count(statusCode) as statusCode, (startTime/1000000 -startTime/1000000 %(15000 * 4)) as date FROM log GROUP BY date LIMIT 0, 999 
     """
 
@@ -216,38 +216,13 @@ def get_span_error(log_client, project, logstore, service, start, end, isMedian=
     target_stat = calc_statistic(target_data, isMedian)  # 目标时段统计值
     after_stat = calc_statistic(after_data, isMedian)  # 后5分钟统计值
 
-    # 4. 输出统计结果
-    print("\n=== 报错统计对比 ===")
-    print(f"前5分钟（{start_minus_5.strftime('%H:%M:%S')}至{start_dt.strftime('%H:%M:%S')}）: "
-          f"{before_stat:.2f}" if before_stat else "前5分钟无数据")
-    print(f"目标时段（{start}至{end}）: "
-          f"{target_stat:.2f}" if target_stat else "目标时段无数据")
-    print(f"后5分钟（{end_dt.strftime('%H:%M:%S')}至{end_plus_5.strftime('%H:%M:%S')}）: "
-          f"{after_stat:.2f}" if after_stat else "后5分钟无数据")
-
-    # 5. 判断是否明显上升
-    threshold = 1.5
-    if target_stat and before_stat and after_stat:
-        rise_ratio_before = (target_stat - before_stat) / before_stat * 100
-        rise_ratio_after = (target_stat - after_stat) / after_stat * 100
-        if target_stat > before_stat * threshold and target_stat > after_stat * threshold:
-            print(
-                f"\n⚠️ 目标时段报错相比前10分钟上升{rise_ratio_before:.1f}%，相比后10分钟上升{rise_ratio_after:.1f}%，超过{int((threshold - 1) * 100)}%，存在明显上升！")
-            return True
-        else:
-            print(
-                f"\n✅ 目标时段报错相比前10分钟上升{rise_ratio_before:.1f}%，相比后10分钟上升{rise_ratio_after:.1f}%，未超过{int((threshold - 1) * 100)}%，无明显上升。")
-    elif target_stat and (not before_stat or not after_stat):
-        print(f"\n⚠️ 存在异常报错，请检查日志。")
-        return True
-    else:
-        print("\n⚠️ 数据不足，无法判断时延变化。")
-
-    return False
+    return compare_errors(before_stat, target_stat, after_stat, start, end)
 
 
 def get_error(log_client, project, logstore, service, start, end, isMedian=True):
     """获取指定时间段内特定节点上各hostname的平均duration"""
+    from aliyun.log import GetLogsRequest
+
     start_dt = datetime.strptime(start, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone(timedelta(hours=8)))
     end_dt = datetime.strptime(end, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone(timedelta(hours=8)))
     # 计算时间差（分钟为单位，取整数）
@@ -259,6 +234,15 @@ def get_error(log_client, project, logstore, service, start, end, isMedian=True)
     start_minus = int(start_minus_5.timestamp()) * 1000000000
     end_plus = int(end_plus_5.timestamp()) * 1000000000
 
+    if sls_query.SLS_WINDOW_STATS:
+        # 时段统计模式：各时段的报错总数在SLS里算好，再按目标时段的分钟数折算
+        stats = query_window_stats(log_client, project, logstore,
+                                   f'((serviceName : "{service}") AND startTime in [{start_minus} {end_plus})) AND statusCode>1',
+                                   "count(statusCode)", "sum", start, end)
+        before_stat, target_stat, after_stat = (stats[period] / time_diff_minutes if period in stats else None
+                                                for period in ("before", "target", "after"))
+        return compare_errors(before_stat, target_stat, after_stat, start, end), before_stat, target_stat, after_stat
+
     # 构建查询语句，筛选特定节点并按hostname分组
     query = f"""
     ((serviceName : "{service}") AND startTime in [{start_minus} {end_plus})) AND statusCode>1
@@ -341,32 +325,7 @@ def get_error(log_client, project, logstore, service, start, end, isMedian=True)
     target_stat = calc_statistic(target_data, isMedian)  # 目标时段统计值
     after_stat = calc_statistic(after_data, isMedian)  # 后5分钟统计值
 
-    # 4. 输出统计结果
-    print("\n=== 报错统计对比 ===")
-    print(f"前5分钟（{start_minus_5.strftime('%H:%M:%S')}至{start_dt.strftime('%H:%M:%S')}）: "
-          f"{before_stat:.2f}" if before_stat else "前5分钟无数据")
-    print(f"目标时段（{start}至{end}）: "
-          f"{target_stat:.2f}" if target_stat else "目标时段无数据")
-    print(f"后5分钟（{end_dt.strftime('%H:%M:%S')}至{end_plus_5.strftime('%H:%M:%S')}）: "
-          f"{after_stat:.2f}" if after_stat else "后5分钟无数据")
-
-    # 5. 判断是否明显上升（阈值可调整，这里设为50%）
-    threshold = 1.5  # 超过前5分钟的1.5倍视为明显上升
-    if target_stat and before_stat and after_stat:
-        rise_ratio_before = (target_stat - before_stat) / before_stat * 100
-        rise_ratio_after = (target_stat - after_stat) / after_stat * 100
-        if target_stat > before_stat * threshold and target_stat > after_stat * threshold:
-            print(f"\n⚠️ 目标时段报错相比前10分钟上升{rise_ratio_before:.1f}%，相比后10分钟上升{rise_ratio_after:.1f}%，超过{int((threshold - 1) * 100)}%，存在明显上升！")
-            return True, before_stat, target_stat, after_stat
-        else:
-            print(f"\n✅ 目标时段报错相比前10分钟上升{rise_ratio_before:.1f}%，相比后10分钟上升{rise_ratio_after:.1f}%，未超过{int((threshold - 1) * 100)}%，无明显上升。")
-    elif target_stat and (not before_stat or not after_stat):
-        print(f"\n⚠️ 存在异常报错，请检查日志。")
-        return True, before_stat, target_stat, after_stat
-    else:
-        print("\n⚠️ 数据不足，无法判断时延变化。")
-
-
+    flag = compare_errors(before_stat, target_stat, after_stat, start, end)
 
     # # 6. 可视化（标记三个时段）
     # plt.figure(figsize=(12, 6))
@@ -383,7 +342,7 @@ def get_error(log_client, project, logstore, service, start, end, isMedian=True)
     #
     # # 显示图表
     # plt.show()
-    return False, before_stat, target_stat, after_stat
+    return flag, before_stat, target_stat, after_stat
 
 if __name__ == "__main__":
     serveice_list = []
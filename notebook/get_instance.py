@@ -1,51 +1,14 @@
-import json
-import os
-import time
 from datetime import datetime, timedelta, timezone
 
-from aliyun.log import LogClient, GetLogsRequest
-from matplotlib import pyplot as plt
 from get_entity import get_pod, get_pod_metrics
+from problems import read_input_data
+from session import get_session
 
 # SLS configuration
 PROJECT_NAME = "proj-xtrace-a46b97cfdc1332238f714864c014a1b-cn-qingdao"
 LOGSTORE_NAME = "logstore-tracing"
 REGION = "cn-qingdao"
 
-def read_input_data(input_file_path):
-    """
-    Read and parse input data from JSONL file
-
-    Args:
-        input_file_path: Path to the input JSONL file
-
-    Returns:
-        list: List of parsed JSON objects
-    """
-    data = []
-
-    try:
-        with open(input_file_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if line:  # Skip empty lines
-                    try:
-                        item = json.loads(line)
-                        data.append(item)
-                    except json.JSONDecodeError as e:
-                        print(f"⚠️ Failed to parse line: {line[:100]}... Error: {e}")
-                        continue
-
-        print(f"✅ Successfully read {len(data)} records from {input_file_path}")
-        return data
-
-    except FileNotFoundError:
-        print(f"❌ Input file not found: {input_file_path}")
-        return []
-    except Exception as e:
-        print(f"❌ Failed to read input file: {e}")
-        return []
-
 def datetime_to_timestamp(time_str):
     # 解析时间字符串为datetime对象（默认本地时区，如需UTC可指定tzinfo）
     dt = datetime.strptime(time_str, "%Y-%m-%d %H:%M:%S")
@@ -58,48 +21,14 @@ def datetime_to_timestamp(time_str):
 
 def dt_to_ms(dt):
     return int(dt.timestamp() * 1000)
-def get_sts_credentials():
-    try:
-        from aliyunsdkcore.client import AcsClient
-        from aliyunsdksts.request.v20150401 import AssumeRoleRequest
-
-        MAIN_ACCOUNT_ACCESS_KEY_ID = os.getenv('ALIBABA_CLOUD_ACCESS_KEY_ID')
-        MAIN_ACCOUNT_ACCESS_KEY_SECRET = os.getenv('ALIBABA_CLOUD_ACCESS_KEY_SECRET')
-        ALIBABA_CLOUD_ROLE_ARN = os.getenv('ALIBABA_CLOUD_ROLE_ARN', 'acs:ram::1672753017899339:role/tianchi-user-a')
-        STS_SESSION_NAME = os.getenv('ALIBABA_CLOUD_ROLE_SESSION_NAME', 'my-sls-access')
-
-        if not MAIN_ACCOUNT_ACCESS_KEY_ID or not MAIN_ACCOUNT_ACCESS_KEY_SECRET:
-            return None, None, None
-
-        client = AcsClient(MAIN_ACCOUNT_ACCESS_KEY_ID, MAIN_ACCOUNT_ACCESS_KEY_SECRET, REGION)
-        request = AssumeRoleRequest.AssumeRoleRequest()
-        request.set_RoleArn(ALIBABA_CLOUD_ROLE_ARN)
-        request.set_RoleSessionName(STS_SESSION_NAME)
-        request.set_DurationSeconds(3600)
-
-        response = client.do_action_with_exception(request)
-        response_data = json.loads(response)
-        credentials = response_data['Credentials']
-        return (credentials['AccessKeyId'], credentials['AccessKeySecret'], credentials['SecurityToken'])
-    except Exception as e:
-        print(f"❌ 获取STS凭证失败: {e}")
-        return None, None, None
-
-
-temp_access_key_id, temp_access_key_secret, security_token = get_sts_credentials()
-if not temp_access_key_id:
-    print("❌ 无法获取STS临时凭证，分析终止")
-
-try:
-    from aliyun.log import LogClient
-
-    sls_endpoint = os.getenv("SLS_ENDPOINT", "cn-qingdao.log.aliyuncs.com")
-    log_client = LogClient(sls_endpoint, temp_access_key_id, temp_access_key_secret, security_token)
-except Exception as e:
-    print(f"❌ 创建SLS客户端失败: {e}")
+
+# 共享的SLS客户端，凭证在第一次查询时获取并在后台自动刷新
+log_client = get_session().log_client
 
 def get_instance(log_client, project, logstore, service, start, end):
     """获取指定时间段内特定节点上各hostname的平均duration"""
+    from aliyun.log import GetLogsRequest
+
     start_dt = datetime.strptime(start, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone(timedelta(hours=8)))
     end_dt = datetime.strptime(end, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone(timedelta(hours=8)))
     start_minus_5 = start_dt - timedelta(minutes=10)
@@ -1,50 +1,15 @@
-import json
-import os
-import time
 from datetime import datetime, timedelta, timezone
 
-from aliyun.log import LogClient, GetLogsRequest
-from matplotlib import pyplot as plt
+from problems import read_input_data
+from session import get_session
+import sls_query
+from sls_query import parse_window_stats, phrase_match, window_stats_query
 
 # SLS configuration
 PROJECT_NAME = "proj-xtrace-a46b97cfdc1332238f714864c014a1b-cn-qingdao"
 LOGSTORE_NAME = "logstore-tracing"
 REGION = "cn-qingdao"
 
-def read_input_data(input_file_path):
-    """
-    Read and parse input data from JSONL file
-
-    Args:
-        input_file_path: Path to the input JSONL file
-
-    Returns:
-        list: List of parsed JSON objects
-    """
-    data = []
-
-    try:
-        with open(input_file_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if line:  # Skip empty lines
-                    try:
-                        item = json.loads(line)
-                        data.append(item)
-                    except json.JSONDecodeError as e:
-                        print(f"⚠️ Failed to parse line: {line[:100]}... Error: {e}")
-                        continue
-
-        print(f"✅ Successfully read {len(data)} records from {input_file_path}")
-        return data
-
-    except FileNotFoundError:
-        print(f"❌ Input file not found: {input_file_path}")
-        return []
-    except Exception as e:
-        print(f"❌ Failed to read input file: {e}")
-        return []
-
 def datetime_to_timestamp(time_str):
     # 解析时间字符串为datetime对象（默认本地时区，如需UTC可指定tzinfo）
     dt = datetime.strptime(time_str, "%Y-%m-%d %H:%M:%S")
@@ -57,47 +22,17 @@ def datetime_to_timestamp(time_str):
 
 def dt_to_ms(dt):
     return int(dt.timestamp() * 1000)
-def get_sts_credentials():
-    try:
-        from aliyunsdkcore.client import AcsClient
-        from aliyunsdksts.request.v20150401 import AssumeRoleRequest
-
-        MAIN_ACCOUNT_ACCESS_KEY_ID = os.getenv('ALIBABA_CLOUD_ACCESS_KEY_ID')
-        MAIN_ACCOUNT_ACCESS_KEY_SECRET = os.getenv('ALIBABA_CLOUD_ACCESS_KEY_SECRET')
-        ALIBABA_CLOUD_ROLE_ARN = os.getenv('ALIBABA_CLOUD_ROLE_ARN', 'acs:ram::1672753017899339:role/tianchi-user-a')
-        STS_SESSION_NAME = os.getenv('ALIBABA_CLOUD_ROLE_SESSION_NAME', 'my-sls-access')
-
-        if not MAIN_ACCOUNT_ACCESS_KEY_ID or not MAIN_ACCOUNT_ACCESS_KEY_SECRET:
-            return None, None, None
-
-        client = AcsClient(MAIN_ACCOUNT_ACCESS_KEY_ID, MAIN_ACCOUNT_ACCESS_KEY_SECRET, REGION)
-        request = AssumeRoleRequest.AssumeRoleRequest()
-        request.set_RoleArn(ALIBABA_CLOUD_ROLE_ARN)
-        request.set_RoleSessionName(STS_SESSION_NAME)
-        request.set_DurationSeconds(3600)
-
-        response = client.do_action_with_exception(request)
-        response_data = json.loads(response)
-        credentials = response_data['Credentials']
-        return (credentials['AccessKeyId'], credentials['AccessKeySecret'], credentials['SecurityToken'])
-    except Exception as e:
-        print(f"❌ 获取STS凭证失败: {e}")
-        return None, None, None
-
-
-temp_access_key_id, temp_access_key_secret, security_token = get_sts_credentials()
-if not temp_access_key_id:
-    print("❌ 无法获取STS临时凭证，分析终止")
-
-try:
-    from aliyun.log import LogClient
-
-    sls_endpoint = os.getenv("SLS_ENDPOINT", "cn-qingdao.log.aliyuncs.com")
-    log_client = LogClient(sls_endpoint, temp_access_key_id, temp_access_key_secret, security_token)
-except Exception as e:
-    print(f"❌ 创建SLS客户端失败: {e}")
+
+# 共享的SLS客户端，凭证在第一次查询时获取并在后台自动刷新
+log_client = get_session().log_client
 
 def get_span_latency(log_client, project, logstore, service, start, end, isMedian=False):
+    """
+    检查 service（frontend/checkout）对各下游gRPC方法的调用时延是否都明显上升
+
+    一条 GROUP BY spanName, date 查询取回所有方法的时延序列，再在本地逐个方法判断：
+    任一有数据的方法没有明显上升即返回 False。
+    """
     span_data = {
         "frontend": [],
         "checkout": [],
@@ -123,155 +58,52 @@ def get_span_latency(log_client, project, logstore, service, start, end, isMedia
     ]
     span_data["checkout"].extend(checkout_calls)
 
-    """获取指定时间段内特定节点上各hostname的平均duration"""
-    start_dt = datetime.strptime(start, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone(timedelta(hours=8)))
-    end_dt = datetime.strptime(end, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone(timedelta(hours=8)))
-    start_minus_5 = start_dt - timedelta(minutes=10)
-    end_plus_5 = end_dt + timedelta(minutes=10)
-    start_dt = start_dt - timedelta(minutes=1)
-    end_dt = end_dt + timedelta(minutes=1)
-    start_minus = int(start_minus_5.timestamp()) * 1000000000
-    end_plus = int(end_plus_5.timestamp()) * 1000000000
+    spans = [data["grpc_method"] for data in span_data[service]]
+    if sls_query.SLS_WINDOW_STATS:
+        span_stats = query_latency_window_stats(
+            log_client, project, logstore, f'serviceName : "{service}"', "spanName", spans, start, end, isMedian)
+    else:
+        span_rows = query_latency_rows(log_client, project, logstore, f'serviceName : "{service}"',
+                                       "spanName", spans, start, end)
 
     service_list = []
     for data in span_data[service]:
-        # 构建查询语句，筛选特定节点并按hostname分组
         span = data["grpc_method"]
         target_service = data["service"]
-        query = f"""
-            ((serviceName : "{service}") AND startTime in [{start_minus} {end_plus}) AND (spanName : "{span}"))
-            | SELECT avg(duration) as avg_duration, (startTime/1000000 -startTime/1000000 %(15000 * 4)) as date FROM log GROUP BY date LIMIT 0, 999 
-            """
-        print(query)
-
-        request = GetLogsRequest(
-            project=project,
-            logstore=logstore,
-            query=query,
-            fromTime=start_minus_5.timestamp(),
-            toTime=end_plus_5.timestamp()
-        )
-        response = log_client.get_logs(request)
-        logs = response.get_logs()
-
-        # 核心改进：按time字段的时间顺序排序
-        # 1. 先将日志转换为包含时间和值的字典列表
-        log_list = []
-        for log in logs:
-            contents = log.get_contents()
-            # print(contents)
-            time_stamp_str = contents.get("date")  # 毫秒时间戳字符串，如"1758326280000"
-            avg_duration = contents.get("avg_duration")
-
-            if time_stamp_str and avg_duration:  # 过滤无效数据
-                try:
-                    # 转换为整数型时间戳（确保排序准确性）
-                    time_stamp = int(time_stamp_str)
-                    log_list.append({
-                        "time_ms": time_stamp,
-                        # 同时转换为可读时间格式（用于x轴显示）
-                        "time_str": datetime.fromtimestamp(time_stamp / 1000).replace(tzinfo=timezone(timedelta(hours=8))).strftime("%Y-%m-%d %H:%M:%S"),
-                        "avg_duration": float(avg_duration)
-                    })
-                except ValueError:
-                    print(f"⚠️ 无效的时间戳格式: {time_stamp_str}，已跳过")
-        # print(log_list)
-        # 按时间戳数值排序（从小到大，即时间先后顺序）
-        log_list.sort(key=lambda x: x["time_ms"])
-
-        # 1. 定义三个时段的时间范围（毫秒级）
-        # 前5分钟：[start_minus_5, start_dt)
-        before_start_ms = dt_to_ms(start_minus_5)
-        before_end_ms = dt_to_ms(start_dt)
-        # 目标时段：[start_dt, end_dt)
-        target_start_ms = dt_to_ms(start_dt)
-        target_end_ms = dt_to_ms(end_dt)
-        # 后5分钟：[end_dt, end_plus_5)
-        after_start_ms = dt_to_ms(end_dt)
-        after_end_ms = dt_to_ms(end_plus_5)
-
-        # 2. 数据分组到三个时段
-        before_data = []  # 前5分钟时延
-        target_data = []  # 目标时段时延
-        after_data = []  # 后5分钟时延
-
-        for item in log_list:
-            ts = item["time_ms"]
-            duration = item["avg_duration"]
-            if before_start_ms <= ts < before_end_ms:
-                before_data.append(duration)
-            elif target_start_ms <= ts < target_end_ms:
-                target_data.append(duration)
-            elif after_start_ms <= ts < after_end_ms:
-                after_data.append(duration)
-
-        # 3. 计算各时段平均时延（使用中位数可减少异常值影响）
-        def calc_statistic(data, is_median=True):
-            if not data:
-                return None
-            if is_median:
-                sorted_data = sorted(data)
-                n = len(sorted_data)
-                return sorted_data[n // 2] if n % 2 else (sorted_data[n // 2 - 1] + sorted_data[n // 2]) / 2
-            return sum(data) / len(data)
-
-        before_stat = calc_statistic(before_data, isMedian)  # 前5分钟统计值
-        target_stat = calc_statistic(target_data, isMedian)  # 目标时段统计值
-        after_stat = calc_statistic(after_data, isMedian)  # 后5分钟统计值
-
-        # 4. 输出统计结果
-        print("\n=== 时延统计对比 ===")
-        print(f"前5分钟（{start_minus_5.strftime('%H:%M:%S')}至{start_dt.strftime('%H:%M:%S')}）: "
-              f"{before_stat:.2f}" if before_stat else "前5分钟无数据")
-        print(f"目标时段（{start}至{end}）: "
-              f"{target_stat:.2f}" if target_stat else "目标时段无数据")
-        print(f"后5分钟（{end_dt.strftime('%H:%M:%S')}至{end_plus_5.strftime('%H:%M:%S')}）: "
-              f"{after_stat:.2f}" if after_stat else "后5分钟无数据")
-
-        # 5. 判断是否明显上升（阈值可调整，这里设为50%）
-        threshold = 1.5  # 超过前5分钟的1.5倍视为明显上升
-        if target_stat and before_stat and after_stat:
-            rise_ratio_before = (target_stat - before_stat) / before_stat * 100
-            rise_ratio_after = (target_stat - after_stat) / after_stat * 100
-            if target_stat > before_stat * threshold and target_stat > after_stat * threshold:
-                # if target_stat > (before_stat + after_stat) / 2 * threshold and target_stat > before_stat and target_stat > after_stat:
-                print(
-                    f"\n⚠️ 目标时段时延相比前10分钟上升{rise_ratio_before:.1f}%，相比后10分钟上升{rise_ratio_after:.1f}%，超过{int((threshold - 1) * 100)}%，存在明显上升！")
-                service_list.append(target_service)
-                # return True
-            else:
-                print(
-                    f"\n✅ 目标时段时延相比前10分钟上升{rise_ratio_before:.1f}%，相比后10分钟上升{rise_ratio_after:.1f}%，未超过{int((threshold - 1) * 100)}%，无明显上升。")
-                return False
+        print(f"\n📈 {service} → {span}")
+        if sls_query.SLS_WINDOW_STATS:
+            before_stat, target_stat, after_stat = span_stats[span]
+            flag = compare_latency(before_stat, target_stat, after_stat, start, end)
         else:
-            print("\n⚠️ 数据不足，无法判断时延变化。")
-            #return False
-
-        # # 6. 可视化（标记三个时段）
-        # plt.figure(figsize=(12, 6))
-        # x_dt = [datetime.strptime(item["time_str"], "%Y-%m-%d %H:%M:%S") for item in log_list]
-        # y = [item["avg_duration"] for item in log_list]
-        # print(x_dt)
-        # print(y)
-        #
-        # plt.plot(x_dt, y, marker='o', linestyle='-', color='b')
-        # # 用阴影标记三个时段
-        # plt.axvspan(start_minus_5, start_dt, color='lightgreen', alpha=0.3, label='前5分钟')
-        # plt.axvspan(start_dt, end_dt, color='lightcoral', alpha=0.3, label='目标时段')
-        # plt.axvspan(end_dt, end_plus_5, color='lightblue', alpha=0.3, label='后5分钟')
-        #
-        # # 显示图表
-        # plt.show()
+            flag, before_stat, target_stat, after_stat, _ = evaluate_latency(span_rows[span], start, end, isMedian)
+        if flag:
+            service_list.append(target_service)
+        elif target_stat and before_stat and after_stat:
+            # 有数据但没有明显上升
+            return False
     return True
 
-def get_log(log_client, project, logstore, service, start, end, isMedian=True, upper=True):
-    """获取指定时间段内特定节点上各hostname的平均duration"""
+def latency_windows(start, end):
+    """get_log 使用的时间窗：(前10分钟起点, 目标时段起点, 目标时段终点, 后10分钟终点)"""
     start_dt = datetime.strptime(start, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone(timedelta(hours=8)))
     end_dt = datetime.strptime(end, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone(timedelta(hours=8)))
     start_minus_5 = start_dt - timedelta(minutes=10)
     end_plus_5 = end_dt + timedelta(minutes=10)
     start_dt = start_dt - timedelta(minutes=1)
     end_dt = end_dt + timedelta(minutes=1)
+    return start_minus_5, start_dt, end_dt, end_plus_5
+
+
+def get_log(log_client, project, logstore, service, start, end, isMedian=True, upper=True):
+    """获取指定时间段内特定节点上各hostname的平均duration"""
+    from aliyun.log import GetLogsRequest
+
+    if sls_query.SLS_WINDOW_STATS:
+        stats = query_latency_window_stats(log_client, project, logstore, f'serviceName : "{service}"', None,
+                                           [None], start, end, isMedian)[None]
+        return window_latency_result(stats, start, end, upper)
+
+    start_minus_5, start_dt, end_dt, end_plus_5 = latency_windows(start, end)
     start_minus = int(start_minus_5.timestamp()) * 1000000000
     end_plus = int(end_plus_5.timestamp()) * 1000000000
 
@@ -290,13 +122,173 @@ def get_log(log_client, project, logstore, service, start, end, isMedian=True, u
         toTime=end_plus_5.timestamp()
     )
     response = log_client.get_logs(request)
-    logs = response.get_logs()
+    rows = [log.get_contents() for log in response.get_logs()]
+    return evaluate_latency(rows, start, end, isMedian, upper)
+
+
+def query_latency_rows(log_client, project, logstore, base_filter, field, values, start, end):
+    """
+    一条 GROUP BY field, date 查询取回 base_filter 下 field 的每个取值的每分钟平均时延
+
+    SQL 返回每个 (field, 分钟) 的 sum/count，本地按SLS短语匹配规则把 field 的取值归到
+    `field : "value"` 条件下再求平均，与逐个取值单独查询 avg(duration) 得到的序列相同。
+
+    Returns:
+        dict: {value: [{"date": 毫秒时间戳, "avg_duration": 平均时延}]}，可直接交给 evaluate_latency
+    """
+    from aliyun.log import GetLogsRequest
+
+    values = list(dict.fromkeys(values))
+    if not values:
+        return {}
+    start_minus_5, start_dt, end_dt, end_plus_5 = latency_windows(start, end)
+    start_minus = int(start_minus_5.timestamp()) * 1000000000
+    end_plus = int(end_plus_5.timestamp()) * 1000000000
+
+    value_filter = " OR ".join(f'{field} : "{value}"' for value in values)
+    if base_filter:
+        value_filter = f"({base_filter}) AND ({value_filter})"
+    query = f"""
+    (({value_filter}) AND startTime in [{start_minus} {end_plus}))
+    | SELECT {field}, sum(duration) as total_duration, count(*) as span_count, (startTime/1000000 -startTime/1000000 %(15000 * 4)) as date FROM log GROUP BY {field}, date LIMIT 0, 100000 
+    """
+    print(query)
+
+    request = GetLogsRequest(
+        project=project,
+        logstore=logstore,
+        query=query,
+        fromTime=start_minus_5.timestamp(),
+        toTime=end_plus_5.timestamp()
+    )
+    response = log_client.get_logs(request)
+
+    # {value: {date: [总时延, span数]}}
+    buckets = {value: {} for value in values}
+    for log in response.get_logs():
+        contents = log.get_contents()
+        try:
+            date = contents.get("date")
+            total = float(contents.get("total_duration"))
+            count = int(contents.get("span_count"))
+        except (TypeError, ValueError):
+            continue
+        for value in values:
+            if phrase_match(contents.get(field, ""), value):
+                bucket = buckets[value].setdefault(date, [0.0, 0])
+                bucket[0] += total
+                bucket[1] += count
+
+    return {value: [{"date": date, "avg_duration": str(total / count)}
+                    for date, (total, count) in buckets[value].items() if count]
+            for value in values}
+
+
+def get_log_batch(log_client, project, logstore, services, start, end, isMedian=True, upper=True):
+    """
+    get_log 的批量版本：一次 GROUP BY serviceName, date 查询取回所有服务的时延序列
+
+    Returns:
+        dict: {service: (flag, before, target, after, data)}，与 get_log 的返回值相同
+    """
+    if sls_query.SLS_WINDOW_STATS:
+        service_stats = query_latency_window_stats(log_client, project, logstore, "", "serviceName", services,
+                                                   start, end, isMedian)
+        return {service: window_latency_result(stats, start, end, upper) for service, stats in service_stats.items()}
+
+    service_rows = query_latency_rows(log_client, project, logstore, "", "serviceName", services, start, end)
+    results = {}
+    for service, rows in service_rows.items():
+        print(f"\n📈 {service} 时延序列")
+        results[service] = evaluate_latency(rows, start, end, isMedian, upper)
+    return results
+
+
+def latency_periods(start, end):
+    """三个时段的毫秒边界（左闭右开），与 evaluate_latency 的划分一致"""
+    start_minus_5, start_dt, end_dt, end_plus_5 = latency_windows(start, end)
+    return [("before", dt_to_ms(start_minus_5), dt_to_ms(start_dt)),
+            ("target", dt_to_ms(start_dt), dt_to_ms(end_dt)),
+            ("after", dt_to_ms(end_dt), dt_to_ms(end_plus_5))]
+
+
+def query_latency_window_stats(log_client, project, logstore, base_filter, field, values, start, end, isMedian=True):
+    """
+    时段统计模式（--window-stats）：每分钟平均时延在三个时段上的中位数（isMedian=False 时为平均值）
+    直接在SLS里算好，每条序列只返回三个数
+
+    中位数用 approx_percentile 近似计算。field 为空时 values 只能是 [None]，查询 base_filter 下的整体序列。
+    field 的多个取值命中同一个 `field : "value"` 条件时（如 frontend 与 frontend-web），
+    各自的中位数无法合并，这个条件改为单独查询。
+
+    Returns:
+        dict: {value: (before, target, after)}，没有数据的时段为 None
+    """
+    from aliyun.log import GetLogsRequest
+
+    values = list(dict.fromkeys(values))
+    if not values:
+        return {}
+    start_minus_5, start_dt, end_dt, end_plus_5 = latency_windows(start, end)
+    start_minus = int(start_minus_5.timestamp()) * 1000000000
+    end_plus = int(end_plus_5.timestamp()) * 1000000000
+
+    filters = [base_filter] if base_filter else []
+    if field:
+        filters.append(" OR ".join(f'{field} : "{value}"' for value in values))
+    search = " AND ".join(f"({item})" for item in filters) or "*"
+    query = window_stats_query(f"({search}) AND startTime in [{start_minus} {end_plus})", "avg(duration)",
+                               latency_periods(start, end), "median" if isMedian else "mean", field)
+    print(query)
+
+    request = GetLogsRequest(
+        project=project,
+        logstore=logstore,
+        query=query,
+        fromTime=start_minus_5.timestamp(),
+        toTime=end_plus_5.timestamp()
+    )
+    response = log_client.get_logs(request)
+    stats = parse_window_stats([log.get_contents() for log in response.get_logs()], field)
+
+    def as_tuple(periods):
+        return periods.get("before"), periods.get("target"), periods.get("after")
+
+    if not field:
+        return {None: as_tuple(stats)}
+    results = {}
+    for value in values:
+        matched = [name for name in stats if phrase_match(name, value)]
+        if len(matched) > 1:
+            value_filter = f'{field} : "{value}"'
+            single_filter = f"({base_filter}) AND ({value_filter})" if base_filter else value_filter
+            results[value] = query_latency_window_stats(log_client, project, logstore, single_filter, None, [None],
+                                                        start, end, isMedian)[None]
+        else:
+            results[value] = as_tuple(stats[matched[0]] if matched else {})
+    return results
+
+
+def window_latency_result(stats, start, end, upper=True):
+    """时段统计模式下与 get_log 相同的返回值，时延数据只有三个时段的统计值"""
+    before_stat, target_stat, after_stat = stats
+    flag = compare_latency(before_stat, target_stat, after_stat, start, end, upper)
+    return flag, before_stat, target_stat, after_stat, [before_stat, target_stat, after_stat]
+
+
+def evaluate_latency(rows, start, end, isMedian=True, upper=True):
+    """
+    按 前10分钟/目标时段/后10分钟 比较每分钟平均时延，判断目标时段是否明显上升（upper=False 时判断下降）
+
+    Args:
+        rows: SLS返回的行，包含 date（毫秒时间戳）和 avg_duration
+    """
+    start_minus_5, start_dt, end_dt, end_plus_5 = latency_windows(start, end)
 
     # 核心改进：按time字段的时间顺序排序
     # 1. 先将日志转换为包含时间和值的字典列表
     log_list = []
-    for log in logs:
-        contents = log.get_contents()
+    for contents in rows:
         #print(contents)
         time_stamp_str = contents.get("date")  # 毫秒时间戳字符串，如"1758326280000"
         avg_duration = contents.get("avg_duration")
@@ -357,6 +349,30 @@ def get_log(log_client, project, logstore, service, start, end, isMedian=True, u
     target_stat = calc_statistic(target_data, isMedian)  # 目标时段统计值
     after_stat = calc_statistic(after_data, isMedian)  # 后5分钟统计值
 
+    flag = compare_latency(before_stat, target_stat, after_stat, start, end, upper)
+
+    # # 6. 可视化（标记三个时段）
+    # plt.figure(figsize=(12, 6))
+    # x_dt = [datetime.strptime(item["time_str"], "%Y-%m-%d %H:%M:%S") for item in log_list]
+    # y = [item["avg_duration"] for item in log_list]
+    # print(x_dt)
+    # print(y)
+    #
+    # plt.plot(x_dt, y, marker='o', linestyle='-', color='b')
+    # # 用阴影标记三个时段
+    # plt.axvspan(start_minus_5, start_dt, color='lightgreen', alpha=0.3, label='前5分钟')
+    # plt.axvspan(start_dt, end_dt, color='lightcoral', alpha=0.3, label='目标时段')
+    # plt.axvspan(end_dt, end_plus_5, color='lightblue', alpha=0.3, label='后5分钟')
+    #
+    # # 显示图表
+    # plt.show()
+    return flag, before_stat, target_stat, after_stat, before_data + target_data + after_data
+
+
+def compare_latency(before_stat, target_stat, after_stat, start, end, upper=True):
+    """判断目标时段的时延相比前后两个时段是否明显上升（upper=False 时判断下降）"""
+    start_minus_5, start_dt, end_dt, end_plus_5 = latency_windows(start, end)
+
     # 4. 输出统计结果
     print("\n=== 时延统计对比 ===")
     print(f"前5分钟（{start_minus_5.strftime('%H:%M:%S')}至{start_dt.strftime('%H:%M:%S')}）: "
@@ -375,7 +391,7 @@ def get_log(log_client, project, logstore, service, start, end, isMedian=True, u
             if target_stat > before_stat * threshold and target_stat > after_stat * threshold:
             # if target_stat > (before_stat + after_stat) / 2 * threshold and target_stat > before_stat and target_stat > after_stat:
                 print(f"\n⚠️ 目标时段时延相比前10分钟上升{rise_ratio_before:.1f}%，相比后10分钟上升{rise_ratio_after:.1f}%，超过{int((threshold - 1) * 100)}%，存在明显上升！")
-                return True, before_stat, target_stat, after_stat, before_data + target_data + after_data
+                return True
             else:
                 print(f"\n✅ 目标时段时延相比前10分钟上升{rise_ratio_before:.1f}%，相比后10分钟上升{rise_ratio_after:.1f}%，未超过{int((threshold - 1) * 100)}%，无明显上升。")
         else:
@@ -389,31 +405,15 @@ def get_log(log_client, project, logstore, service, start, end, isMedian=True, u
                 # if target_stat > (before_stat + after_stat) / 2 * threshold and target_stat > before_stat and target_stat > after_stat:
                 print(
                     f"\n⚠️ 目标时段时延相比前10分钟上升{rise_ratio_before:.1f}%，相比后10分钟上升{rise_ratio_after:.1f}%，超过{int((threshold - 1) * 100)}%，存在明显下降！")
-                return True, before_stat, target_stat, after_stat, before_data + target_data + after_data
+                return True
             else:
                 print(
                     f"\n✅ 目标时段时延相比前10分钟上升{rise_ratio_before:.1f}%，相比后10分钟上升{rise_ratio_after:.1f}%，未超过{int((threshold - 1) * 100)}%，无明显下降。")
         else:
             print("\n⚠️ 数据不足，无法判断时延变化。")
+    return False
 
 
-    # # 6. 可视化（标记三个时段）
-    # plt.figure(figsize=(12, 6))
-    # x_dt = [datetime.strptime(item["time_str"], "%Y-%m-%d %H:%M:%S") for item in log_list]
-    # y = [item["avg_duration"] for item in log_list]
-    # print(x_dt)
-    # print(y)
-    #
-    # plt.plot(x_dt, y, marker='o', linestyle='-', color='b')
-    # # 用阴影标记三个时段
-    # plt.axvspan(start_minus_5, start_dt, color='lightgreen', alpha=0.3, label='前5分钟')
-    # plt.axvspan(start_dt, end_dt, color='lightcoral', alpha=0.3, label='目标时段')
-    # plt.axvspan(end_dt, end_plus_5, color='lightblue', alpha=0.3, label='后5分钟')
-    #
-    # # 显示图表
-    # plt.show()
-    return False, before_stat, target_stat, after_stat, before_data + target_data + after_data
-
 if __name__ == "__main__":
     serveice_list = []
     problem_id = "059"
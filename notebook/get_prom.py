@@ -1,13 +1,13 @@
 import ast
-import json
-import os
 import sys
-import time
 from datetime import datetime, timedelta
 
 import numpy as np
-from aliyun.log import LogClient, GetLogsRequest
-from matplotlib import pyplot as plt
+
+from get_entity import get_entity_metric, parse_labels
+from pool import as_completed_until
+from problems import read_input_data
+from session import get_session
 
 
 sys.path.append('..')
@@ -16,163 +16,36 @@ PROJECT_NAME = "proj-xtrace-a46b97cfdc1332238f714864c014a1b-cn-qingdao"
 LOGSTORE_NAME = "logstore-tracing"
 REGION = "cn-qingdao"
 
-# Environment variables
-STS_ROLE_ARN = os.getenv('ALIBABA_CLOUD_ROLE_ARN', 'acs:ram::1672753017899339:role/tianchi-user-a')
-STS_SESSION_NAME = os.getenv('ALIBABA_CLOUD_ROLE_SESSION_NAME', 'my-sls-access')
-
-# CMS 指标配置
-CMS_WORKSPACE = "tianchi-workspace"
-CMS_ENDPOINT = os.getenv("CMS_ENDPOINT", "cms.cn-qingdao.aliyuncs.com")
-try:
-    from test_cms_query import TestCMSQuery
-
-    print("✅ TestCMSQuery imported successfully")
-except ImportError as e:
-    print(f"⚠️ Warning: Could not import TestCMSQuery: {e}")
-    print("💡 Please install required dependencies: pip install -r requirements.txt")
-    TestCMSQuery = None
-# 初始化CMS测试客户端，用于指标查询
-# 如果存在导入问题通过直接创建类修复(except)
-try:
-    if TestCMSQuery is not None:
-        cms_tester = TestCMSQuery()
-        cms_tester.setUp()
-        print(f"✅ 已通过导入的 TestCMSQuery 初始化CMS客户端")
-    else:
-        raise ImportError("TestCMSQuery is None")
-except:
-    print("⚠️  TestCMSQuery import failed, creating CMS client directly...")
-
-    import os
-    from alibabacloud_cms20240330.client import Client as Cms20240330Client
-    from alibabacloud_tea_openapi import models as open_api_models
-    from alibabacloud_cms20240330 import models as cms_20240330_models
-    from alibabacloud_tea_util import models as util_models
-
-
-    class DirectCMSClient:
-        def __init__(self):
-            self.access_key_id = os.getenv('ALIBABA_CLOUD_ACCESS_KEY_ID')
-            self.access_key_secret = os.getenv('ALIBABA_CLOUD_ACCESS_KEY_SECRET')
-            self.workspace = CMS_WORKSPACE
-            self.endpoint = CMS_ENDPOINT
-
-            if not self.access_key_id or not self.access_key_secret:
-                raise ValueError("请设置环境变量 ALIBABA_CLOUD_ACCESS_KEY_ID 和 ALIBABA_CLOUD_ACCESS_KEY_SECRET")
-
-            config = open_api_models.Config(
-                access_key_id=self.access_key_id,
-                access_key_secret=self.access_key_secret,
-            )
-            config.endpoint = self.endpoint
-            self.cms_client = Cms20240330Client(config)
-
-        def _execute_spl_query(self, query: str, from_time: int = None, to_time: int = None):
-            """执行SPL查询"""
-            if from_time is None:
-                from_time = int(time.time()) - 60 * 60 * 1
-            if to_time is None:
-                to_time = int(time.time())
-
-            try:
-                headers = cms_20240330_models.GetEntityStoreDataHeaders()
-                request = cms_20240330_models.GetEntityStoreDataRequest(
-                    query=query,
-                    from_=from_time,
-                    to=to_time
-                )
-                runtime = util_models.RuntimeOptions()
-                response = self.cms_client.get_entity_store_data_with_options(
-                    self.workspace, request, headers, runtime
-                )
-                return response.body
-            except Exception as e:
-                print(f"❌ CMS查询错误: {e}")
-                return None
-
-
-    cms_tester = DirectCMSClient()
-    print(f"✅ CMS client created directly")
-
-print(f"🔧 CMS客户端已初始化")
-print(f"🔧 workspace: {CMS_WORKSPACE}")
-print(f"🔧 Endpoint: {CMS_ENDPOINT}")
-
-
-def get_sts_credentials():
-    try:
-        from aliyunsdkcore.client import AcsClient
-        from aliyunsdksts.request.v20150401 import AssumeRoleRequest
-
-        MAIN_ACCOUNT_ACCESS_KEY_ID = os.getenv('ALIBABA_CLOUD_ACCESS_KEY_ID')
-        MAIN_ACCOUNT_ACCESS_KEY_SECRET = os.getenv('ALIBABA_CLOUD_ACCESS_KEY_SECRET')
-        ALIBABA_CLOUD_ROLE_ARN = os.getenv('ALIBABA_CLOUD_ROLE_ARN', 'acs:ram::1672753017899339:role/tianchi-user-a')
-        STS_SESSION_NAME = os.getenv('ALIBABA_CLOUD_ROLE_SESSION_NAME', 'my-sls-access')
-
-        if not MAIN_ACCOUNT_ACCESS_KEY_ID or not MAIN_ACCOUNT_ACCESS_KEY_SECRET:
-            return None, None, None
-
-        client = AcsClient(MAIN_ACCOUNT_ACCESS_KEY_ID, MAIN_ACCOUNT_ACCESS_KEY_SECRET, REGION)
-        request = AssumeRoleRequest.AssumeRoleRequest()
-        request.set_RoleArn(ALIBABA_CLOUD_ROLE_ARN)
-        request.set_RoleSessionName(STS_SESSION_NAME)
-        request.set_DurationSeconds(3600)
-
-        response = client.do_action_with_exception(request)
-        response_data = json.loads(response)
-        credentials = response_data['Credentials']
-        return (credentials['AccessKeyId'], credentials['AccessKeySecret'], credentials['SecurityToken'])
-    except Exception as e:
-        print(f"❌ 获取STS凭证失败: {e}")
-        return None, None, None
-
-
-temp_access_key_id, temp_access_key_secret, security_token = get_sts_credentials()
-if not temp_access_key_id:
-    print("❌ 无法获取STS临时凭证，分析终止")
-
-try:
-    from aliyun.log import LogClient
-
-    sls_endpoint = os.getenv("SLS_ENDPOINT", "cn-qingdao.log.aliyuncs.com")
-    log_client = LogClient(sls_endpoint, temp_access_key_id, temp_access_key_secret, security_token)
-except Exception as e:
-    print(f"❌ 创建SLS客户端失败: {e}")
-
-
-def read_input_data(input_file_path):
-    """
-    Read and parse input data from JSONL file
-
-    Args:
-        input_file_path: Path to the input JSONL file
-
-    Returns:
-        list: List of parsed JSON objects
-    """
-    data = []
-
-    try:
-        with open(input_file_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if line:  # Skip empty lines
-                    try:
-                        item = json.loads(line)
-                        data.append(item)
-                    except json.JSONDecodeError as e:
-                        print(f"⚠️ Failed to parse line: {line[:100]}... Error: {e}")
-                        continue
-
-        print(f"✅ Successfully read {len(data)} records from {input_file_path}")
-        return data
-
-    except FileNotFoundError:
-        print(f"❌ Input file not found: {input_file_path}")
-        return []
-    except Exception as e:
-        print(f"❌ Failed to read input file: {e}")
-        return []
+# 共享的SLS/CMS客户端，凭证在第一次查询时获取并在后台自动刷新
+log_client = get_session().log_client
+cms_tester = get_session().cms_client
+
+ECS_METRICSTORE = ".metricstore with(project='workspace-tianchi-2025-0828-01', metricstore='aliyun-prom-rw-16e081404ce19b5294c7967ff61d')"
+
+# analyze_network 依次检查的TCP异常指标
+NETWORK_METRICS = [
+    "node_netstat_Tcp_OutRsts",
+    "node_netstat_TcpExt_TCPSynRetrans",
+    "node_netstat_Tcp_RetransSegs",
+    "node_netstat_Tcp_InErrs",
+]
+
+# JVM类故障（jvmChaos/LargeGc）检查的ARMS JVM指标
+JVM_METRICS = {
+    "gc": "arms_jvm_gc_delta",
+    "heap": "arms_jvm_mem_used_bytes",
+    "threads": "arms_jvm_threads_count",
+}
+JVM_FAULTS = ("jvmChaos", "LargeGc")
+# detect_jvm_anomalies 的判定阈值：(相对倍数, 同一单位下的绝对增量)，绝对增量为None时只看相对倍数。
+# GC次数沿用 detect_anomaly 的规则；堆内存以字节计、线程数以个计，+20 对它们几乎等于没有门槛
+JVM_THRESHOLDS = {
+    "gc": (1.5, 20),
+    "heap": (1.5, None),
+    "threads": (1.5, None),
+}
+# 原先的GC检查固定针对 inventory，候选根因中没有它的JVM故障时仍检查并按 jvmChaos 输出
+DEFAULT_JVM_FAULTS = {"inventory": ("jvmChaos",)}
 
 
 def detect_anomaly(normal_values, pre_values, post_values, threshold=1.5):
@@ -236,6 +109,10 @@ def split_time_period_data(timestamps, values, pre10_end, normal_end):
 def get_result(result):
     # 1. 从result中提取data列表（原始结果是字典，直接用键访问）
     # 注意：根据你的打印结果，result是字典，不是对象，所以用['data']而非.result.data
+    # 查询重试后仍失败时 result 为None
+    if result is None:
+        print(f"⚠️ 查询失败，没有返回结果")
+        return [], []
     data_list = result.data
     if not data_list:
         print(f"⚠️ 结果中 'data' 字段为空")
@@ -263,7 +140,198 @@ def get_result(result):
     return timestamps, cpu_values
 
 
-def analyze_network(normal_start, normal_end, Target_ECS, show):
+def jvm_faults(candidate_root_causes):
+    """
+    候选根因中每个服务的JVM故障类型
+
+    Returns:
+        dict: {service: [jvmChaos/LargeGc]}，按候选根因中出现的顺序；
+        inventory 即使没有JVM类候选根因也会出现（见 DEFAULT_JVM_FAULTS）
+    """
+    faults = {}
+    for candidate in candidate_root_causes:
+        service, _, fault = candidate.rpartition('.')
+        if fault in JVM_FAULTS and fault not in faults.setdefault(service, []):
+            faults[service].append(fault)
+    for service, defaults in DEFAULT_JVM_FAULTS.items():
+        faults.setdefault(service, list(defaults))
+    return faults
+
+
+def jvm_services(candidate_root_causes):
+    """需要检查JVM指标的服务：候选根因中带 jvmChaos/LargeGc 的服务，以及 inventory"""
+    return list(jvm_faults(candidate_root_causes))
+
+
+def classify_jvm_fault(anomalies, faults):
+    """
+    把一个服务的JVM指标异常对应到它在候选根因中的故障类型
+
+    只有GC异常时为 LargeGc，GC异常同时堆内存或线程数升高时为 jvmChaos；
+    首选的类型不在该服务的候选根因中时用另一个。
+
+    Args:
+        anomalies: detect_jvm_anomalies 中一个服务的结果
+        faults: jvm_faults 中该服务的故障类型
+
+    Returns:
+        str: 故障类型，GC无异常或服务没有JVM类候选根因时为None
+    """
+    if not faults or not anomalies.get('gc', (False,))[0]:
+        return None
+    escalated = any(anomalies.get(kind, (False,))[0] for kind in ('heap', 'threads'))
+    preferred = "jvmChaos" if escalated else "LargeGc"
+    return preferred if preferred in faults else faults[0]
+
+
+def get_jvm_metric(normal_start, normal_end, services, metric):
+    """
+    一次 entity-set 查询选中所有JVM服务，取回同一个JVM指标的时序
+
+    Returns:
+        dict: {service: (timestamps, values)}，可作为 analyze_gc 的 series 参数
+    """
+    pre10_start = int((normal_start - timedelta(minutes=10)).timestamp())
+    post10_end = int((normal_end + timedelta(minutes=10)).timestamp())
+    return get_entity_metric(cms_tester, ('apm', 'apm.service'), ('apm', 'apm.metric.jvm', metric), "service",
+                             services, pre10_start, post10_end)
+
+
+def get_jvm_metrics(normal_start, normal_end, services, executor=None, deadline=None):
+    """
+    取回所有JVM服务的GC、堆内存和线程数时序，每个指标一条查询
+
+    Args:
+        executor: 传入查询线程池时各指标的查询并行执行
+        deadline: 单题截止时间，到达时未返回的指标按没有数据处理
+
+    Returns:
+        dict: {service: {指标类别: (timestamps, values)}}，指标类别为 JVM_METRICS 的键
+    """
+    services = list(dict.fromkeys(services))
+    if not services:
+        return {}
+    if executor is not None:
+        futures = {executor.submit(get_jvm_metric, normal_start, normal_end, services, metric): kind
+                   for kind, metric in JVM_METRICS.items()}
+        results = {futures[future]: future.result() for future in as_completed_until(futures, deadline)}
+    else:
+        results = {kind: get_jvm_metric(normal_start, normal_end, services, metric)
+                   for kind, metric in JVM_METRICS.items()}
+    return merge_jvm_metrics(services, results)
+
+
+def merge_jvm_metrics(services, results):
+    """
+    把各指标的查询结果整理成 get_jvm_metrics 的返回格式
+
+    Args:
+        results: {指标类别: get_jvm_metric 的结果}，缺少的指标类别按没有数据处理
+    """
+    series = {service: {} for service in dict.fromkeys(services)}
+    for kind in JVM_METRICS:
+        for service, values in results.get(kind, {}).items():
+            series[service][kind] = values
+    return series
+
+
+def detect_jvm_anomalies(normal_start, normal_end, series, thresholds=JVM_THRESHOLDS):
+    """
+    对所有服务的所有JVM指标一次性做 detect_anomaly 的检测
+
+    所有时序拼成一个数组，按 (时序, 时段) 用 bincount 求各时段平均值，判定规则与 detect_anomaly 相同，
+    只是倍数和绝对增量按指标类别取 thresholds 中的值。
+
+    Args:
+        series: get_jvm_metrics 的返回值
+        thresholds: {指标类别: (相对倍数, 绝对增量或None)}
+
+    Returns:
+        dict: {service: {指标类别: (是否异常, 正常时段平均值, 前时段平均值, 后时段平均值)}}，缺少数据的时序不出现
+    """
+    keys = [(service, kind) for service, metrics in series.items() for kind, (timestamps, _) in metrics.items()
+            if timestamps]
+    if not keys:
+        return {}
+    lengths = [len(series[service][kind][0]) for service, kind in keys]
+    ts = np.array([dt.timestamp() for service, kind in keys for dt in series[service][kind][0]])
+    values = np.concatenate([np.asarray(series[service][kind][1], dtype=float) for service, kind in keys])
+    group = np.repeat(np.arange(len(keys)), lengths)
+
+    # 与 split_time_period_data 相同的分段：前10分钟 / 正常时段 / 后10分钟
+    pre10_end = datetime.fromtimestamp(int(normal_start.timestamp())).timestamp()
+    normal_end_ts = datetime.fromtimestamp(int(normal_end.timestamp())).timestamp()
+    period = np.where(ts <= pre10_end, 0, np.where(ts <= normal_end_ts, 1, 2))
+    index = group * 3 + period
+    sums = np.bincount(index, weights=values, minlength=len(keys) * 3).reshape(-1, 3)
+    counts = np.bincount(index, minlength=len(keys) * 3).reshape(-1, 3)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = sums / counts
+    pre_avg, normal_avg, post_avg = means.T
+    baseline_avg = (pre_avg + post_avg) / 2
+    factor = np.array([thresholds[kind][0] for _, kind in keys])
+    margin = np.array([np.inf if thresholds[kind][1] is None else thresholds[kind][1] for _, kind in keys])
+    is_anomaly = ((counts > 0).all(axis=1)
+                  & ((normal_avg > baseline_avg * factor) | (normal_avg > baseline_avg + margin))
+                  & (pre_avg < normal_avg) & (post_avg < normal_avg))
+
+    anomalies = {}
+    for i, (service, kind) in enumerate(keys):
+        if not (counts[i] > 0).all():
+            continue
+        anomalies.setdefault(service, {})[kind] = (bool(is_anomaly[i]), normal_avg[i], pre_avg[i], post_avg[i])
+    return anomalies
+
+
+def get_network_series(normal_start, normal_end, instances):
+    """
+    一条PromQL取回所有候选ECS节点的全部TCP异常指标
+
+    每个指标按 instanceId 分组求和，再用 label_replace 打上 metric 标签，用 or 拼成一个查询。
+
+    Returns:
+        dict: {instanceId: {指标名: (timestamps, values)}}，可作为 analyze_network 的 series 参数
+    """
+    instances = list(dict.fromkeys(instances))
+    if not instances:
+        return {}
+    pre10_start = int((normal_start - timedelta(minutes=10)).timestamp())
+    post10_end = int((normal_end + timedelta(minutes=10)).timestamp())
+    selector = "|".join(instances)
+    expr = " or ".join(
+        f'label_replace(sum(irate({metric}{{instanceId=~"{selector}"}}[1m])) by (instanceId), "metric", "{metric}", "", "")'
+        for metric in NETWORK_METRICS)
+    query = f"""
+    {ECS_METRICSTORE}
+    | prom-call promql_query_range('{expr}', '60s')
+    """
+    result = cms_tester._execute_spl_query(
+        query.strip(),
+        from_time=pre10_start,
+        to_time=post10_end
+    )
+    if result is None:
+        return {instance: {} for instance in instances}
+
+    header = list(result.header or [])
+    labels_index = header.index("__labels__") if "__labels__" in header else 0
+    name_index = header.index("__name__") if "__name__" in header else 1
+    ts_index = header.index("__ts__") if "__ts__" in header else 2
+    value_index = header.index("__value__") if "__value__" in header else 3
+    series = {instance: {} for instance in instances}
+    for row in result.data or []:
+        labels = parse_labels(row[labels_index])
+        instance = labels.get("instanceId")
+        metric = labels.get("metric") or row[name_index]
+        if instance not in series or metric not in NETWORK_METRICS:
+            continue
+        timestamps = [datetime.fromtimestamp(ts / 1e9) for ts in ast.literal_eval(row[ts_index])]
+        series[instance][metric] = (timestamps, [float(val) for val in ast.literal_eval(row[value_index])])
+    return series
+
+
+def analyze_network(normal_start, normal_end, Target_ECS, show, series=None):
+    """series 为批量查询(get_network_series)取回的 {指标名: (timestamps, values)}，为空时逐个指标单独查询"""
     # 1. 计算三个时段的时间戳（转为int类型，CMS查询要求）
     # 前10分钟：normal_start - 10min 到 normal_start
     pre10_start = int((normal_start - timedelta(minutes=10)).timestamp())
@@ -275,37 +343,23 @@ def analyze_network(normal_start, normal_end, Target_ECS, show):
     post10_start = int(normal_end.timestamp())
     post10_end = int((normal_end + timedelta(minutes=10)).timestamp())
 
-    # 2. 查询语句
-    query_list = []
-    query_list.append(f"""
-    .metricstore with(project='workspace-tianchi-2025-0828-01', metricstore='aliyun-prom-rw-16e081404ce19b5294c7967ff61d')
-    | prom-call promql_query_range('sum(irate(node_netstat_Tcp_OutRsts{{instanceId=~"{Target_ECS}"}}[1m]))', '60s')
-    """)
-
-    query_list.append(f"""
-    .metricstore with(project='workspace-tianchi-2025-0828-01', metricstore='aliyun-prom-rw-16e081404ce19b5294c7967ff61d')
-    | prom-call promql_query_range('sum(irate(node_netstat_TcpExt_TCPSynRetrans{{instanceId=~"{Target_ECS}"}}[1m]))', '60s')
-    """)
-
-    query_list.append(f"""
-    .metricstore with(project='workspace-tianchi-2025-0828-01', metricstore='aliyun-prom-rw-16e081404ce19b5294c7967ff61d')
-    | prom-call promql_query_range('sum(irate(node_netstat_Tcp_RetransSegs{{instanceId=~"{Target_ECS}"}}[1m]))', '60s')
-    """)
-
-    query_list.append(f"""
-    .metricstore with(project='workspace-tianchi-2025-0828-01', metricstore='aliyun-prom-rw-16e081404ce19b5294c7967ff61d')
-    | prom-call promql_query_range('sum(irate(node_netstat_Tcp_InErrs{{instanceId=~"{Target_ECS}"}}[1m]))', '60s')
-    """)
-
     anomalyNum = 0
-    for query in query_list:
-        result = cms_tester._execute_spl_query(
-            query.strip(),
-            from_time=pre10_start,
-            to_time=post10_end
-        )
+    for metric in NETWORK_METRICS:
+        if series is not None:
+            timestamps, network = series.get(metric, ([], []))
+        else:
+            # 2. 查询语句
+            query = f"""
+            {ECS_METRICSTORE}
+            | prom-call promql_query_range('sum(irate({metric}{{instanceId=~"{Target_ECS}"}}[1m]))', '60s')
+            """
+            result = cms_tester._execute_spl_query(
+                query.strip(),
+                from_time=pre10_start,
+                to_time=post10_end
+            )
 
-        timestamps, network = get_result(result)
+            timestamps, network = get_result(result)
         if len(timestamps) == 0:
             continue
 
@@ -336,6 +390,8 @@ def analyze_network(normal_start, normal_end, Target_ECS, show):
             print(f"🟢 异常检测: 检测时段network处于正常范围")
 
         if show:
+            from matplotlib import pyplot as plt
+
             plt.figure(figsize=(12, 6))
 
             plt.plot(timestamps, network, marker='o', linestyle='-', color='b')
@@ -353,7 +409,8 @@ def analyze_network(normal_start, normal_end, Target_ECS, show):
             plt.show()
     return anomalyNum
 
-def analyze_gc(normal_start, normal_end, Target_ECS, show):
+def analyze_gc(normal_start, normal_end, Target_ECS, show, series=None):
+    """series 为批量查询(get_jvm_metric)取回的 (timestamps, values)，为空时单独查询 Target_ECS 服务"""
     # 1. 计算三个时段的时间戳（转为int类型，CMS查询要求）
     # 前10分钟：normal_start - 10min 到 normal_start
     pre10_start = int((normal_start - timedelta(minutes=10)).timestamp())
@@ -370,20 +427,20 @@ def analyze_gc(normal_start, normal_end, Target_ECS, show):
     # .metricstore with(project='workspace-tianchi-2025-0828-01', metricstore='aliyun-prom-arms-67b1a0473064fa06ae361d42ad')
     # | prom-call promql_query_range('sum (sum_over_time_lorc(arms_jvm_gc_delta{{acs_arms_service_id="hwx28v3j7p@680213ea70b15a61c56ed",gen="old",host=~".*", }}[1m]))', '60s')
     # """
-    query = f"""
-    .entity_set with(domain='apm', name='apm.service', query=`service='inventory'`)
-    | entity-call get_metric('apm', 'apm.metric.jvm', 'arms_jvm_gc_delta', 'range', '1m')
-    """
-
-    anomalyNum = 0
-    result = cms_tester._execute_spl_query(
-        query.strip(),
-        from_time=pre10_start,
-        to_time=post10_end
-    )
-    print(result)
+    if series is not None:
+        timestamps, network = series
+    else:
+        query = f"""
+        .entity_set with(domain='apm', name='apm.service', query=`service='{Target_ECS}'`)
+        | entity-call get_metric('apm', 'apm.metric.jvm', '{JVM_METRICS["gc"]}', 'range', '1m')
+        """
+        result = cms_tester._execute_spl_query(
+            query.strip(),
+            from_time=pre10_start,
+            to_time=post10_end
+        )
 
-    timestamps, network = get_result(result)
+        timestamps, network = get_result(result)
 
     # 4. 分割三个时段的数据
     pre10_end_dt = datetime.fromtimestamp(pre10_end)
@@ -396,7 +453,7 @@ def analyze_gc(normal_start, normal_end, Target_ECS, show):
     is_anomaly, normal_avg, pre_avg, post_avg = detect_anomaly(
         normal_values, pre_values, post_values
     )
-    max_gc = max(normal_values)
+    max_gc = max(normal_values, default=0)
 
     # 6. 输出异常检测结果
     print(f"\ncpu异常检测结果:")
@@ -412,6 +469,8 @@ def analyze_gc(normal_start, normal_end, Target_ECS, show):
         print(f"🟢 异常检测: 检测时段gc处于正常范围")
 
     if show:
+        from matplotlib import pyplot as plt
+
         plt.figure(figsize=(12, 6))
 
         plt.plot(timestamps, network, marker='o', linestyle='-', color='b')
@@ -0,0 +1,179 @@
+"""
+按后端分别限流，并根据时延和限流错误自适应调整并发（AIMD）
+
+SLS、CMS实体存储（.entity_set）和CMS指标库（.metricstore）各有一个限流器，所有题目和阶段共享：
+
+- 令牌桶限制每秒发出的请求数（QUERY_RATE_SLS / QUERY_RATE_CMS_ENTITY / QUERY_RATE_CMS_METRICSTORE，0表示不限）
+- 并发上限从查询线程数的一半开始，每个正常返回的请求加 1/上限（约每轮加1），直到查询线程数
+- 遇到限流错误，或时延超过最小时延的 QUERY_LATENCY_FACTOR 倍（且超过 QUERY_LATENCY_FLOOR 秒）时上限减半，
+  同一冷却时间内只减一次
+
+当前的上限和计数可通过 snapshot()/report() 查看。
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import pool
+
+SLS = "sls"
+CMS_ENTITY = "cms_entity"
+CMS_METRICSTORE = "cms_metricstore"
+
+QUERY_RATES = {
+    SLS: float(os.getenv("QUERY_RATE_SLS", "100")),
+    CMS_ENTITY: float(os.getenv("QUERY_RATE_CMS_ENTITY", "50")),
+    CMS_METRICSTORE: float(os.getenv("QUERY_RATE_CMS_METRICSTORE", "50")),
+}
+QUERY_LATENCY_FACTOR = float(os.getenv("QUERY_LATENCY_FACTOR", "3"))
+QUERY_LATENCY_FLOOR = float(os.getenv("QUERY_LATENCY_FLOOR", "2"))
+DECREASE_COOLDOWN_SECONDS = 1.0
+
+# 各后端表示被限流的错误码/错误信息片段
+THROTTLE_MARKERS = ("throttl", "quotaexceed", "qpslimit", "exceedqps", "toomanyrequests", "flowcontrol")
+
+
+def is_throttle_error(error):
+    """判断异常是否为后端的限流错误"""
+    parts = [type(error).__name__, str(error)]
+    for attr in ("code", "error_code", "status", "status_code"):
+        value = getattr(error, attr, None)
+        if value is None and attr == "error_code" and hasattr(error, "get_error_code"):
+            value = error.get_error_code()
+        if str(value) == "429":
+            return True
+        if value is not None:
+            parts.append(str(value))
+    text = " ".join(parts).lower().replace("_", "")
+    return any(marker in text for marker in THROTTLE_MARKERS)
+
+
+def cms_endpoint(query):
+    """CMS查询所属的后端"""
+    return CMS_METRICSTORE if query.lstrip().startswith(".metricstore") else CMS_ENTITY
+
+
+class EndpointLimiter:
+    """单个后端的令牌桶 + AIMD 并发上限"""
+
+    def __init__(self, name, rate, max_limit, initial_limit=None, min_limit=1):
+        self.name = name
+        self.rate = rate
+        self.burst = max(1.0, rate)
+        self.max_limit = max(min_limit, max_limit)
+        self.min_limit = min_limit
+        self.limit = float(initial_limit or max(min_limit, self.max_limit // 2))
+        self.in_flight = 0
+        self.min_latency = None
+        self.requests = 0
+        self.throttled = 0
+        self.decreases = 0
+        self._tokens = self.burst
+        self._refilled_at = time.monotonic()
+        self._decreased_at = 0.0
+        self._cond = threading.Condition()
+
+    def _take_token_locked(self):
+        """取一个令牌，返回需要等待的秒数（0表示已取到）"""
+        if self.rate <= 0:
+            return 0
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0
+        return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        with self._cond:
+            while True:
+                if self.in_flight < int(self.limit):
+                    wait = self._take_token_locked()
+                    if wait == 0:
+                        self.in_flight += 1
+                        return
+                    self._cond.wait(wait)
+                else:
+                    self._cond.wait()
+
+    def release(self, latency, throttled=False):
+        with self._cond:
+            self.in_flight -= 1
+            self.requests += 1
+            if throttled:
+                self.throttled += 1
+                self._decrease_locked()
+            else:
+                if self.min_latency is None or latency < self.min_latency:
+                    self.min_latency = latency
+                if latency > max(self.min_latency * QUERY_LATENCY_FACTOR, QUERY_LATENCY_FLOOR):
+                    self._decrease_locked()
+                else:
+                    self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    def _decrease_locked(self):
+        now = time.monotonic()
+        if now - self._decreased_at < DECREASE_COOLDOWN_SECONDS:
+            return
+        self._decreased_at = now
+        self.limit = max(self.min_limit, self.limit / 2)
+        self.decreases += 1
+
+    @contextmanager
+    def slot(self):
+        """占用一个请求名额，退出时按耗时和是否被限流调整并发上限"""
+        self.acquire()
+        started = time.monotonic()
+        throttled = False
+        try:
+            yield
+        except Exception as e:
+            throttled = is_throttle_error(e)
+            raise
+        finally:
+            self.release(time.monotonic() - started, throttled)
+
+    def snapshot(self):
+        with self._cond:
+            return {"limit": int(self.limit), "in_flight": self.in_flight, "rate": self.rate,
+                    "requests": self.requests, "throttled": self.throttled, "decreases": self.decreases}
+
+
+_lock = threading.Lock()
+_limiters = {}
+
+
+def get_limiter(endpoint):
+    """后端对应的限流器，第一次使用时按当前查询并发上限创建"""
+    with _lock:
+        limiter = _limiters.get(endpoint)
+        if limiter is None:
+            limiter = _limiters[endpoint] = EndpointLimiter(endpoint, QUERY_RATES.get(endpoint, 0),
+                                                            pool.max_workers())
+        return limiter
+
+
+def reset():
+    """丢弃所有限流器，下一次使用时按新的查询并发上限重建"""
+    with _lock:
+        _limiters.clear()
+
+
+def slot(endpoint):
+    return get_limiter(endpoint).slot()
+
+
+def snapshot():
+    """各后端当前的并发上限、在途请求数、令牌速率和计数"""
+    with _lock:
+        limiters = dict(_limiters)
+    return {endpoint: limiter.snapshot() for endpoint, limiter in limiters.items()}
+
+
+def report():
+    for endpoint, stats in snapshot().items():
+        print(f"🚦 {endpoint}: 并发上限 {stats['limit']}，请求 {stats['requests']} 次，"
+              f"被限流 {stats['throttled']} 次，降低上限 {stats['decreases']} 次")
@@ -1,61 +1,199 @@
 import argparse
-import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime, timezone, timedelta
 
-from get_log import read_input_data
+import coalesce
+import limiter
+import negative_cache
+import pool
+import prefetch
+import query_cache
+import replay
+import resilience
+import series_cache
+import sls_query
+from problems import iter_problems
 from parallel_agent import analyze_latency_problem, analyze_grey_failure, analyze_error_problem
+from results import ResultWriter, solved_problem_ids
 
-if __name__ == "__main__":
-    # 解析命令行参数
-    parser = argparse.ArgumentParser(description='故障根因分析程序')
-    parser.add_argument('--input', default='input.jsonl', help='输入JSONL文件路径')
-    parser.add_argument('--output', default='output.jsonl', help='输出JSONL文件路径')
-    parser.add_argument('--timeout', type=int, default=300, help='单题最大处理时长(秒)')
-    args = parser.parse_args()
 
-    output_results = []
-    input_data = read_input_data(args.input)
-    for problem_data in input_data:
-        problem_id = problem_data.get("problem_id", "unknown")
-        time_range = problem_data.get("time_range", "")
-        candidate_root_causes = problem_data.get("candidate_root_causes", [])
-        alarm_rules = problem_data.get("alarm_rules", [])
-        root_causes = []
-        evidences_data = []
+def analyze_problem(problem_data, timeout=None):
+    """
+    分析单个题目
+
+    Args:
+        problem_data: 题目数据
+        timeout: 单题最大处理时长(秒)，超时后返回已找到的根因并标记 partial
+
+    Returns:
+        dict: 输出结果 {"problem_id", "root_causes"}，未知告警规则返回 None
+    """
+    deadline = pool.Deadline(timeout)
+    problem_id = problem_data.get("problem_id", "unknown")
+    time_range = problem_data.get("time_range", "")
+    candidate_root_causes = problem_data.get("candidate_root_causes", [])
+    root_causes = []
+    evidences_data = []
 
-        start_str, end_str = time_range.split(' ~ ')
-        normal_start = datetime.strptime(start_str.strip(), "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone(timedelta(hours=8)))
-        normal_end = datetime.strptime(end_str.strip(), "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone(timedelta(hours=8)))
+    start_str, end_str = time_range.split(' ~ ')
+    normal_start = datetime.strptime(start_str.strip(), "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone(timedelta(hours=8)))
+    normal_end = datetime.strptime(end_str.strip(), "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone(timedelta(hours=8)))
 
-        # if problem_data.get("problem_id") != "059":
-        #     continue
+    # if problem_data.get("problem_id") != "059":
+    #     return None
 
+    # 同一道题内相同的查询只执行一次
+    with coalesce.problem_scope():
         if problem_data.get("alarm_rules")[0] == 'frontend_avg_rt' or problem_data.get("alarm_rules")[
             0] == 'service_avg_rt':
-            root_causes, root_cause_data, evidences_data = analyze_latency_problem(normal_start, normal_end, candidate_root_causes)
+            root_causes, root_cause_data, evidences_data = analyze_latency_problem(normal_start, normal_end, candidate_root_causes, deadline)
         elif problem_data.get("alarm_rules")[0] == 'greyFailure':
-            root_causes, root_cause_data, evidences_data = analyze_grey_failure(normal_start, normal_end, candidate_root_causes)
+            root_causes, root_cause_data, evidences_data = analyze_grey_failure(normal_start, normal_end, candidate_root_causes, deadline)
         elif problem_data.get("alarm_rules")[0] == 'overall_error_count':
-            root_causes, root_cause_data, evidences_data = analyze_error_problem(normal_start, normal_end, candidate_root_causes)
+            root_causes, root_cause_data, evidences_data = analyze_error_problem(normal_start, normal_end, candidate_root_causes, deadline)
         else:
             print(f"❌ 未知告警规则: {problem_data.get('alarm_rules')[0]}")
-            continue
-
-        # if len(root_causes) > 1:
-        #     print("开始使用大模型进行分析")
-        #     root_causes = [call_bailian_model(root_causes, root_cause_data)]
-        #     print(f"🎯 根因列表: {root_causes}")
-
-        # 添加到输出结果
-        output_results.append({
-            "problem_id": problem_id,
-            "root_causes": root_causes,
-            #"evidences": evidences_data
-        })
-
-    # 写入JSONL文件
-    output_file_path = args.output
-    with open(output_file_path, 'w', encoding='utf-8') as f:
-        for result in output_results:
-            f.write(json.dumps(result, ensure_ascii=False) + '\n')
-    print(f"✅ 结果已写入 {output_file_path}")
\ No newline at end of file
+            return None
+
+    # if len(root_causes) > 1:
+    #     print("开始使用大模型进行分析")
+    #     root_causes = [call_bailian_model(root_causes, root_cause_data)]
+    #     print(f"🎯 根因列表: {root_causes}")
+
+    result = {
+        "problem_id": problem_id,
+        "root_causes": root_causes,
+        #"evidences": evidences_data
+    }
+    if deadline.partial:
+        print(f"⏰ 题目 {problem_id} 超过 {timeout} 秒，输出不完整的根因: {root_causes}")
+        result["partial"] = True
+    return result
+
+
+def analyze_stream(problems, writer, solved=(), workers=1, timeout=None):
+    """
+    边读边算：最多同时有 workers 道题在处理，内存占用与输入规模无关
+
+    每道题完成后在处理它的线程里立即写入结果，不等到读入下一道题（--follow 或一直打开的标准输入
+    可能很久都没有新题目）。全部完成后，或等待过程中再次 Ctrl+C 时，按输入顺序整理输出文件。
+
+    Args:
+        problems: 题目的迭代器
+        writer: ResultWriter
+        solved: 已经完整求解、需要跳过的题目ID
+
+    Returns:
+        int: 跳过的题目数
+    """
+    problem_order = []
+    skipped = 0
+    running = {}
+    lock = threading.Lock()
+    workers = max(1, workers)
+
+    def write_done(future):
+        with lock:
+            problem_id = running.pop(future)
+        if future.cancelled():
+            return
+        try:
+            result = future.result()
+        except Exception as e:
+            # 单题失败不影响其他题目，未写入的题目下次 --resume 时会重跑
+            print(f"❌ 题目 {problem_id} 处理失败: {e}")
+            return
+        if result is not None:
+            writer.write(result)
+
+    def unfinished():
+        with lock:
+            return [future for future in running if not future.done()]
+
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="problem")
+    try:
+        try:
+            for problem_data in problems:
+                problem_id = problem_data.get("problem_id", "unknown")
+                problem_order.append(problem_id)
+                if problem_id in solved:
+                    skipped += 1
+                    continue
+                pending = unfinished()
+                while len(pending) >= workers:
+                    wait(pending, return_when=FIRST_COMPLETED)
+                    pending = unfinished()
+                future = executor.submit(analyze_problem, problem_data, timeout)
+                with lock:
+                    running[future] = problem_id
+                future.add_done_callback(write_done)
+        except KeyboardInterrupt:
+            print("⏹️ 停止读取新题目，等待正在处理的题目完成")
+        wait(unfinished())
+    finally:
+        # 再次 Ctrl+C 时不再等待未完成的题目，已写入的结果同样按输入顺序整理
+        executor.shutdown(wait=False, cancel_futures=True)
+        writer.compact(problem_order)
+    return skipped
+
+
+if __name__ == "__main__":
+    # 解析命令行参数
+    parser = argparse.ArgumentParser(description='故障根因分析程序')
+    parser.add_argument('--input', default='input.jsonl', help='输入JSONL文件路径，- 表示从标准输入读取')
+    parser.add_argument('--follow', action='store_true', help='读到文件末尾后继续等待新追加的题目（Ctrl+C 结束）')
+    parser.add_argument('--output', default='output.jsonl', help='输出JSONL文件路径')
+    parser.add_argument('--timeout', type=int, default=300, help='单题最大处理时长(秒)')
+    parser.add_argument('--workers', type=int, default=1, help='同时处理的题目数')
+    parser.add_argument('--query-workers', type=int, default=pool.DEFAULT_QUERY_WORKERS,
+                        help='所有题目共享的SLS/CMS查询并发上限')
+    parser.add_argument('--resume', action='store_true', help='保留已有输出，跳过其中已经完整求解的题目')
+    parser.add_argument('--no-cache', action='store_true', help='不使用本地查询结果缓存')
+    parser.add_argument('--record', metavar='DIR', help='把所有SLS/CMS查询的响应录制到目录')
+    parser.add_argument('--replay', metavar='DIR', help='只从录制目录回放查询，不访问网络')
+    parser.add_argument('--window-stats', action='store_true',
+                        help='前后时段与目标时段的统计值直接在SLS里计算，只取回每条序列的三个统计值')
+    parser.add_argument('--series-cache', action='store_true',
+                        help='在内存中按时间区间缓存CMS时序，相邻或重叠时间窗只查询缺失的时间段')
+    parser.add_argument('--prefetch', action='store_true',
+                        help='分析之前先读入全部题目，批量预取各题一定会用到的查询到本地缓存')
+    parser.add_argument('--hedge', action='store_true',
+                        help='SLS/CMS请求超过最近P95耗时仍未返回时再发一个相同请求，取先返回的结果')
+    args = parser.parse_args()
+    if args.prefetch and args.follow:
+        parser.error("--prefetch 需要预先读入全部题目，不能与 --follow 同时使用")
+
+    pool.configure(args.query_workers)
+    replay.configure(record=args.record, replay=args.replay)
+    # 回放时结果完全来自录制目录，不读写本地缓存
+    if args.no_cache or args.replay:
+        query_cache.disable()
+    if args.window_stats:
+        sls_query.enable_window_stats()
+    if args.series_cache:
+        series_cache.enable()
+    if args.hedge:
+        resilience.enable_hedging()
+
+    # 每道题完成后立即追加写入输出文件，进程崩溃后可以用 --resume 继续
+    with ResultWriter(args.output, resume=args.resume) as writer:
+        solved = solved_problem_ids(writer.results)
+        problems = iter_problems(args.input, follow=args.follow)
+        if args.prefetch:
+            problems = list(problems)
+            prefetch.prefetch([problem_data for problem_data in problems
+                               if problem_data.get("problem_id", "unknown") not in solved])
+
+        skipped = analyze_stream(problems, writer, solved, args.workers, args.timeout)
+        pool.shutdown()
+        if query_cache.get_cache() is not None:
+            query_cache.get_cache().report()
+        replay.report()
+        limiter.report()
+        resilience.report()
+        series_cache.get_cache().report()
+        negative_cache.get_cache().report()
+        if args.resume:
+            print(f"⏩ 跳过了已完成的 {skipped} 道题")
+    print(f"✅ 结果已写入 {args.output}")
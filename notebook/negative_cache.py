@@ -0,0 +1,94 @@
+"""
+没有数据的时序的负缓存
+
+有些时序长期为空（如email服务的内存、部分ECS实例的指标），每次批量查询都会把它们带上。
+一次成功的查询里某个实体没有返回数据时，记下 (时序来源, 实体, 时间窗)：
+之后在 NEGATIVE_CACHE_SECONDS 秒内，时间窗落在已记录时间窗之内的请求直接按“没有数据”返回，不再查询；
+冷却时间过后再重新查询一次。查询失败（返回None）不记为空，交给重试和熔断（见 resilience）处理。
+
+NEGATIVE_CACHE=0 时关闭。
+"""
+import os
+import threading
+import time
+
+NEGATIVE_CACHE_ENABLED = os.getenv("NEGATIVE_CACHE", "1") == "1"
+NEGATIVE_CACHE_SECONDS = float(os.getenv("NEGATIVE_CACHE_SECONDS", "600"))
+NEGATIVE_CACHE_MAX_WINDOWS = 8
+
+
+class NegativeCache:
+    """(时序来源, 实体) → 没有数据的时间窗及其失效时间"""
+
+    def __init__(self, ttl=NEGATIVE_CACHE_SECONDS):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._empty = {}
+        self.hits = 0
+
+    def is_empty(self, key, from_time, to_time):
+        """[from_time, to_time] 是否落在一个未过期的空时间窗内"""
+        now = time.monotonic()
+        with self._lock:
+            windows = [w for w in self._empty.get(key, ()) if w[2] > now]
+            if windows:
+                self._empty[key] = windows
+            else:
+                self._empty.pop(key, None)
+            if any(start <= from_time and to_time <= end for start, end, _ in windows):
+                self.hits += 1
+                return True
+        return False
+
+    def mark_empty(self, key, from_time, to_time):
+        with self._lock:
+            windows = self._empty.setdefault(key, [])
+            windows.append((from_time, to_time, time.monotonic() + self.ttl))
+            del windows[:-NEGATIVE_CACHE_MAX_WINDOWS]
+
+    def forget(self, key):
+        """时序重新有了数据"""
+        with self._lock:
+            self._empty.pop(key, None)
+
+    def report(self):
+        if self.hits:
+            print(f"🕳️ 负缓存: {self.hits} 次空时序查询直接返回，当前记录 {len(self._empty)} 条空时序")
+
+
+_cache = NegativeCache()
+
+
+def get_cache():
+    return _cache
+
+
+def fetch_series(source, entities, from_time, to_time, fetch):
+    """
+    跳过已知没有数据的实体，再取回其余实体的时序
+
+    Args:
+        source: 标识一类时序的可哈希值（查询模板和指标名）
+        entities: 实体名列表
+        from_time, to_time: 查询时间范围（秒）
+        fetch: fetch(entities, from_time, to_time)，返回 {实体: (timestamps, values)}，失败时返回None
+
+    Returns:
+        dict: {实体: (timestamps, values)}，没有数据的实体不出现；所有实体都已知为空时不发出查询；查询失败时为None
+    """
+    if not NEGATIVE_CACHE_ENABLED:
+        return fetch(entities, from_time, to_time)
+
+    cache = _cache
+    pending = [entity for entity in entities if not cache.is_empty((source, entity), from_time, to_time)]
+    if not pending:
+        return {}
+    series = fetch(pending, from_time, to_time)
+    if series is None:
+        return None
+    for entity in pending:
+        if series.get(entity, ([], []))[0]:
+            cache.forget((source, entity))
+        else:
+            cache.mark_empty((source, entity), from_time, to_time)
+    return series
@@ -4,17 +4,19 @@ import argparse
 from collections import defaultdict
 from datetime import datetime, timezone, timedelta
 from typing import Dict, Set, List, Any
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import numpy as np
-from openai import OpenAI
 
-from get_entity import analyze_cpu, analyze_memory, get_pod
-from get_log import read_input_data, get_log, get_span_latency
-from get_ecs import analyze_ecs_memory, analyze_ecs_cpu, analyze_ecs_disk
+from get_entity import CPU_METRIC, MEMORY_METRIC, analyze_cpu, analyze_memory, check_pods_complete, get_deployment_metric
+from get_log import get_log, get_log_batch, get_span_latency
+from get_ecs import ECS_METRICS, analyze_ecs_memory, analyze_ecs_cpu, analyze_ecs_disk, get_ecs_metric
 from get_error import get_error, get_span_error, get_errorInfo
 from get_instance import get_instance
-from get_prom import analyze_network, analyze_gc
+from get_prom import (JVM_METRICS, analyze_network, classify_jvm_fault, detect_jvm_anomalies, get_jvm_metric,
+                      get_jvm_metrics, get_network_series, jvm_faults, merge_jvm_metrics, jvm_services)
+from pool import query_executor, as_completed_until, call_until, expired
+from session import get_session
+from stages import StageGraph
 
 # SLS configuration
 PROJECT_NAME = "proj-xtrace-a46b97cfdc1332238f714864c014a1b-cn-qingdao"
@@ -26,6 +28,8 @@ def call_bailian_model(root_causes: List[str], root_cause_data: Dict[str, Any])
     """
     调用阿里云百炼大模型接口，从多个根因中筛选最可能的结果
     """
+    from openai import OpenAI
+
     client = OpenAI(
         # 若没有配置环境变量，请用百炼API Key将下行替换为：api_key="sk-xxx",
         api_key=os.getenv("BAILIAN_API_KEY"),
@@ -71,45 +75,8 @@ def call_bailian_model(root_causes: List[str], root_cause_data: Dict[str, Any])
 
     return causes.strip()
 
-def get_sts_credentials():
-    try:
-        from aliyunsdkcore.client import AcsClient
-        from aliyunsdksts.request.v20150401 import AssumeRoleRequest
-
-        MAIN_ACCOUNT_ACCESS_KEY_ID = os.getenv('ALIBABA_CLOUD_ACCESS_KEY_ID')
-        MAIN_ACCOUNT_ACCESS_KEY_SECRET = os.getenv('ALIBABA_CLOUD_ACCESS_KEY_SECRET')
-        ALIBABA_CLOUD_ROLE_ARN = os.getenv('ALIBABA_CLOUD_ROLE_ARN', 'acs:ram::1672753017899339:role/tianchi-user-a')
-        STS_SESSION_NAME = os.getenv('ALIBABA_CLOUD_ROLE_SESSION_NAME', 'my-sls-access')
-
-        if not MAIN_ACCOUNT_ACCESS_KEY_ID or not MAIN_ACCOUNT_ACCESS_KEY_SECRET:
-            return None, None, None
-
-        client = AcsClient(MAIN_ACCOUNT_ACCESS_KEY_ID, MAIN_ACCOUNT_ACCESS_KEY_SECRET, REGION)
-        request = AssumeRoleRequest.AssumeRoleRequest()
-        request.set_RoleArn(ALIBABA_CLOUD_ROLE_ARN)
-        request.set_RoleSessionName(STS_SESSION_NAME)
-        request.set_DurationSeconds(3600)
-
-        response = client.do_action_with_exception(request)
-        response_data = json.loads(response)
-        credentials = response_data['Credentials']
-        return (credentials['AccessKeyId'], credentials['AccessKeySecret'], credentials['SecurityToken'])
-    except Exception as e:
-        print(f"❌ 获取STS凭证失败: {e}")
-        return None, None, None
-
-
-temp_access_key_id, temp_access_key_secret, security_token = get_sts_credentials()
-if not temp_access_key_id:
-    print("❌ 无法获取STS临时凭证，分析终止")
-
-try:
-    from aliyun.log import LogClient
-
-    sls_endpoint = f"{REGION}.log.aliyuncs.com"
-    log_client = LogClient(sls_endpoint, temp_access_key_id, temp_access_key_secret, security_token)
-except Exception as e:
-    print(f"❌ 创建SLS客户端失败: {e}")
+# 共享的SLS客户端，凭证在第一次查询时获取并在后台自动刷新
+log_client = get_session().log_client
 
 # 定义所有调用关系：(调用方, 被调用方)
 calls_relations = [
@@ -155,6 +122,79 @@ for caller, callee in calls_relations:
     if callee in app_services:  # 只记录应用服务的上游
         service_upstreams[callee].append(caller)
 
+# 不参与检测的 (服务, 指标)，在读取序列之前检查：
+# email服务内存长期存在OOM，序列本身偏高而不是没有数据，不能交给负缓存判断
+EXCLUDED_SERIES = {("email", "memory")}
+
+
+def is_excluded(service, metric):
+    """该服务的该指标不参与检测"""
+    return (service, metric) in EXCLUDED_SERIES
+
+
+def get_candidate_services(candidate_root_causes):
+    """候选根因中的应用服务（以 .cpu 候选为准，排除ECS节点和 load-generator）"""
+    services = []
+    for candidate in candidate_root_causes:
+        if '.' in candidate and candidate.endswith('.cpu'):
+            service = candidate.split('.')[0]
+            if service[1] == '-' or service == "load-generator":
+                continue
+            services.append(service)
+    return services
+
+
+def keep_highest_priority(items, priority=None):
+    """每个服务只保留优先级最高的一个根因（默认 memory > cpu > disk > networkLoss），顺序与首次出现的顺序一致"""
+    if priority is None:
+        priority = {'memory': 4, 'cpu': 3, 'disk': 2, 'networkLoss': 1}  # 优先级映射
+    service_root_causes = {}  # 存储每个服务的最高优先级根因
+    for item in items:
+        # 解析服务名和根因类型
+        parts = item.split('.')
+        if len(parts) != 2:
+            continue  # 跳过格式异常的项
+        service, cause_type = parts[0], parts[1]
+
+        # 仅处理已知类型
+        if cause_type not in priority:
+            continue
+
+        # 服务首次出现直接记录，否则保留优先级更高的
+        if service not in service_root_causes or priority[cause_type] > service_root_causes[service][0]:
+            service_root_causes[service] = (priority[cause_type], item)
+
+    # 提取最终根因（只保留每个服务的最高优先级项）
+    return [item for (_, item) in service_root_causes.values()]
+
+
+def get_jvm_root_causes(jvm_anomalies, candidate_root_causes, evidences_dict):
+    """
+    把 detect_jvm_anomalies 的结果对应到候选根因中的JVM故障（jvmChaos/LargeGc），并记录证据
+
+    Returns:
+        list: 如 ['ad.LargeGc', 'inventory.jvmChaos']
+    """
+    faults = jvm_faults(candidate_root_causes)
+    jvm_list = []
+    for service, anomalies in jvm_anomalies.items():
+        fault = classify_jvm_fault(anomalies, faults.get(service, []))
+        if fault is None:
+            continue
+        item = service + '.' + fault
+        jvm_list.append(item)
+        evidences_dict[item].append(
+            f"{service}服务检测到JVM GC异常，可能存在{'大量GC' if fault == 'LargeGc' else 'JVM Chaos'}问题"
+        )
+        for kind in ('heap', 'threads'):
+            if anomalies.get(kind, (False,))[0]:
+                _, normal_avg, pre_avg, post_avg = anomalies[kind]
+                evidences_dict[item].append(
+                    f"{service}服务的JVM {kind}指标同时升高，检测时段平均值{normal_avg:.2f}，"
+                    f"前后时段平均值{pre_avg:.2f}/{post_avg:.2f}"
+                )
+    return jvm_list
+
 
 def get_only_anomaly(anomaly_list, root_causes, evidences_dict):
     amplitude_dict = {}
@@ -334,7 +374,7 @@ def find_anomalies(root_list, root_cause_data, m=5, threshold_factor=3, consecut
 
 
 # 处理延迟问题
-def analyze_latency_problem(normal_start, normal_end, candidate_root_causes):
+def analyze_latency_problem(normal_start, normal_end, candidate_root_causes, deadline=None):
     anomaly_list: List[Dict[str, Any]] = []
     show = False
     latency = False
@@ -348,7 +388,7 @@ def analyze_latency_problem(normal_start, normal_end, candidate_root_causes):
     start_str = normal_start.replace(tzinfo=timezone(timedelta(hours=8))).strftime('%Y-%m-%d %H:%M:%S')
     end_str = normal_end.replace(tzinfo=timezone(timedelta(hours=8))).strftime('%Y-%m-%d %H:%M:%S')
 
-    def process_one_service(service, normal_start, normal_end, isMedian=True):
+    def process_one_service(service, normal_start, normal_end, latency_results, cpu_series, memory_series):
         result = {
             'service': service,
             'cpu_anomaly': False,
@@ -365,7 +405,8 @@ def analyze_latency_problem(normal_start, normal_end, candidate_root_causes):
 
         # 1. 查询CPU数据
         print(f"🔍 查询 {service} 服务CPU数据...")
-        cpu_anomaly, max_cpu, cpu_data = analyze_cpu(normal_start, normal_end, service, show)
+        cpu_anomaly, max_cpu, cpu_data = analyze_cpu(normal_start, normal_end, service, show,
+                                                     series=cpu_series.get(service, ([], [])))
         result['cpu_data'] = cpu_data
         result['max_cpu'] = max_cpu
         if cpu_anomaly and max_cpu > 30.0:
@@ -377,15 +418,14 @@ def analyze_latency_problem(normal_start, normal_end, candidate_root_causes):
 
         # 2. 查询Memory数据
         print(f"🔍 查询 {service} 服务Memory数据...")
-        if service == "email":
-            result['memory_anomaly'] = False
+        if is_excluded(service, "memory"):
+            # 内存不可信时时延同样不作为依据
             result['memory_data'] = []
-            result['latency_anomaly'] = False
             result['latency_data'] = []
             return result
 
-            # 2. 查询Memory数据
-        memory_anomaly, max_memory, memory_data = analyze_memory(normal_start, normal_end, service, show)
+        memory_anomaly, max_memory, memory_data = analyze_memory(normal_start, normal_end, service, show,
+                                                                 series=memory_series.get(service, ([], [])))
         result['memory_data'] = memory_data
         result['max_memory'] = max_memory
         if memory_anomaly and max_memory > 25.0:
@@ -395,10 +435,9 @@ def analyze_latency_problem(normal_start, normal_end, candidate_root_causes):
             )
             result['memory_anomaly'] = True
 
-        # 3. 获取延迟数据
+        # 3. 获取延迟数据（所有候选服务的时延序列由一条批量查询取回）
         print(f"🎯 Limiting analysis to candidate service: {service}")
-        flag, before, target, after, duration_data = get_log(log_client, PROJECT_NAME, LOGSTORE_NAME, service, start_str.strip(),
-                                              end_str.strip(), isMedian)
+        flag, before, target, after, duration_data = latency_results[service]
         result['latency_data'] = duration_data
         if flag:
             result['latency_anomaly'] = True
@@ -414,21 +453,31 @@ def analyze_latency_problem(normal_start, normal_end, candidate_root_causes):
             )
         return result
 
-    # 并行
-    total_services = []
-    for candidate in candidate_root_causes:
-        if '.' in candidate and candidate.endswith('.cpu'):
-            service = candidate.split('.')[0]
-            if service[1] == '-' or service == "load-generator":
-                continue
-            total_services.append(service)
+    def analyze_services(latency_future, cpu_future, memory_future):
+        """
+        等三条批量查询都返回后在当前线程逐个服务检测
+
+        检测本身不访问后端，不占用查询线程，也就不会有查询线程空等同一线程池里的批量查询。
+        截止时间到达时还有批量查询未返回则不检测。
+        """
+        batches = [latency_future, cpu_future, memory_future]
+        results = {future: future.result() for future in as_completed_until(batches, deadline)}
+        if len(results) < len(batches):
+            return []
+        return [process_one_service(service, normal_start, normal_end, results[latency_future],
+                                    results[cpu_future], results[memory_future])
+                for service in total_services]
 
-    with ThreadPoolExecutor() as executor:
-        futures = [
-            executor.submit(process_one_service, service, normal_start, normal_end) for service in total_services
-        ]
-        for future in as_completed(futures):
-            result = future.result()
+    # 并行
+    total_services = get_candidate_services(candidate_root_causes)
+
+    with query_executor() as executor:
+        # 批量查询最先提交：所有候选服务的时延序列、CPU序列和内存序列各一条查询
+        latency_future = executor.submit(get_log_batch, log_client, PROJECT_NAME, LOGSTORE_NAME, total_services,
+                                         start_str.strip(), end_str.strip())
+        cpu_future = executor.submit(get_deployment_metric, normal_start, normal_end, total_services, CPU_METRIC)
+        memory_future = executor.submit(get_deployment_metric, normal_start, normal_end, total_services, MEMORY_METRIC)
+        for result in analyze_services(latency_future, cpu_future, memory_future):
             service_name = result['service']
             if result['cpu_anomaly']:
                 cpu_item = service_name + '.cpu'
@@ -457,23 +506,17 @@ def analyze_latency_problem(normal_start, normal_end, candidate_root_causes):
                     'duration_data': result['latency_data']
                 }
 
-    if cpu_list == [] and memory_list == [] and latency_candidates == []:
+    if cpu_list == [] and memory_list == [] and latency_candidates == [] and not expired(deadline):
         print("放宽异常检测要求，改用平均值")
-        total_services = []
-        for candidate in candidate_root_causes:
-            if '.' in candidate and candidate.endswith('.cpu'):
-                service = candidate.split('.')[0]
-                if service[1] == '-' or service == "load-generator":
-                    continue
-                total_services.append(service)
-
-        with ThreadPoolExecutor() as executor:
-            futures = [
-                executor.submit(process_one_service, service, normal_start, normal_end, False) for service in
-                total_services
-            ]
-            for future in as_completed(futures):
-                result = future.result()
+        total_services = get_candidate_services(candidate_root_causes)
+
+        with query_executor() as executor:
+            latency_future = executor.submit(get_log_batch, log_client, PROJECT_NAME, LOGSTORE_NAME, total_services,
+                                             start_str.strip(), end_str.strip(), False)
+            cpu_future = executor.submit(get_deployment_metric, normal_start, normal_end, total_services, CPU_METRIC)
+            memory_future = executor.submit(get_deployment_metric, normal_start, normal_end, total_services,
+                                            MEMORY_METRIC)
+            for result in analyze_services(latency_future, cpu_future, memory_future):
                 service_name = result['service']
                 if result['cpu_anomaly']:
                     cpu_item = service_name + '.cpu'
@@ -502,14 +545,14 @@ def analyze_latency_problem(normal_start, normal_end, candidate_root_causes):
                         'duration_data': result['latency_data']
                     }
 
-    # 查询jvmChaos的情况
-    jvm_list = []
-    anomaly = analyze_gc(normal_start, normal_end, "inventory", False)
-    if anomaly:
-        jvm_list.append('inventory.jvmChaos')
-        evidences_dict['inventory.jvmChaos'].append(
-            "inventory服务检测到JVM GC异常，可能存在JVM Chaos问题"
-        )
+    # 查询jvmChaos的情况：候选根因中所有JVM服务的GC、堆内存、线程数指标一起取回并一次性检测
+    jvm_anomalies = {}
+    if not expired(deadline):
+        with query_executor() as executor:
+            jvm_series = get_jvm_metrics(normal_start, normal_end, jvm_services(candidate_root_causes), executor,
+                                         deadline)
+        jvm_anomalies = detect_jvm_anomalies(normal_start, normal_end, jvm_series)
+    jvm_list = get_jvm_root_causes(jvm_anomalies, candidate_root_causes, evidences_dict)
 
     fre = get_frequency(cpu_list, memory_list, latency_candidates, jvm_list)
 
@@ -537,9 +580,10 @@ def analyze_latency_problem(normal_start, normal_end, candidate_root_causes):
 
     # 5. 针对frontend应用，判断是否存在延迟
     for item in latency_candidates:
-        if item.split('.')[0] == "frontend":
+        if item.split('.')[0] == "frontend" and not expired(deadline):
             service = item.split('.')[0]
-            latency = get_span_latency(log_client, PROJECT_NAME, LOGSTORE_NAME, service, start_str.strip(), end_str.strip(), False)
+            latency = call_until(deadline, False, get_span_latency, log_client, PROJECT_NAME, LOGSTORE_NAME, service,
+                                 start_str.strip(), end_str.strip(), False)
             if latency:
                 serveice_list = [service + '.networkLatency']
                 evidences_dict[service + '.networkLatency'].append(
@@ -552,7 +596,7 @@ def analyze_latency_problem(normal_start, normal_end, candidate_root_causes):
     print(f"🎯 cpu候选服务列表: {cpu_list}")
     print(f"🎯 memory候选服务列表: {memory_list}")
     print(f"🎯 latency候选服务列表: {serveice_list}")
-    print(f"🎯 jvmChaos候选服务列表: {jvm_list}")
+    print(f"🎯 JVM候选根因列表: {jvm_list}")
 
     # 综合判断根因
     # 1. 提取cpu和memory列表中的所有唯一服务
@@ -578,32 +622,8 @@ def analyze_latency_problem(normal_start, normal_end, candidate_root_causes):
         # 否则直接合并所有列表
         combined = cpu_list + memory_list + serveice_list + jvm_list
 
-    service_root_causes = {}  # 存储每个服务的最高优先级根因
-    priority = {'memory': 4, 'cpu': 3, 'jvmChaos': 2, 'networkLatency': 1}  # 优先级映射
-
-    for item in combined:
-        # 解析服务名和根因类型
-        parts = item.split('.')
-        if len(parts) != 2:
-            continue  # 跳过格式异常的项
-        service, cause_type = parts[0], parts[1]
-
-        # 仅处理已知类型
-        if cause_type not in priority:
-            continue
-
-        # 更新当前服务的最高优先级根因
-        if service not in service_root_causes:
-            # 服务首次出现，直接记录
-            service_root_causes[service] = (priority[cause_type], item)
-        else:
-            # 比较优先级，保留更高的
-            current_prio, _ = service_root_causes[service]
-            if priority[cause_type] > current_prio:
-                service_root_causes[service] = (priority[cause_type], item)
-
-    # 提取最终根因（只保留每个服务的最高优先级项）
-    root_causes = [item for (_, item) in service_root_causes.values()]
+    priority = {'memory': 4, 'cpu': 3, 'jvmChaos': 2, 'LargeGc': 2, 'networkLatency': 1}  # 优先级映射
+    root_causes = keep_highest_priority(combined, priority)
 
     # 根据service出现频率筛选根因，只保留出现次数最多的service的根因
     if root_causes:
@@ -638,8 +658,9 @@ def analyze_latency_problem(normal_start, normal_end, candidate_root_causes):
         )
 
     # 处理 currency 的情况
-    if len(root_causes) > 0 and root_causes[0] == "currency.cpu":
-        flag = get_span_error(log_client, PROJECT_NAME, LOGSTORE_NAME, "currency", start_str.strip(), end_str.strip())
+    if len(root_causes) > 0 and root_causes[0] == "currency.cpu" and not expired(deadline):
+        flag = call_until(deadline, False, get_span_error, log_client, PROJECT_NAME, LOGSTORE_NAME, "currency",
+                          start_str.strip(), end_str.strip())
         if flag:
             print("🔍 获取 currency 服务网络异常数据...")
             root_causes = ["currency.networkLatency"]
@@ -648,7 +669,8 @@ def analyze_latency_problem(normal_start, normal_end, candidate_root_causes):
             )
 
     # 处理 frontend 和 checkout 的情况
-    if latency == False and len(root_causes) > 0 and root_causes[0] in ['frontend.networkLatency', 'checkout.networkLatency']:
+    if latency == False and len(root_causes) > 0 and root_causes[0] in ['frontend.networkLatency', 'checkout.networkLatency'] \
+            and not expired(deadline):
         services = []
         if root_causes[0].split('.')[0] == "frontend":
             services = ["ad", "recommendation", "checkout", "cart", "currency", "product-catalog"]
@@ -656,9 +678,13 @@ def analyze_latency_problem(normal_start, normal_end, candidate_root_causes):
             services = ["product-catalog", "cart", "payment", "shipping", "email", "currency", "quote"]
         latency_candidates = []
         anomaly_list: List[Dict[str, Any]] = []
+        latency_results = call_until(deadline, {}, get_log_batch, log_client, PROJECT_NAME, LOGSTORE_NAME, services,
+                                     start_str.strip(), end_str.strip(), False)
+        interrupted = expired(deadline)
         for service in services:
-            flag, before, target, after, _ = get_log(log_client, PROJECT_NAME, LOGSTORE_NAME, service,
-                                                      start_str.strip(), end_str.strip(), False)
+            if service not in latency_results:
+                continue
+            flag, before, target, after, _ = latency_results[service]
             if flag:
                 print(f"🔍 获取 {service} 服务网络延迟数据...")
                 latency_candidates.append(service + '.networkLatency')
@@ -672,14 +698,18 @@ def analyze_latency_problem(normal_start, normal_end, candidate_root_causes):
                     f"{service}服务检测到网络延迟异常，值为{target}"
                 )
         # 如果只存在1-2个服务疑似上升，则不是checkout或frontend的问题
-        if len(latency_candidates) < 3:
+        if len(latency_candidates) < 3 and not interrupted:
             root_causes, evidences_dict = get_only_anomaly(anomaly_list, latency_candidates, evidences_dict)
 
-    if len(root_causes) == 0:
+    if len(root_causes) == 0 and not expired(deadline):
         print("⚠️ 根因列表为空，开始查询少见情况")
         target_service = "inventory"
-        cpu_anomaly = analyze_cpu(normal_start, normal_end, target_service, False)
-        memory_anomaly = analyze_memory(normal_start, normal_end, target_service, False)
+        with query_executor() as executor:
+            cpu_future = executor.submit(analyze_cpu, normal_start, normal_end, target_service, False)
+            memory_future = executor.submit(analyze_memory, normal_start, normal_end, target_service, False)
+            results = {future: future.result() for future in as_completed_until([cpu_future, memory_future], deadline)}
+        cpu_anomaly = results.get(cpu_future, (False, 0, []))
+        memory_anomaly = results.get(memory_future, (False, 0, []))
         print(f"CPU异常: {cpu_anomaly}, Memory异常: {memory_anomaly}")
         if cpu_anomaly[0] or memory_anomaly[0]:
             root_causes.append(target_service + '.jvmChaos')
@@ -701,19 +731,81 @@ def analyze_latency_problem(normal_start, normal_end, candidate_root_causes):
     return root_causes, root_cause_data, final_evidences
 
 #处理灰色故障
-def analyze_grey_failure(normal_start, normal_end, candidate_root_causes):
-    anomaly_list: List[Dict[str, Any]] = []
+def get_grey_services(candidate_root_causes):
+    """
+    灰色故障各阶段检查的服务
+
+    Returns:
+        tuple: (所有候选服务, 候选ECS节点, 检查pod是否被终止的服务)
+    """
+    total_services = tuple(get_candidate_services(candidate_root_causes))
+    ecs_services = []
+    for candidate in candidate_root_causes:
+        if '.' in candidate and candidate.endswith('.cpu'):
+            service = candidate.split('.')[0]
+            if service[1] != '-':
+                continue
+            ecs_services.append(service)
+    pod_services = []
+    for candidate in candidate_root_causes:
+        if '.' in candidate and candidate.endswith('.cpu'):
+            service = candidate.split('.')[0]
+            if service != 'checkout' and service != "frontend" and service != "product-catalog":
+                continue
+            pod_services.append(service)
+    return total_services, tuple(ecs_services), tuple(pod_services)
+
+
+def count_killed_pods(normal_start, normal_end, service):
+    """一个服务的所有pod用一次查询检查数据点是否完整，返回 (不完整的pod数, pod总数)"""
+    start_str = normal_start.replace(tzinfo=timezone(timedelta(hours=8))).strftime('%Y-%m-%d %H:%M:%S')
+    end_str = normal_end.replace(tzinfo=timezone(timedelta(hours=8))).strftime('%Y-%m-%d %H:%M:%S')
+    hostname_list = get_instance(log_client, PROJECT_NAME, LOGSTORE_NAME, service, start_str, end_str)
+    print(f"🔍 Found hostnames {hostname_list}, processing...")
+    start = datetime.strptime(start_str, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone(timedelta(hours=8)))
+    end = datetime.strptime(end_str, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone(timedelta(hours=8)))
+    complete = check_pods_complete(start, end, hostname_list)
+    return sum(1 for ok in complete.values() if not ok), len(hostname_list)
+
+
+def grey_failure_tasks(normal_start, normal_end, candidate_root_causes):
+    """
+    灰色故障分析各阶段用到的数据节点，analyze_grey_failure 和整批预取（prefetch）共用这一份列表
+
+    Returns:
+        list: [(数据节点名, 函数, 参数元组)]
+    """
+    start_str = normal_start.replace(tzinfo=timezone(timedelta(hours=8))).strftime('%Y-%m-%d %H:%M:%S')
+    end_str = normal_end.replace(tzinfo=timezone(timedelta(hours=8))).strftime('%Y-%m-%d %H:%M:%S')
+    total_services, ecs_services, pod_services = get_grey_services(candidate_root_causes)
+    tasks = [("pod.cpu", get_deployment_metric, (normal_start, normal_end, total_services, CPU_METRIC)),
+             ("pod.memory", get_deployment_metric, (normal_start, normal_end, total_services, MEMORY_METRIC))]
+    # 所有候选节点的 CPU/内存/磁盘 各一条批量查询，4个网络指标合成一条PromQL
+    tasks += [("ecs." + kind, get_ecs_metric, (normal_start, normal_end, ecs_services, metric))
+              for kind, metric in ECS_METRICS.items()]
+    tasks.append(("ecs.network", get_network_series, (normal_start, normal_end, ecs_services)))
+    tasks += [("podKiller." + service, count_killed_pods, (normal_start, normal_end, service))
+              for service in pod_services]
+    jvm = tuple(jvm_services(candidate_root_causes))
+    tasks += [("jvmChaos.cpu", analyze_cpu, (normal_start, normal_end, "inventory", False)),
+              ("jvmChaos.memory", analyze_memory, (normal_start, normal_end, "inventory", False))]
+    tasks += [("jvmChaos." + kind, get_jvm_metric, (normal_start, normal_end, jvm, metric))
+              for kind, metric in JVM_METRICS.items()]
+    tasks += [("email.latency", get_log, (log_client, PROJECT_NAME, LOGSTORE_NAME, "email", start_str, end_str,
+                                          True, False)),
+              ("email.cpu", analyze_cpu, (normal_start, normal_end, "email", False, False))]
+    # 所有候选服务的时延序列由一条批量查询取回
+    tasks.append(("latency", get_log_batch, (log_client, PROJECT_NAME, LOGSTORE_NAME, total_services, start_str,
+                                             end_str, False)))
+    return tasks
+
+
+def analyze_grey_failure(normal_start, normal_end, candidate_root_causes, deadline=None):
     show = False
-    cpu_list = []
-    memory_list = []
-    serveice_list = []
-    combined = []
     root_cause_data = {}
     evidences_dict = defaultdict(list)  # 存储每个根因的证据
-    start_str = normal_start.replace(tzinfo=timezone(timedelta(hours=8))).strftime('%Y-%m-%d %H:%M:%S')
-    end_str = normal_end.replace(tzinfo=timezone(timedelta(hours=8))).strftime('%Y-%m-%d %H:%M:%S')
 
-    def process_one_service(service, normal_start, normal_end):
+    def process_one_service(service, normal_start, normal_end, cpu_series, memory_series):
         result = {
             'service': service,
             'cpu_anomaly': False,
@@ -723,7 +815,8 @@ def analyze_grey_failure(normal_start, normal_end, candidate_root_causes):
 
         # 4. 查询CPU数据
         print(f"🔍 查询 {service} 服务CPU数据...")
-        cpu_anomaly, max_cpu, cpu_data = analyze_cpu(normal_start, normal_end, service, show)
+        cpu_anomaly, max_cpu, cpu_data = analyze_cpu(normal_start, normal_end, service, show,
+                                                     series=cpu_series.get(service, ([], [])))
         result['cpu_data'] = cpu_data
         result['max_cpu'] = max_cpu
         if cpu_anomaly and max_cpu > 30.0:
@@ -735,35 +828,27 @@ def analyze_grey_failure(normal_start, normal_end, candidate_root_causes):
 
         # 5. 查询Memory数据
         print(f"🔍 查询 {service} 服务Memory数据...")
-        if service == "email":
-            result['memory_anomaly'] = False
+        if is_excluded(service, "memory"):
             result['memory_data'] = []
-        else:
-            memory_anomaly, max_memory, memory_data = analyze_memory(normal_start, normal_end, service, show)
-            result['memory_data'] = memory_data
-            result['max_memory'] = max_memory
-            if memory_anomaly and max_memory > 15.0:
-                # 记录内存异常证据
-                evidences_dict[service + '.memory'].append(
-                    f"{service}的内存使用率出现异常，最大值达到{max_memory}%"
-                )
-                result['memory_anomaly'] = True
+            return result
+        memory_anomaly, max_memory, memory_data = analyze_memory(
+            normal_start, normal_end, service, show, series=memory_series.get(service, ([], [])))
+        result['memory_data'] = memory_data
+        result['max_memory'] = max_memory
+        if memory_anomaly and max_memory > 15.0:
+            # 记录内存异常证据
+            evidences_dict[service + '.memory'].append(
+                f"{service}的内存使用率出现异常，最大值达到{max_memory}%"
+            )
+            result['memory_anomaly'] = True
         return result
 
-    total_services = []
-    for candidate in candidate_root_causes:
-        if '.' in candidate and candidate.endswith('.cpu'):
-            service = candidate.split('.')[0]
-            if service[1] == '-' or service == "load-generator":
-                continue
-            total_services.append(service)
-
-    with ThreadPoolExecutor() as executor:
-        futures = [
-            executor.submit(process_one_service, service, normal_start, normal_end) for service in total_services
-        ]
-        for future in as_completed(futures):
-            result = future.result()
+    def detect_pods(cpu_series, memory_series):
+        cpu_list = []
+        memory_list = []
+        # 序列已由批量查询取回，检测不访问后端，直接在当前线程执行
+        for service in total_services:
+            result = process_one_service(service, normal_start, normal_end, cpu_series, memory_series)
             service_name = result['service']
             if result['cpu_anomaly']:
                 cpu_item = service_name + '.cpu'
@@ -780,217 +865,191 @@ def analyze_grey_failure(normal_start, normal_end, candidate_root_causes):
                     'memory_data': result['memory_data'],
                 }
 
-    print(f"🎯 cpu候选服务列表: {cpu_list}")
-    print(f"🎯 memory候选服务列表: {memory_list}")
-    if len(cpu_list) > 1:
-        cpu_list = find_anomalies(cpu_list, root_cause_data)
-    disk_list = []
-    networkloss_list = []
-    if len(cpu_list + memory_list) == 0:
-        def process_one_service_ecs(service, normal_start, normal_end):
-            result = {
-                'service': service,
-                'cpu_anomaly': False,
-                'memory_anomaly': False,
-                'disk_anomaly': False
-            }
-            print(f"🎯 Limiting analysis to candidate service: {service}")
-
-            # 1. 查询CPU数据
-            print(f"🔍 查询 {service} 服务CPU数据...")
-            cpu_anomaly, max_cpu = analyze_ecs_cpu(normal_start, normal_end, service, show)
-            if cpu_anomaly and max_cpu > 30.0:
-                evidences_dict[service + '.cpu'].append(
-                    f"{service}的CPU使用率出现异常，最大值达到{max_cpu}%"
-                )
-                result['cpu_anomaly'] = True
+        print(f"🎯 cpu候选服务列表: {cpu_list}")
+        print(f"🎯 memory候选服务列表: {memory_list}")
+        if len(cpu_list) > 1:
+            cpu_list = find_anomalies(cpu_list, root_cause_data)
+        return keep_highest_priority(cpu_list + memory_list)
 
-            # 2. 查询Memory数据
-            print(f"🔍 查询 {service} 服务Memory数据...")
-            # email服务内存长期存在OOM
-            if service == "email":
-                result['memory_anomaly'] = False
-            else:
-                memory_anomaly, max_memory = analyze_ecs_memory(normal_start, normal_end, service, show)
-                if memory_anomaly and max_memory > 30.0:
-                    evidences_dict[service + '.memory'].append(
-                        f"{service}的内存使用率出现异常，最大值达到{max_memory}%"
-                    )
-                    result['memory_anomaly'] = True
-
-            # 3. 查询Disk数据
-            print(f"🔍 查询 {service} 服务Disk数据...")
-            disk_anomaly, max_disk = analyze_ecs_disk(normal_start, normal_end, service, show)
-            if disk_anomaly and max_disk > 30.0:
-                disk_list.append(service + '.disk')
-                evidences_dict[service + '.disk'].append(
-                    f"{service}的磁盘使用率出现异常，最大值达到{max_disk}%"
-                )
-                result['disk_anomaly'] = True
+    def process_one_service_ecs(service, normal_start, normal_end, metric_series, network_series):
+        result = {
+            'service': service,
+            'cpu_anomaly': False,
+            'memory_anomaly': False,
+            'disk_anomaly': False,
+            'network_anomaly': False
+        }
+        print(f"🎯 Limiting analysis to candidate service: {service}")
 
-            # 4. 获取网络异常
-            anomaly = analyze_network(normal_start, normal_end, service, False)
-            if anomaly >= 2:
-                evidences_dict[service + '.networkLoss'].append(
-                    f"{service}的网络丢包次数过多，存在网络异常"
-                )
-                networkloss_list.append(service + '.networkLoss')
-                result['network_anomaly'] = True
-            return result
+        # 1. 查询CPU数据
+        print(f"🔍 查询 {service} 服务CPU数据...")
+        cpu_anomaly, max_cpu = analyze_ecs_cpu(normal_start, normal_end, service, show,
+                                               series=metric_series["cpu"].get(service, ([], [])))
+        if cpu_anomaly and max_cpu > 30.0:
+            evidences_dict[service + '.cpu'].append(
+                f"{service}的CPU使用率出现异常，最大值达到{max_cpu}%"
+            )
+            result['cpu_anomaly'] = True
 
-        total_servies = []
-        for candidate in candidate_root_causes:
-            if '.' in candidate and candidate.endswith('.cpu'):
-                service = candidate.split('.')[0]
-                if service[1] != '-':
-                    continue
-                total_servies.append(service)
-
-        with ThreadPoolExecutor() as executor:
-            futures = [
-                executor.submit(process_one_service_ecs, service, normal_start, normal_end) for service in total_servies
-            ]
-            for future in as_completed(futures):
-                result = future.result()
-                service_name = result['service']
-                if result['cpu_anomaly']:
-                    cpu_list.append(service_name + '.cpu')
-                if result['memory_anomaly']:
-                    memory_list.append(service_name + '.memory')
+        # 2. 查询Memory数据
+        print(f"🔍 查询 {service} 服务Memory数据...")
+        memory_anomaly, max_memory = False, 0
+        if not is_excluded(service, "memory"):
+            memory_anomaly, max_memory = analyze_ecs_memory(
+                normal_start, normal_end, service, show,
+                series=metric_series["memory"].get(service, ([], [])))
+        if memory_anomaly and max_memory > 30.0:
+            evidences_dict[service + '.memory'].append(
+                f"{service}的内存使用率出现异常，最大值达到{max_memory}%"
+            )
+            result['memory_anomaly'] = True
+
+        # 3. 查询Disk数据
+        print(f"🔍 查询 {service} 服务Disk数据...")
+        disk_anomaly, max_disk = analyze_ecs_disk(normal_start, normal_end, service, show,
+                                                  series=metric_series["disk"].get(service, ([], [])))
+        if disk_anomaly and max_disk > 30.0:
+            evidences_dict[service + '.disk'].append(
+                f"{service}的磁盘使用率出现异常，最大值达到{max_disk}%"
+            )
+            result['disk_anomaly'] = True
+
+        # 4. 获取网络异常
+        anomaly = analyze_network(normal_start, normal_end, service, False,
+                                  series=network_series.get(service, {}))
+        if anomaly >= 2:
+            evidences_dict[service + '.networkLoss'].append(
+                f"{service}的网络丢包次数过多，存在网络异常"
+            )
+            result['network_anomaly'] = True
+        return result
+
+    def detect_ecs(*series):
+        metric_series = dict(zip(ECS_METRICS, series))
+        network_series = series[-1]
+        cpu_list = []
+        memory_list = []
+        disk_list = []
+        networkloss_list = []
+        # 序列已由批量查询取回，检测不访问后端，直接在当前线程执行
+        for service in ecs_services:
+            result = process_one_service_ecs(service, normal_start, normal_end, metric_series, network_series)
+            service_name = result['service']
+            if result['cpu_anomaly']:
+                cpu_list.append(service_name + '.cpu')
+            if result['memory_anomaly']:
+                memory_list.append(service_name + '.memory')
+            if result['disk_anomaly']:
+                disk_list.append(service_name + '.disk')
+            if result['network_anomaly']:
+                networkloss_list.append(service_name + '.networkLoss')
 
-        root_causes = cpu_list + memory_list + disk_list + networkloss_list
         print(f"🎯 ecs cpu候选服务列表: {cpu_list}")
         print(f"🎯 ecs memory候选服务列表: {memory_list}")
         print(f"🎯 ecs disk候选服务列表: {disk_list}")
         print(f"🎯 ecs 网络异常服务列表: {networkloss_list}")
+        return keep_highest_priority(cpu_list + memory_list + disk_list + networkloss_list)
 
-    service_root_causes = {}  # 存储每个服务的最高优先级根因
-    priority = {'memory': 4, 'cpu': 3, 'disk': 2, 'networkLoss': 1}  # 优先级映射
-    combined = cpu_list + memory_list + disk_list + networkloss_list
-    for item in combined:
-        # 解析服务名和根因类型
-        parts = item.split('.')
-        if len(parts) != 2:
-            continue  # 跳过格式异常的项
-        service, cause_type = parts[0], parts[1]
-
-        # 仅处理已知类型
-        if cause_type not in priority:
-            continue
-
-        # 更新当前服务的最高优先级根因
-        if service not in service_root_causes:
-            # 服务首次出现，直接记录
-            service_root_causes[service] = (priority[cause_type], item)
-        else:
-            # 比较优先级，保留更高的
-            current_prio, _ = service_root_causes[service]
-            if priority[cause_type] > current_prio:
-                service_root_causes[service] = (priority[cause_type], item)
-
-    # 提取最终根因（只保留每个服务的最高优先级项）
-    root_causes = [item for (_, item) in service_root_causes.values()]
-
-    # 没有根因，则查询podKill的情况
-    if len(root_causes) == 0:
+    def detect_pod_killer(*pod_counts):
+        # 没有根因，则查询podKill的情况
         podKilled = []
-        for candidate in candidate_root_causes:
-            if '.' in candidate and candidate.endswith('.cpu'):
-                service = candidate.split('.')[0]
-                if service != 'checkout' and service != "frontend" and service != "product-catalog":
-                    continue
-                hostname_list = get_instance(log_client, PROJECT_NAME, LOGSTORE_NAME, service,
-                                             start_str.strip(), end_str.strip())
-                start = datetime.strptime(start_str.strip(), "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone(timedelta(hours=8)))
-                end = datetime.strptime(end_str.strip(), "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone(timedelta(hours=8)))
-                num = 0
-                for hostname in hostname_list:
-                    print(f"🔍 Found hostname {hostname}, processing...")
-                    flag, _ = get_pod(start, end, hostname, True)
-                    if not flag:
-                        num += 1
-                if 0 < num <= 2 and len(hostname_list) > 2:
-                    print(f"✅ podKilled")
-                    evidences_dict[service + '.podKiller'].append(
-                        f"{service}服务的pod在检测时间段内被终止"
-                    )
-                    podKilled.append(service + '.podKiller')
-        root_causes = podKilled
-
-    if len(root_causes) == 0:
+        for service, (num, total) in zip(pod_services, pod_counts):
+            if 0 < num <= 2 and total > 2:
+                print(f"✅ podKilled")
+                evidences_dict[service + '.podKiller'].append(
+                    f"{service}服务的pod在检测时间段内被终止"
+                )
+                podKilled.append(service + '.podKiller')
+        return podKilled
+
+    def detect_jvm_chaos(cpu_anomaly, memory_anomaly, *jvm_results):
         print("⚠️ 根因列表为空，开始查询少见情况")
+        # 候选根因中所有JVM服务的GC、堆内存、线程数指标一次性检测，对应到各服务的 jvmChaos/LargeGc
+        jvm_series = merge_jvm_metrics(jvm_services(candidate_root_causes), dict(zip(JVM_METRICS, jvm_results)))
+        jvm_list = get_jvm_root_causes(detect_jvm_anomalies(normal_start, normal_end, jvm_series),
+                                       candidate_root_causes, evidences_dict)
+        print(f"🎯 JVM候选根因列表: {jvm_list}")
+        if jvm_list:
+            return jvm_list
+
+        # 没有JVM指标异常时沿用 inventory 的CPU/内存判断
         target_service = "inventory"
-        cpu_anomaly = analyze_cpu(normal_start, normal_end, target_service, False)
-        memory_anomaly = analyze_memory(normal_start, normal_end, target_service, False)
         print(f"CPU异常: {cpu_anomaly}, Memory异常: {memory_anomaly}")
         if cpu_anomaly[0] or memory_anomaly[0]:
             evidences_dict[target_service + '.jvmChaos'].append(
                 f"{target_service}服务在检测时间段内存在cpu和memory异常波动，可能是jvmchaos所导致的"
             )
-            root_causes.append(target_service + '.jvmChaos')
-    print(f"🎯 筛选后的根因列表: {root_causes}")
+            return [target_service + '.jvmChaos']
+        return []
 
-    if len(root_causes) == 0:
-        flag, _, _, _, _ = get_log(log_client, PROJECT_NAME, LOGSTORE_NAME, "email", start_str.strip(), end_str.strip(), True, False)
-        cpu_anomaly, _, _ = analyze_cpu(normal_start, normal_end, "email", show, False)
+    def detect_email_oom(latency_result, cpu_result):
+        flag = latency_result[0]
+        cpu_anomaly = cpu_result[0]
         if flag and cpu_anomaly:
-            root_causes = ["email.memory"]
             evidences_dict["email.memory"].append(
                 f"email服务在检测时间段内存在cpu异常下降，且延迟下降，可能是OOM所导致的"
             )
+            return ["email.memory"]
+        return []
 
-    if len(root_causes) == 0:
-        print("⚠️ 根因列表依旧为空，查询延迟情况")
-        def process_one_service(service, normal_start, normal_end, isMedian=True):
-            result = {
-                'service': service,
-                'latency_anomaly': False,
-                'anomaly_data': None,
-                'latency_data': None  # 存储延迟数据
+    def process_one_service_latency(service, latency_result):
+        result = {
+            'service': service,
+            'latency_anomaly': False,
+            'anomaly_data': None,
+            'latency_data': None  # 存储延迟数据
+        }
+        # 获取延迟数据
+        print(f"🎯 Limiting analysis to candidate service: {service}")
+        flag, before, target, after, duration_data = latency_result
+        result['latency_data'] = duration_data
+        if flag:
+            evidences_dict[service + '.networkLatency'].append(
+                f"{service}服务检测到网络延迟异常，异常值为{target}，相比正常区间前半段({before})和后半段({after})存在明显上升！"
+            )
+            result['latency_anomaly'] = True
+            result['anomaly_data'] = {
+                "service": service,
+                "before": before,
+                "target": target,
+                "after": after,
             }
-            # 获取延迟数据
-            print(f"🎯 Limiting analysis to candidate service: {service}")
-            flag, before, target, after, duration_data = get_log(log_client, PROJECT_NAME, LOGSTORE_NAME, service,
-                                                                 start_str.strip(),
-                                                                 end_str.strip(), False)
-            result['latency_data'] = duration_data
-            if flag:
-                evidences_dict[service + '.networkLatency'].append(
-                    f"{service}服务检测到网络延迟异常，异常值为{target}，相比正常区间前半段({before})和后半段({after})存在明显上升！"
-                )
-                result['latency_anomaly'] = True
-                result['anomaly_data'] = {
-                    "service": service,
-                    "before": before,
-                    "target": target,
-                    "after": after,
-                }
-            return result
+        return result
 
-        # 并行
-        total_services = []
-        for candidate in candidate_root_causes:
-            if '.' in candidate and candidate.endswith('.cpu'):
-                service = candidate.split('.')[0]
-                if service[1] == '-' or service == "load-generator":
-                    continue
-                total_services.append(service)
+    def detect_latency(latency_results):
+        nonlocal evidences_dict
+        print("⚠️ 根因列表依旧为空，查询延迟情况")
         latency_candidates = []
         anomaly_list = []
-        with ThreadPoolExecutor() as executor:
-            futures = [
-                executor.submit(process_one_service, service, normal_start, normal_end) for service in
-                total_services
-            ]
-            for future in as_completed(futures):
-                result = future.result()
-                service_name = result['service']
-                if result['latency_anomaly']:
-                    latency_item = service_name + '.networkLatency'
-                    latency_candidates.append(latency_item)
-                    anomaly_list.append(result['anomaly_data'])
+        for service, latency_result in latency_results.items():
+            result = process_one_service_latency(service, latency_result)
+            service_name = result['service']
+            if result['latency_anomaly']:
+                latency_item = service_name + '.networkLatency'
+                latency_candidates.append(latency_item)
+                anomaly_list.append(result['anomaly_data'])
 
         root_causes, evidences_dict = get_only_anomaly(anomaly_list, latency_candidates, evidences_dict)
+        return root_causes
+
+    total_services, ecs_services, pod_services = get_grey_services(candidate_root_causes)
+
+    # 各阶段的数据按阶段优先级依次提交、同时获取，判定仍按 pod → ECS → podKiller → jvmChaos → email OOM → 延迟 的顺序回退
+    with query_executor() as executor:
+        graph = StageGraph(executor, deadline)
+        for name, fn, args in grey_failure_tasks(normal_start, normal_end, candidate_root_causes):
+            graph.data(name, fn, *args)
+
+        graph.stage("pod", detect_pods, inputs=["pod.cpu", "pod.memory"])
+        graph.stage("ecs", detect_ecs, inputs=["ecs." + kind for kind in ECS_METRICS] + ["ecs.network"],
+                    after=["pod"])
+        graph.stage("podKiller", detect_pod_killer, inputs=["podKiller." + service for service in pod_services],
+                    after=["ecs"])
+        graph.stage("jvmChaos", detect_jvm_chaos, inputs=["jvmChaos.cpu", "jvmChaos.memory"] + ["jvmChaos." + kind for kind in JVM_METRICS],
+                    after=["podKiller"])
+        graph.stage("emailOOM", detect_email_oom, inputs=["email.latency", "email.cpu"], after=["jvmChaos"])
+        graph.stage("latency", detect_latency, inputs=["latency"], after=["emailOOM"])
+        root_causes = graph.run() or []
     print(f"🎯 筛选后的根因列表: {root_causes}")
 
     # 收集最终证据
@@ -1005,7 +1064,7 @@ def analyze_grey_failure(normal_start, normal_end, candidate_root_causes):
     return root_causes, root_cause_data, final_evidences
 
 # 处理错误过多报警
-def analyze_error_problem(normal_start, normal_end, candidate_root_causes):
+def analyze_error_problem(normal_start, normal_end, candidate_root_causes, deadline=None):
     error_list = []
     anomaly_list: List[Dict[str, Any]] = []
     root_cause_data = {}
@@ -1034,19 +1093,13 @@ def analyze_error_problem(normal_start, normal_end, candidate_root_causes):
             evidences_dict[service + '.Failure'].append(f"{service}服务在检测时间段内报错次数过多，报错次数为{target_error}")
         return result
 
-    total_services = []
-    for candidate in candidate_root_causes:
-        if '.' in candidate and candidate.endswith('.cpu'):
-            service = candidate.split('.')[0]
-            if service[1] == '-' or service == "load-generator":
-                continue
-            total_services.append(service)
+    total_services = get_candidate_services(candidate_root_causes)
 
-    with ThreadPoolExecutor() as executor:
+    with query_executor() as executor:
         futures = [
             executor.submit(process_one_service, service, normal_start, normal_end) for service in total_services
         ]
-        for future in as_completed(futures):
+        for future in as_completed_until(futures, deadline):
             result = future.result()
             if result['error_anomaly']:
                 error_list.append(result['service'] + '.Failure')
@@ -1094,14 +1147,19 @@ def analyze_error_problem(normal_start, normal_end, candidate_root_causes):
             # 只保留该服务的根因
             root_causes = [item for item in root_causes if item.split('.')[0] == max_amplitude_service]
             print(f"🎯 按最大上升幅度筛选后的根因: {root_causes}")
-    if len(root_causes) > 0 and root_causes[0].split('.')[0] == "inventory":
+    if len(root_causes) > 0 and root_causes[0].split('.')[0] == "inventory" and not expired(deadline):
         print(f"🔍 查询 inventory 服务CPU数据...")
-        cpu_anomaly, max_cpu, _ = analyze_cpu(normal_start, normal_end, "inventory", False)
+        with query_executor() as executor:
+            cpu_future = executor.submit(analyze_cpu, normal_start, normal_end, "inventory", False)
+            log_future = executor.submit(get_log, log_client, PROJECT_NAME, LOGSTORE_NAME, "inventory",
+                                         start_str.strip(), end_str.strip(), True, False)
+            results = {future: future.result() for future in as_completed_until([cpu_future, log_future], deadline)}
+        cpu_anomaly, max_cpu, _ = results.get(cpu_future, (False, 0, []))
         if cpu_anomaly:
             root_causes = ["inventory.jvmChaos"]
             evidences_dict["inventory" + '.jvmChaos'].append(
                 f"inventory服务在检测时间段内错误过多且伴有CPU异常波动，可能是jvmChaos导致的")
-        flag, _, _, _, _ = get_log(log_client, PROJECT_NAME, LOGSTORE_NAME, "inventory", start_str.strip(), end_str.strip(), True, False)
+        flag, _, _, _, _ = results.get(log_future, (False, None, None, None, []))
         if flag:
             root_causes = ["inventory.jvmChaos"]
             evidences_dict["inventory" + '.jvmChaos'].append(
@@ -0,0 +1,155 @@
+"""
+全局查询线程池与单题截止时间
+
+同一进程内所有题目共享一个有界线程池来并行执行各服务的SLS/CMS查询，
+并用同样大小的信号量限制同时在途的查询数，避免多题并行时把后端打满。
+"""
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError
+from contextlib import contextmanager
+
+DEFAULT_QUERY_WORKERS = 16
+
+_lock = threading.Lock()
+_max_workers = DEFAULT_QUERY_WORKERS
+_executor = None
+_slots = threading.BoundedSemaphore(DEFAULT_QUERY_WORKERS)
+
+
+class _ContextExecutor(ThreadPoolExecutor):
+    """任务在提交者的 contextvars 上下文中执行，题目作用域（见 coalesce）随任务进入查询线程"""
+
+    def submit(self, fn, /, *args, **kwargs):
+        return super().submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def configure(max_workers):
+    """设置查询并发上限，需要在第一次提交任务之前调用"""
+    global _max_workers, _executor, _slots
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
+        _max_workers = max(1, int(max_workers))
+        _slots = threading.BoundedSemaphore(_max_workers)
+
+
+def max_workers():
+    """查询并发上限"""
+    return _max_workers
+
+
+def get_executor():
+    """返回进程内共享的查询线程池"""
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = _ContextExecutor(max_workers=_max_workers, thread_name_prefix="query")
+        return _executor
+
+
+@contextmanager
+def query_executor():
+    """
+    以 with 语句的形式使用共享线程池
+
+    与 `with ThreadPoolExecutor() as executor` 不同，退出时不会关闭线程池。
+    """
+    yield get_executor()
+
+
+@contextmanager
+def query_slot():
+    """占用一个查询名额，所有对SLS/CMS的请求都在名额内执行"""
+    slots = _slots
+    with slots:
+        yield
+
+
+def shutdown():
+    global _executor
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
+
+
+class Deadline:
+    """
+    单题处理截止时间
+
+    分析函数在每个阶段开始前检查是否超时；一旦超时就跳过剩余阶段，
+    直接用已经得到的根因作为结果，并把 partial 标记为 True。
+    """
+
+    def __init__(self, seconds=None):
+        self.expires_at = time.monotonic() + seconds if seconds else None
+        self.partial = False
+
+    def remaining(self):
+        """剩余秒数，不限时返回None"""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+
+def expired(deadline):
+    """
+    检查截止时间是否已到（deadline 为 None 表示不限时）
+
+    返回True意味着调用方将跳过后续阶段，因此同时把结果标记为不完整。
+    """
+    if deadline is None or not deadline.expired():
+        return False
+    deadline.partial = True
+    return True
+
+
+def as_completed_until(futures, deadline=None):
+    """
+    与 as_completed 相同，但在截止时间到达时取消尚未完成的任务并停止迭代
+    """
+    timeout = deadline.remaining() if deadline is not None else None
+    try:
+        for future in as_completed(futures, timeout=timeout):
+            if deadline is not None and deadline.expired() and not future.cancelled() \
+                    and isinstance(future.exception(), TimeoutError):
+                # 任务在等待批量查询时到达截止时间而放弃，与 as_completed 本身超时同样处理
+                raise TimeoutError
+            yield future
+    except TimeoutError:
+        pending = [future for future in futures if not future.done()]
+        for future in pending:
+            future.cancel()
+        deadline.partial = True
+        print(f"⏰ 已超过单题处理时长，放弃{len(pending)}个未完成的查询")
+
+
+def remaining(deadline):
+    """距截止时间的秒数，可直接作为 future.result() 的 timeout（deadline 为 None 时返回None，即不限时）"""
+    return deadline.remaining() if deadline is not None else None
+
+
+def call_until(deadline, default, fn, *args, **kwargs):
+    """
+    在共享线程池中执行 fn(*args, **kwargs)，最多等到截止时间
+
+    分析流程中单独的一次查询也不能让整题超过单题处理时长：超时时取消任务（已开始的查询在后台结束），
+    把结果标记为不完整并返回 default。
+    """
+    future = get_executor().submit(fn, *args, **kwargs)
+    try:
+        return future.result(timeout=remaining(deadline))
+    except TimeoutError:
+        if future.done():
+            # fn 自身抛出的超时异常
+            raise
+        future.cancel()
+        deadline.partial = True
+        print(f"⏰ 已超过单题处理时长，放弃查询 {getattr(fn, '__name__', fn)}")
+        return default
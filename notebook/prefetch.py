@@ -0,0 +1,110 @@
+"""
+整批预取（--prefetch）
+
+开始分析之前先扫描全部题目，按告警规则列出对应分析函数一定会发起的查询（服务 × 指标 × 时间窗），
+在共享查询线程池上以最高并发批量执行，结果写入本地查询缓存（以及开启时的时序区间缓存）。
+随后逐题分析时这些查询直接命中缓存，整批耗时接近后端吞吐上限，而不是各题查询耗时之和。
+
+- 只列出分析流程第一阶段无条件发起的查询，依赖中间结果的兜底查询不预取；
+  灰色故障分析的各阶段数据都会投机获取，因此全部预取（见 parallel_agent.grey_failure_tasks）
+- 同时在途的查询数仍受 pool.query_slot 限制
+- 查询窗口尚未结束足够久（不会写入缓存）的题目不预取
+"""
+import time
+from concurrent.futures import as_completed
+from datetime import datetime, timedelta, timezone
+
+import pool
+import query_cache
+import series_cache
+from get_entity import CPU_METRIC, MEMORY_METRIC, get_deployment_metric
+from get_error import get_error
+from get_log import get_log_batch
+from get_prom import JVM_METRICS, get_jvm_metric, jvm_services
+from parallel_agent import LOGSTORE_NAME, PROJECT_NAME, get_candidate_services, grey_failure_tasks, log_client
+
+LATENCY_RULES = ("frontend_avg_rt", "service_avg_rt")
+
+
+def problem_window(problem_data):
+    """题目的故障时间窗，与 main.analyze_problem 的解析方式相同"""
+    start_str, end_str = problem_data.get("time_range", "").split(' ~ ')
+    normal_start = datetime.strptime(start_str.strip(), "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone(timedelta(hours=8)))
+    normal_end = datetime.strptime(end_str.strip(), "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone(timedelta(hours=8)))
+    return normal_start, normal_end
+
+
+def plan_problem(problem_data):
+    """
+    列出一道题的分析函数一定会发起的查询
+
+    Returns:
+        list: [(函数, 参数元组)]，参数与分析函数中的调用完全相同，因此命中同一条缓存
+    """
+    rules = problem_data.get("alarm_rules") or [""]
+    candidate_root_causes = problem_data.get("candidate_root_causes", [])
+    try:
+        normal_start, normal_end = problem_window(problem_data)
+    except ValueError:
+        return []
+    start_str = normal_start.strftime('%Y-%m-%d %H:%M:%S')
+    end_str = normal_end.strftime('%Y-%m-%d %H:%M:%S')
+    services = tuple(get_candidate_services(candidate_root_causes))
+
+    if rules[0] == 'greyFailure':
+        # 灰色故障的各阶段数据本来就投机地同时获取，直接用分析时注册的同一份数据节点
+        return [(fn, args) for _, fn, args in grey_failure_tasks(normal_start, normal_end, candidate_root_causes)]
+
+    tasks = []
+    if rules[0] in LATENCY_RULES:
+        tasks += [(get_deployment_metric, (normal_start, normal_end, services, CPU_METRIC)),
+                  (get_deployment_metric, (normal_start, normal_end, services, MEMORY_METRIC))]
+        tasks.append((get_log_batch, (log_client, PROJECT_NAME, LOGSTORE_NAME, services, start_str, end_str)))
+        jvm = tuple(jvm_services(candidate_root_causes))
+        tasks += [(get_jvm_metric, (normal_start, normal_end, jvm, metric)) for metric in JVM_METRICS.values()]
+    elif rules[0] == 'overall_error_count':
+        tasks += [(get_error, (log_client, PROJECT_NAME, LOGSTORE_NAME, service, start_str, end_str))
+                  for service in services]
+    return tasks
+
+
+def plan(problems):
+    """所有题目需要预取的查询，去掉重复的查询和结果不会被缓存的题目"""
+    tasks = {}
+    for problem_data in problems:
+        try:
+            _, normal_end = problem_window(problem_data)
+        except ValueError:
+            continue
+        if not query_cache.is_cacheable((normal_end + timedelta(minutes=10)).timestamp()):
+            continue
+        for task in plan_problem(problem_data):
+            tasks.setdefault(task, None)
+    return list(tasks)
+
+
+def prefetch(problems):
+    """
+    批量执行所有题目需要的查询，结果留在缓存中供随后的分析使用
+
+    Returns:
+        tuple: (执行的查询任务数, 失败数)
+    """
+    if query_cache.get_cache() is None and not series_cache.SERIES_CACHE_ENABLED:
+        print("⚠️ 本地查询缓存已关闭，跳过预取")
+        return 0, 0
+    tasks = plan(problems)
+    if not tasks:
+        return 0, 0
+    started = time.monotonic()
+    failed = 0
+    with pool.query_executor() as executor:
+        futures = [executor.submit(fn, *args) for fn, args in tasks]
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                failed += 1
+                print(f"⚠️ 预取失败: {e}")
+    print(f"📦 预取 {len(tasks)} 组查询，用时 {time.monotonic() - started:.1f} 秒，失败 {failed} 组")
+    return len(tasks), failed
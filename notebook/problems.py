@@ -0,0 +1,83 @@
+"""
+题目输入读取
+
+iter_problems 边解析边产出题目，不会把整个JSONL一次性读进内存：
+- input_file_path 为 "-" 时从标准输入读取，便于上游告警系统直接通过管道推送故障
+- follow=True 时像 `tail -f` 一样持续读取不断增长的文件
+"""
+import json
+import sys
+import time
+
+
+def _parse_line(line):
+    line = line.strip()
+    if not line:  # Skip empty lines
+        return None
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError as e:
+        print(f"⚠️ Failed to parse line: {line[:100]}... Error: {e}")
+        return None
+
+
+def _follow_lines(f, poll_interval):
+    """持续读取文件新增的完整行，写了一半的行等写完再产出"""
+    buffer = ""
+    while True:
+        chunk = f.readline()
+        if not chunk:
+            time.sleep(poll_interval)
+            continue
+        buffer += chunk
+        if buffer.endswith("\n"):
+            yield buffer
+            buffer = ""
+
+
+def iter_problems(input_file_path, follow=False, poll_interval=1.0):
+    """
+    逐条读取JSONL中的题目
+
+    Args:
+        input_file_path: 输入JSONL文件路径，"-" 表示标准输入
+        follow: 读到文件末尾后是否继续等待新追加的题目（标准输入读到EOF即结束）
+        poll_interval: follow 模式下的轮询间隔(秒)
+
+    Yields:
+        dict: 解析后的题目
+    """
+    count = 0
+    try:
+        if input_file_path == "-":
+            for line in sys.stdin:
+                item = _parse_line(line)
+                if item is not None:
+                    count += 1
+                    yield item
+        else:
+            with open(input_file_path, 'r', encoding='utf-8') as f:
+                lines = _follow_lines(f, poll_interval) if follow else f
+                for line in lines:
+                    item = _parse_line(line)
+                    if item is not None:
+                        count += 1
+                        yield item
+        print(f"✅ Successfully read {count} records from {input_file_path}")
+    except FileNotFoundError:
+        print(f"❌ Input file not found: {input_file_path}")
+    except Exception as e:
+        print(f"❌ Failed to read input file: {e}")
+
+
+def read_input_data(input_file_path):
+    """
+    Read and parse input data from JSONL file
+
+    Args:
+        input_file_path: Path to the input JSONL file
+
+    Returns:
+        list: List of parsed JSON objects
+    """
+    return list(iter_problems(input_file_path))
@@ -0,0 +1,196 @@
+"""
+SLS/CMS查询结果的本地持久化缓存
+
+故障时间窗都是历史数据，同一条查询在同一时间范围内的结果不会再变化，
+因此按 (规范化后的查询语句, fromTime, toTime, ...) 缓存原始响应到本地SQLite：
+调阈值时反复重跑几乎不再访问网络。
+
+- 只缓存结束时间早于 QUERY_CACHE_FRESH_SECONDS 之前的查询，避免缓存仍在写入的数据
+- 条目超过 TTL 后失效；总大小超过上限时按最近访问时间淘汰（LRU）
+- 命中率等计数可通过 stats()/report() 查看
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+QUERY_CACHE_ENABLED = os.getenv("QUERY_CACHE", "1") != "0"
+QUERY_CACHE_PATH = os.getenv(
+    "QUERY_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "queries.sqlite"))
+QUERY_CACHE_TTL_SECONDS = float(os.getenv("QUERY_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+QUERY_CACHE_MAX_MB = float(os.getenv("QUERY_CACHE_MAX_MB", "1024"))
+QUERY_CACHE_FRESH_SECONDS = 600
+
+
+def normalize_query(query):
+    """去掉缩进、换行和多余空白，让排版不同但内容相同的查询命中同一条缓存"""
+    return " ".join(str(query).split())
+
+
+def make_key(**fields):
+    """由查询字段生成缓存键"""
+    text = json.dumps(fields, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def is_cacheable(to_time):
+    """查询窗口已经结束足够久才缓存"""
+    try:
+        return float(to_time) < time.time() - QUERY_CACHE_FRESH_SECONDS
+    except (TypeError, ValueError):
+        return False
+
+
+class QueryCache:
+    """
+    基于SQLite的键值缓存，值为可JSON序列化的原始响应
+
+    线程安全：所有题目和查询线程共享同一个连接，由锁串行化访问。
+    """
+
+    def __init__(self, path=QUERY_CACHE_PATH, ttl_seconds=QUERY_CACHE_TTL_SECONDS,
+                 max_bytes=int(QUERY_CACHE_MAX_MB * 1024 * 1024)):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = None
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries(accessed_at)")
+            conn.execute("DELETE FROM entries WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+            conn.commit()
+            self._total_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    def get(self, key):
+        """返回缓存的值，未命中或已过期返回None"""
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT value, size, created_at FROM entries WHERE key = ?", (key,)).fetchone()
+            now = time.time()
+            if row is not None and now - row[2] > self.ttl_seconds:
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                conn.commit()
+                self._total_bytes -= row[1]
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            conn.commit()
+            self.hits += 1
+        return json.loads(zlib.decompress(row[0]).decode("utf-8"))
+
+    def put(self, key, value):
+        blob = zlib.compress(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+        if len(blob) > self.max_bytes:
+            return
+        with self._lock:
+            conn = self._connect()
+            now = time.time()
+            old = conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            conn.execute("INSERT OR REPLACE INTO entries (key, value, size, created_at, accessed_at) "
+                         "VALUES (?, ?, ?, ?, ?)", (key, blob, len(blob), now, now))
+            self._total_bytes += len(blob) - (old[0] if old else 0)
+            self.stores += 1
+            self._evict_locked(conn)
+            conn.commit()
+
+    def _evict_locked(self, conn):
+        """超出大小上限时按最近访问时间从旧到新淘汰，直到降到上限的90%"""
+        if self._total_bytes <= self.max_bytes:
+            return
+        target = self.max_bytes * 0.9
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed_at").fetchall():
+            if self._total_bytes <= target:
+                break
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._total_bytes -= size
+            self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "bytes": self._total_bytes,
+        }
+
+    def report(self):
+        stats = self.stats()
+        if stats["hits"] + stats["misses"] == 0:
+            return
+        print(f"💾 查询缓存: 命中 {stats['hits']} / 未命中 {stats['misses']} "
+              f"(命中率 {stats['hit_rate']:.1%})，新增 {stats['stores']}，淘汰 {stats['evictions']}，"
+              f"占用 {stats['bytes'] / 1024 / 1024:.1f}MB")
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """返回进程内共享的 QueryCache，缓存被禁用时返回None"""
+    global _cache
+    if not QUERY_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = QueryCache()
+    return _cache
+
+
+def disable():
+    """关闭缓存（--no-cache）"""
+    global QUERY_CACHE_ENABLED
+    QUERY_CACHE_ENABLED = False
+
+
+def cached(key, to_time, loader):
+    """
+    先查缓存，未命中时调用 loader() 取原始响应并写入缓存
+
+    loader 返回None表示查询失败，不缓存。
+    """
+    cache = get_cache()
+    if cache is None or not is_cacheable(to_time):
+        return loader()
+    value = cache.get(key)
+    if value is None:
+        value = loader()
+        if value is not None:
+            cache.put(key, value)
+    return value
@@ -0,0 +1,94 @@
+"""
+SLS/CMS查询的录制与回放
+
+- --record DIR：把运行中每一次SLS/CMS查询的原始响应写入 DIR，每条查询一个JSON文件
+- --replay DIR：只从 DIR 读取响应，不需要凭证也不访问网络，用于离线复现、基准测试和性能分析
+
+文件名由查询的缓存键生成（见 query_cache.make_key），同一条查询在录制和回放时命中同一个文件。
+回放时找不到的查询按查询失败处理。
+"""
+import json
+import os
+import threading
+
+from query_cache import make_key
+
+_mode = None
+_directory = None
+_lock = threading.Lock()
+_replayed = 0
+_missing = 0
+_recorded = 0
+
+
+class ReplayMiss(Exception):
+    """回放目录中没有这条查询的录制结果"""
+
+
+def configure(record=None, replay=None):
+    """设置录制或回放目录，两者最多指定一个"""
+    global _mode, _directory
+    if record and replay:
+        raise ValueError("--record 和 --replay 不能同时使用")
+    if record:
+        os.makedirs(record, exist_ok=True)
+        _mode, _directory = "record", record
+    elif replay:
+        if not os.path.isdir(replay):
+            raise ValueError(f"回放目录不存在: {replay}")
+        _mode, _directory = "replay", replay
+    else:
+        _mode, _directory = None, None
+
+
+def replaying():
+    return _mode == "replay"
+
+
+def _path(fields):
+    return os.path.join(_directory, f"{fields['kind']}-{make_key(**fields)}.json")
+
+
+def fetch(fields, loader):
+    """
+    录制/回放层：回放模式下直接读文件，否则调用 loader() 并在录制模式下保存结果
+
+    Args:
+        fields: 查询字段（与缓存键使用的字段相同）
+        loader: 真正获取原始响应的函数，失败时返回None
+
+    Returns:
+        原始响应，回放时找不到返回None
+    """
+    global _replayed, _missing, _recorded
+    if _mode == "replay":
+        path = _path(fields)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                payload = json.load(f)["payload"]
+        except FileNotFoundError:
+            with _lock:
+                _missing += 1
+            print(f"⚠️ 回放目录中没有这条查询: {fields.get('query', '')[:100]}")
+            return None
+        with _lock:
+            _replayed += 1
+        return payload
+
+    payload = loader()
+    if _mode == "record" and payload is not None:
+        path = _path(fields)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"request": fields, "payload": payload}, f, ensure_ascii=False, default=str)
+        os.replace(tmp_path, path)
+        with _lock:
+            _recorded += 1
+    return payload
+
+
+def report():
+    if _mode == "record":
+        print(f"📼 已录制 {_recorded} 条查询到 {_directory}")
+    elif _mode == "replay":
+        print(f"📼 从 {_directory} 回放 {_replayed} 条查询，缺失 {_missing} 条")
@@ -0,0 +1,245 @@
+"""
+SLS/CMS请求的重试、退避和对冲
+
+- 失败的请求最多尝试 QUERY_ATTEMPTS 次，两次尝试之间按指数退避并加全抖动（full jitter），
+  参数错误之类重试也不会成功的错误直接抛出
+- 每个请求的超时由SDK的连接/读取超时控制（QUERY_TIMEOUT_SECONDS，见 session）
+- 开启对冲（--hedge / QUERY_HEDGE=1）后，请求在本后端最近时延的P95之后仍未返回时，再发一个相同的请求，
+  取先成功返回的结果；样本不足 HEDGE_MIN_SAMPLES 时不对冲
+
+对冲请求同样占用限流器和查询名额，后端被限流时对冲也会随之减少。
+
+每个后端还有一个熔断器：连续 BREAKER_FAILURES 次请求（重试后）仍然失败时熔断，
+BREAKER_COOLDOWN_SECONDS 秒内该后端的请求直接失败；冷却后放行一个试探请求，成功则恢复。
+"""
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+
+import pool
+
+QUERY_ATTEMPTS = int(os.getenv("QUERY_ATTEMPTS", "3"))
+QUERY_BACKOFF_BASE_SECONDS = float(os.getenv("QUERY_BACKOFF_BASE_SECONDS", "1"))
+QUERY_BACKOFF_CAP_SECONDS = float(os.getenv("QUERY_BACKOFF_CAP_SECONDS", "20"))
+QUERY_TIMEOUT_SECONDS = float(os.getenv("QUERY_TIMEOUT_SECONDS", "60"))
+QUERY_HEDGE = os.getenv("QUERY_HEDGE", "0") == "1"
+HEDGE_PERCENTILE = 95
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MIN_DELAY_SECONDS = 0.2
+LATENCY_WINDOW = 200
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN_SECONDS = float(os.getenv("BREAKER_COOLDOWN_SECONDS", "30"))
+
+# 重试也不会成功的错误码
+NON_RETRYABLE_CODES = ("ParameterInvalid", "InvalidParameter", "InvalidQuery", "ProjectNotExist",
+                       "LogStoreNotExist", "Unauthorized", "SignatureNotMatch", "CircuitOpen")
+
+
+class CircuitOpen(Exception):
+    """后端处于熔断状态，请求未发出"""
+
+    code = "CircuitOpen"
+
+    def __init__(self, endpoint):
+        super().__init__(f"{endpoint} 连续失败，已熔断")
+        self.endpoint = endpoint
+
+
+def enable_hedging():
+    global QUERY_HEDGE
+    QUERY_HEDGE = True
+
+
+def is_retryable(error):
+    """参数、权限、资源不存在之类的错误不重试"""
+    code = getattr(error, "code", None)
+    if code is None and hasattr(error, "get_error_code"):
+        code = error.get_error_code()
+    return str(code) not in NON_RETRYABLE_CODES
+
+
+def backoff_delay(attempt):
+    """第 attempt 次失败后的等待时间：[0, min(上限, 基数 * 2^attempt)] 内均匀分布"""
+    return random.uniform(0, min(QUERY_BACKOFF_CAP_SECONDS, QUERY_BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+
+class LatencyTracker:
+    """每个后端最近 LATENCY_WINDOW 次成功请求的耗时"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latencies = {}
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def record(self, endpoint, latency):
+        with self._lock:
+            self._latencies.setdefault(endpoint, deque(maxlen=LATENCY_WINDOW)).append(latency)
+
+    def percentile(self, endpoint, q):
+        """耗时的 q 分位数，样本不足时返回None"""
+        with self._lock:
+            samples = sorted(self._latencies.get(endpoint, ()))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * q / 100))]
+
+    def count_hedge(self, won):
+        with self._lock:
+            self.hedges += 1
+            self.hedge_wins += int(won)
+
+
+class CircuitBreaker:
+    """单个后端的熔断器：closed → open（连续失败）→ half_open（冷却后试探）→ closed"""
+
+    def __init__(self, name, failures=None, cooldown=None):
+        self.name = name
+        self.max_failures = failures or BREAKER_FAILURES
+        self.cooldown = BREAKER_COOLDOWN_SECONDS if cooldown is None else cooldown
+        self.state = "closed"
+        self.failures = 0
+        self.opened = 0
+        self.rejected = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """是否放行一个请求；冷却结束后只放行一个试探请求"""
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.cooldown:
+                self.state = "half_open"
+                return True
+            if self.state == "closed":
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or (self.state == "closed" and self.failures >= self.max_failures):
+                if self.state == "closed":
+                    print(f"🔌 {self.name} 连续失败 {self.failures} 次，熔断 {self.cooldown:.0f} 秒")
+                self.state = "open"
+                self._opened_at = time.monotonic()
+                self.opened += 1
+
+
+_tracker = LatencyTracker()
+_breakers = {}
+_breaker_lock = threading.Lock()
+_hedge_executor = None
+_hedge_lock = threading.Lock()
+
+
+def get_tracker():
+    return _tracker
+
+
+def get_breaker(endpoint):
+    with _breaker_lock:
+        breaker = _breakers.get(endpoint)
+        if breaker is None:
+            breaker = _breakers[endpoint] = CircuitBreaker(endpoint)
+        return breaker
+
+
+def reset_breakers():
+    with _breaker_lock:
+        _breakers.clear()
+
+
+def _get_hedge_executor():
+    """对冲使用独立的线程池：请求本身运行在查询线程上，等待对冲时不能再占用查询线程池"""
+    global _hedge_executor
+    with _hedge_lock:
+        if _hedge_executor is None:
+            _hedge_executor = pool._ContextExecutor(max_workers=32, thread_name_prefix="hedge")
+        return _hedge_executor
+
+
+def _timed(fn, endpoint):
+    started = time.monotonic()
+    result = fn()
+    _tracker.record(endpoint, time.monotonic() - started)
+    return result
+
+
+def _hedged(fn, endpoint):
+    """超过P95耗时仍未返回时再发一个相同请求，返回先成功的结果"""
+    delay = _tracker.percentile(endpoint, HEDGE_PERCENTILE) if QUERY_HEDGE else None
+    if delay is None:
+        return _timed(fn, endpoint)
+
+    executor = _get_hedge_executor()
+    primary = executor.submit(_timed, fn, endpoint)
+    done, _ = wait([primary], timeout=max(delay, HEDGE_MIN_DELAY_SECONDS))
+    if done:
+        return primary.result()
+
+    hedge = executor.submit(_timed, fn, endpoint)
+    pending = {primary, hedge}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                _tracker.count_hedge(future is hedge)
+                return future.result()
+            error = error or future.exception()
+    raise error
+
+
+def call(fn, endpoint, attempts=None, retryable=is_retryable):
+    """
+    带重试、退避和对冲地执行一次请求
+
+    Args:
+        fn: 发出请求的函数，失败时抛出异常
+        endpoint: 后端名称（见 limiter），用于统计时延和日志
+        attempts: 最多尝试次数，默认 QUERY_ATTEMPTS
+        retryable: 判断异常是否值得重试
+
+    Returns:
+        fn() 的返回值；所有尝试都失败时抛出最后一次的异常，后端熔断时抛出 CircuitOpen
+    """
+    breaker = get_breaker(endpoint)
+    if not breaker.allow():
+        raise CircuitOpen(endpoint)
+    attempts = max(1, attempts or QUERY_ATTEMPTS)
+    for attempt in range(attempts):
+        try:
+            result = _hedged(fn, endpoint)
+        except Exception as e:
+            if not retryable(e):
+                # 参数之类的错误说明后端仍在正常响应
+                breaker.record_success()
+                raise
+            if attempt == attempts - 1:
+                breaker.record_failure()
+                raise
+            delay = backoff_delay(attempt)
+            print(f"⚠️ {endpoint} 查询失败 (尝试 {attempt + 1}/{attempts})，{delay:.1f} 秒后重试: {e}")
+            time.sleep(delay)
+        else:
+            breaker.record_success()
+            return result
+
+
+def report():
+    if _tracker.hedges:
+        print(f"🪁 对冲请求 {_tracker.hedges} 次，其中 {_tracker.hedge_wins} 次先于原请求返回")
+    with _breaker_lock:
+        breakers = list(_breakers.values())
+    for breaker in breakers:
+        if breaker.opened:
+            print(f"🔌 {breaker.name}: 熔断 {breaker.opened} 次，直接拒绝 {breaker.rejected} 个请求")
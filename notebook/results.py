@@ -0,0 +1,110 @@
+"""
+结果文件的流式写入与断点续跑
+
+每道题完成后立即追加一行并 fsync 到输出JSONL，进程中途崩溃也不会丢失已完成的结果；
+配合 --resume 重新运行时，会跳过输出文件里已经完整求解过的题目。
+"""
+import json
+import os
+import threading
+
+
+def load_results(file_path):
+    """
+    读取已有的输出文件
+
+    崩溃时最后一行可能只写了一半，解析失败的行直接忽略；同一题出现多次时以最后一次为准。
+
+    Returns:
+        dict: {problem_id: result}
+    """
+    results = {}
+    if not os.path.exists(file_path):
+        return results
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                print(f"⚠️ 忽略输出文件中不完整的行: {line[:80]}")
+                continue
+            if isinstance(result, dict) and result.get("problem_id") is not None:
+                results[result["problem_id"]] = result
+    return results
+
+
+def solved_problem_ids(results):
+    """已经完整求解的题目（超时得到的 partial 结果需要重跑）"""
+    return {problem_id for problem_id, result in results.items() if not result.get("partial")}
+
+
+class ResultWriter:
+    """
+    线程安全的JSONL结果写入器
+
+    - resume=False 时清空输出文件；resume=True 时保留已有结果并在末尾继续追加
+    - write() 每写一行就 flush + fsync
+    - compact() 按题目顺序重写文件，去掉重复和不完整的行
+    """
+
+    def __init__(self, file_path, resume=False):
+        self.file_path = file_path
+        self._lock = threading.Lock()
+        self.results = load_results(file_path) if resume else {}
+        directory = os.path.dirname(os.path.abspath(file_path))
+        os.makedirs(directory, exist_ok=True)
+        if resume:
+            self._terminate_last_line()
+        self._file = open(file_path, 'a' if resume else 'w', encoding='utf-8')
+
+    def _terminate_last_line(self):
+        """崩溃留下的半行没有换行符，先补上，避免和新追加的结果粘在一起"""
+        if not os.path.exists(self.file_path) or os.path.getsize(self.file_path) == 0:
+            return
+        with open(self.file_path, 'rb+') as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                f.write(b'\n')
+
+    def write(self, result):
+        line = json.dumps(result, ensure_ascii=False) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.results[result["problem_id"]] = result
+
+    def compact(self, order=None):
+        """
+        按 order 给出的题目顺序重写输出文件（不在 order 中的题目排在最后）
+
+        先写临时文件再原子替换，重写过程中崩溃也不会破坏已有结果。
+        """
+        with self._lock:
+            self._file.close()
+            position = {problem_id: index for index, problem_id in enumerate(order or [])}
+            ordered = sorted(self.results.values(),
+                             key=lambda result: (position.get(result["problem_id"], len(position)),
+                                                 str(result["problem_id"])))
+            tmp_path = self.file_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for result in ordered:
+                    f.write(json.dumps(result, ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.file_path)
+            self._file = open(self.file_path, 'a', encoding='utf-8')
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
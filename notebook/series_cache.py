@@ -0,0 +1,165 @@
+"""
+按时间区间缓存的1分钟粒度时序（--series-cache / SERIES_CACHE=1）
+
+相邻或重叠的故障时间窗加上前后10分钟之后，同一条时序（同一实体的同一指标）的大部分分钟会被反复查询。
+这里按 (时序来源, 实体) 保存已经取回的分钟点和已覆盖的时间区间：新的请求只查询尚未覆盖的子区间，
+再与缓存中的点拼接，批量跑一整天的题目时每条时序的每一分钟大约只取一次。
+
+- 时间区间按分钟对齐，一次查询 [from, to] 覆盖 floor(from) 到 floor(to) 的所有分钟点；
+  只缺一分钟时向前多查一个步长，避免 from == to 的查询没有返回任何点
+- 同一批实体中缺失区间相同的实体合并为一次查询
+- 只缓存已经结束足够久的时间窗（与 query_cache 相同），查询失败的区间不记为已覆盖
+- 缓存的时序条数超过上限时按最近访问淘汰
+"""
+import os
+import threading
+from collections import OrderedDict
+
+from query_cache import is_cacheable
+
+SERIES_CACHE_ENABLED = os.getenv("SERIES_CACHE", "0") == "1"
+SERIES_CACHE_MAX_SERIES = int(os.getenv("SERIES_CACHE_MAX_SERIES", "20000"))
+STEP_SECONDS = 60
+
+
+def enable():
+    global SERIES_CACHE_ENABLED
+    SERIES_CACHE_ENABLED = True
+
+
+def _subtract(start, end, covered, step):
+    """[start, end] 中没有被 covered 覆盖的分钟区间"""
+    missing = []
+    cursor = start
+    for s, e in covered:
+        if e < cursor:
+            continue
+        if s > end:
+            break
+        if s > cursor:
+            missing.append((cursor, min(s - step, end)))
+        cursor = max(cursor, e + step)
+        if cursor > end:
+            break
+    if cursor <= end:
+        missing.append((cursor, end))
+    return missing
+
+
+def _merge(covered, start, end, step):
+    intervals = sorted(covered + [(start, end)])
+    merged = [intervals[0]]
+    for s, e in intervals[1:]:
+        if s <= merged[-1][1] + step:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], e))
+        else:
+            merged.append((s, e))
+    return merged
+
+
+class SeriesCache:
+    """(时序来源, 实体) → 已覆盖的分钟区间和分钟点"""
+
+    def __init__(self, max_series=SERIES_CACHE_MAX_SERIES, step=STEP_SECONDS):
+        self.max_series = max_series
+        self.step = step
+        self._lock = threading.Lock()
+        self._series = OrderedDict()
+        self.fetched_minutes = 0
+        self.reused_minutes = 0
+
+    def missing(self, key, start, end):
+        """[start, end]（已按分钟对齐）中尚未覆盖的区间"""
+        with self._lock:
+            entry = self._series.get(key)
+            covered = entry["covered"] if entry else []
+        return _subtract(start, end, covered, self.step)
+
+    def store(self, key, start, end, timestamps, values):
+        """记录一次查询取回的点，并把 [start, end] 记为已覆盖"""
+        with self._lock:
+            entry = self._series.get(key)
+            if entry is None:
+                entry = self._series[key] = {"covered": [], "points": {}}
+            self._series.move_to_end(key)
+            entry["covered"] = _merge(entry["covered"], start, end, self.step)
+            for ts, value in zip(timestamps, values):
+                entry["points"][ts] = value
+            self.fetched_minutes += (end - start) // self.step + 1
+            while len(self._series) > self.max_series:
+                self._series.popitem(last=False)
+
+    def read(self, key, start, end):
+        """返回 [start, end] 内的 (timestamps, values)，按时间排序"""
+        with self._lock:
+            entry = self._series.get(key)
+            if entry is None:
+                return [], []
+            self._series.move_to_end(key)
+            points = sorted((ts, value) for ts, value in entry["points"].items()
+                            if start <= ts.timestamp() <= end)
+        return [ts for ts, _ in points], [value for _, value in points]
+
+    def count_reused(self, minutes):
+        with self._lock:
+            self.reused_minutes += minutes
+
+    def report(self):
+        if self.fetched_minutes or self.reused_minutes:
+            print(f"🧩 时序区间缓存: 查询 {self.fetched_minutes} 分钟，复用 {self.reused_minutes} 分钟，"
+                  f"缓存 {len(self._series)} 条时序")
+
+
+_cache = SeriesCache()
+
+
+def get_cache():
+    return _cache
+
+
+def fetch_series(source, entities, from_time, to_time, fetch):
+    """
+    通过区间缓存取回多个实体的同一条时序
+
+    Args:
+        source: 标识一类时序的可哈希值（查询模板和指标名）
+        entities: 实体名列表
+        from_time, to_time: 查询时间范围（秒）
+        fetch: fetch(entities, from_time, to_time) 真正查询，返回 {实体: (timestamps, values)}，失败时返回None
+
+    Returns:
+        dict: {实体: (timestamps, values)}，没有数据的实体不出现。结果由多次分段查询拼接而成，
+        分钟点与一次查询整个时间范围基本一致，但后端在分段边界上的对齐或聚合可能略有不同
+    """
+    if not SERIES_CACHE_ENABLED or not is_cacheable(to_time):
+        return fetch(entities, from_time, to_time)
+
+    cache = _cache
+    step = cache.step
+    start = int(from_time) - int(from_time) % step
+    end = int(to_time) - int(to_time) % step
+
+    # 缺失区间相同的实体合并为一次查询
+    plan = {}
+    for entity in entities:
+        plan.setdefault(tuple(cache.missing((source, entity), start, end)), []).append(entity)
+    for segments, group in plan.items():
+        for s, e in segments:
+            # 只缺一分钟时 from == to，后端可能不返回任何点；向前多查已经取回过的一分钟
+            s = min(s, e - step)
+            result = fetch(group, s, e)
+            if result is None:
+                return fetch(entities, from_time, to_time)
+            for entity in group:
+                timestamps, values = result.get(entity, ([], []))
+                cache.store((source, entity), s, e, timestamps, values)
+        missing = sum((e - s) // step + 1 for s, e in segments)
+        cache.count_reused(((end - start) // step + 1 - missing) * len(group))
+
+    series = {}
+    for entity in entities:
+        timestamps, values = cache.read((source, entity), start, end)
+        if timestamps:
+            series[entity] = (timestamps, values)
+    return series
+
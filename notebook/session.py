@@ -0,0 +1,339 @@
+"""
+进程级凭证与客户端管理
+
+所有分析模块共享同一份STS临时凭证、一个SLS客户端和一个CMS客户端：
+凭证在第一次真正发起查询时才去AssumeRole，并在过期前由后台线程自动刷新，
+长时间批量运行时不会因为token过期而失败。
+"""
+import json
+import os
+import threading
+import time
+
+import limiter
+import pool
+import replay
+import resilience
+from coalesce import coalesced
+from pool import query_slot
+from query_cache import cached, make_key, normalize_query
+
+REGION = "cn-qingdao"
+
+# CMS 指标配置
+CMS_WORKSPACE = "tianchi-workspace"
+CMS_ENDPOINT = os.getenv("CMS_ENDPOINT", "cms.cn-qingdao.aliyuncs.com")
+SLS_ENDPOINT = os.getenv("SLS_ENDPOINT", "cn-qingdao.log.aliyuncs.com")
+# 本地CMS替身：synthetic 或时序文件路径（见 cms_standin）
+CMS_STANDIN = os.getenv("CMS_STANDIN", "")
+
+# STS 临时凭证有效期，以及提前多久在后台刷新
+STS_DURATION_SECONDS = 3600
+STS_REFRESH_MARGIN_SECONDS = 300
+STS_RETRY_SECONDS = 60
+# 为1时拿不到STS临时凭证直接报错，不退回主账号AccessKey
+STS_REQUIRED = os.getenv("STS_REQUIRED", "0") == "1"
+
+
+def get_sts_credentials():
+    try:
+        from aliyunsdkcore.client import AcsClient
+        from aliyunsdksts.request.v20150401 import AssumeRoleRequest
+
+        MAIN_ACCOUNT_ACCESS_KEY_ID = os.getenv('ALIBABA_CLOUD_ACCESS_KEY_ID')
+        MAIN_ACCOUNT_ACCESS_KEY_SECRET = os.getenv('ALIBABA_CLOUD_ACCESS_KEY_SECRET')
+        ALIBABA_CLOUD_ROLE_ARN = os.getenv('ALIBABA_CLOUD_ROLE_ARN', 'acs:ram::1672753017899339:role/tianchi-user-a')
+        STS_SESSION_NAME = os.getenv('ALIBABA_CLOUD_ROLE_SESSION_NAME', 'my-sls-access')
+
+        if not MAIN_ACCOUNT_ACCESS_KEY_ID or not MAIN_ACCOUNT_ACCESS_KEY_SECRET:
+            return None, None, None
+
+        client = AcsClient(MAIN_ACCOUNT_ACCESS_KEY_ID, MAIN_ACCOUNT_ACCESS_KEY_SECRET, REGION)
+        request = AssumeRoleRequest.AssumeRoleRequest()
+        request.set_RoleArn(ALIBABA_CLOUD_ROLE_ARN)
+        request.set_RoleSessionName(STS_SESSION_NAME)
+        request.set_DurationSeconds(STS_DURATION_SECONDS)
+
+        response = client.do_action_with_exception(request)
+        response_data = json.loads(response)
+        credentials = response_data['Credentials']
+        return (credentials['AccessKeyId'], credentials['AccessKeySecret'], credentials['SecurityToken'])
+    except Exception as e:
+        print(f"❌ 获取STS凭证失败: {e}")
+        return None, None, None
+
+
+def load_payload(fields, to_time, loader):
+    """
+    按 本题内合并 → 录制/回放 → 本地缓存 → 真实查询 的顺序获取一条查询的原始响应
+
+    Args:
+        fields: 标识这条查询的字段，用于生成缓存键和录制文件名
+        to_time: 查询窗口的结束时间，用于判断能否缓存
+        loader: 真正访问SLS/CMS的函数，失败时返回None
+    """
+    key = make_key(**fields)
+    return coalesced(key, lambda: replay.fetch(fields, lambda: cached(key, to_time, loader)))
+
+
+def sls_request_fields(request):
+    """标识一条 GetLogsRequest 的字段"""
+    return dict(
+        kind="sls",
+        project=request.get_project(),
+        logstore=request.get_logstore(),
+        query=normalize_query(request.get_query()),
+        from_time=request.get_from(),
+        to_time=request.get_to(),
+        topic=request.get_topic(),
+        line=request.get_line(),
+        offset=request.get_offset(),
+        reverse=request.get_reverse(),
+        power_sql=request.get_power_sql(),
+    )
+
+
+class SlsClient:
+    """
+    SLS客户端代理，接口与 aliyun.log.LogClient.get_logs 一致
+
+    每次调用时取当前有效的 LogClient，凭证刷新后自动切换到新客户端。
+    历史时间窗的查询结果会写入本地缓存（见 query_cache）。
+    """
+
+    def __init__(self, session):
+        self._session = session
+
+    def _fetch(self, request):
+        """带重试（和可选的对冲）地调用SLS，所有尝试都失败时抛出异常"""
+        def attempt():
+            with limiter.slot(limiter.SLS), query_slot():
+                response = self._session.sls_client().get_logs(request)
+            return {"headers": dict(response.get_all_headers()), "body": response.get_body()}
+
+        return resilience.call(attempt, limiter.SLS)
+
+    def get_logs(self, request):
+        from aliyun.log import GetLogsResponse
+
+        payload = load_payload(sls_request_fields(request), request.get_to(), lambda: self._fetch(request))
+        if payload is None:
+            raise replay.ReplayMiss(request.get_query())
+        return GetLogsResponse(payload["body"], payload["headers"])
+
+
+class CmsClient:
+    """
+    CMS客户端代理，接口与 TestCMSQuery._execute_spl_query 一致
+    """
+
+    def __init__(self, session):
+        self._session = session
+        self.workspace = CMS_WORKSPACE
+        self.endpoint = CMS_ENDPOINT
+
+    def _execute_spl_query(self, query: str, from_time: int = None, to_time: int = None):
+        """执行SPL查询，失败时返回None；历史时间窗的结果会写入本地缓存"""
+        from alibabacloud_cms20240330 import models as cms_20240330_models
+
+        if from_time is None:
+            from_time = int(time.time()) - 60 * 60 * 1
+        if to_time is None:
+            to_time = int(time.time())
+
+        fields = dict(kind="cms", workspace=self.workspace, query=normalize_query(query),
+                      from_time=from_time, to_time=to_time)
+        payload = load_payload(fields, to_time, lambda: self._fetch(query, from_time, to_time))
+        if payload is None:
+            return None
+        return cms_20240330_models.GetEntityStoreDataResponseBody().from_map(payload)
+
+    def _fetch(self, query, from_time, to_time):
+        """带重试（和可选的对冲）地调用CMS，返回响应体的字典形式，失败时返回None"""
+        from Tea.exceptions import TeaException
+        from alibabacloud_cms20240330 import models as cms_20240330_models
+        from alibabacloud_tea_util import models as util_models
+
+        endpoint = limiter.cms_endpoint(query)
+
+        def attempt():
+            headers = cms_20240330_models.GetEntityStoreDataHeaders()
+            request = cms_20240330_models.GetEntityStoreDataRequest(
+                query=query,
+                from_=from_time,
+                to=to_time
+            )
+            timeout_ms = int(resilience.QUERY_TIMEOUT_SECONDS * 1000)
+            runtime = util_models.RuntimeOptions(read_timeout=timeout_ms, connect_timeout=min(timeout_ms, 10000))
+            with limiter.slot(endpoint), query_slot():
+                response = self._session.cms_sdk_client().get_entity_store_data_with_options(
+                    self.workspace, request, headers, runtime
+                )
+            return response.body.to_map()
+
+        try:
+            return resilience.call(attempt, endpoint)
+        except TeaException as e:
+            print(f"❌ TeaException: code = {e.code}, message = {e.message}")
+        except Exception as e:
+            print(f"❌ CMS查询错误: {e}")
+        return None
+
+
+class SessionManager:
+    """
+    缓存STS临时凭证，并向所有分析模块提供同一个SLS/CMS客户端
+
+    - 凭证和SDK客户端都在第一次查询时才创建
+    - 凭证在过期前 STS_REFRESH_MARGIN_SECONDS 秒由后台定时器刷新
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # 同一时间只有一个线程去AssumeRole；网络请求不持有 _lock，刷新期间其他线程照常取用旧凭证和客户端
+        self._refresh_lock = threading.Lock()
+        self._credentials = None
+        self._expires_at = 0.0
+        self._timer = None
+        self._log_client = None
+        self._cms_client = None
+        self._cms_standin = None
+        self.log_client = SlsClient(self)
+        self.cms_client = CmsClient(self)
+
+    def _valid_locked(self):
+        return self._credentials is not None and time.time() < self._expires_at
+
+    def credentials(self):
+        """返回 (access_key_id, access_key_secret, security_token)，必要时同步获取"""
+        with self._lock:
+            if self._valid_locked():
+                return self._credentials
+        with self._refresh_lock:
+            # 等锁期间其他线程可能已经刷新过
+            with self._lock:
+                if self._valid_locked():
+                    return self._credentials
+            self._refresh_unlocked()
+        with self._lock:
+            return self._credentials
+
+    def refresh(self):
+        """强制刷新凭证，已创建的客户端在下一次调用时重建"""
+        with self._refresh_lock:
+            self._refresh_unlocked()
+
+    def _refresh_unlocked(self):
+        """在锁外获取新凭证，只在替换凭证和客户端时持有 _lock（调用方持有 _refresh_lock）"""
+        access_key_id, access_key_secret, security_token = get_sts_credentials()
+        if access_key_id:
+            credentials = (access_key_id, access_key_secret, security_token)
+            ttl = STS_DURATION_SECONDS
+            delay = STS_DURATION_SECONDS - STS_REFRESH_MARGIN_SECONDS
+        elif STS_REQUIRED:
+            raise RuntimeError("无法获取STS临时凭证（STS_REQUIRED=1）")
+        else:
+            print("⚠️ 无法获取STS临时凭证，改用主账号AccessKey直接访问（权限与STS角色不同），"
+                  f"{STS_RETRY_SECONDS} 秒后重试；设置 STS_REQUIRED=1 可在此时直接失败")
+            credentials = (os.getenv('ALIBABA_CLOUD_ACCESS_KEY_ID'),
+                           os.getenv('ALIBABA_CLOUD_ACCESS_KEY_SECRET'), None)
+            ttl = delay = STS_RETRY_SECONDS
+        with self._lock:
+            self._credentials = credentials
+            self._expires_at = time.time() + ttl
+            self._log_client = None
+            self._cms_client = None
+            self._schedule_refresh(delay)
+
+    def _schedule_refresh(self, delay):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(delay, self._background_refresh)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+            print("🔄 STS临时凭证已在后台刷新")
+        except Exception as e:
+            print(f"❌ 后台刷新STS凭证失败: {e}")
+            with self._lock:
+                self._schedule_refresh(STS_RETRY_SECONDS)
+
+    def sls_client(self):
+        """当前有效的 aliyun.log.LogClient"""
+        self.credentials()
+        with self._lock:
+            access_key_id, access_key_secret, security_token = self._credentials
+            if self._log_client is None:
+                from aliyun.log import LogClient
+                from aliyun.log.util import Util
+
+                self._log_client = LogClient(SLS_ENDPOINT, access_key_id, access_key_secret, security_token)
+                # SDK 只把不带端口的IP识别为IP地址，本地替身服务(sls_standin)监听在 IP:端口 上时，
+                # 也不能把 project 拼进域名
+                if Util.is_row_ip(self._log_client._logHost):
+                    self._log_client._isRowIp = True
+                # requests 默认每个host只保留10个keep-alive连接，查询并发更高时多出的连接用完即关闭
+                self._mount_connection_pool(self._log_client._session)
+                self._log_client.timeout = resilience.QUERY_TIMEOUT_SECONDS
+            return self._log_client
+
+    @staticmethod
+    def _mount_connection_pool(http_session):
+        """按查询并发上限设置 requests 会话的连接池大小，让所有查询线程都能复用连接"""
+        from requests.adapters import HTTPAdapter
+
+        size = max(10, pool.max_workers())
+        adapter = HTTPAdapter(pool_connections=size, pool_maxsize=size)
+        http_session.mount("http://", adapter)
+        http_session.mount("https://", adapter)
+
+    def cms_sdk_client(self):
+        """当前有效的 CMS SDK 客户端，设置了 CMS_STANDIN 时为本地替身（不需要凭证）"""
+        if CMS_STANDIN:
+            with self._lock:
+                if self._cms_standin is None:
+                    import cms_standin
+
+                    self._cms_standin = cms_standin.create_client(CMS_STANDIN)
+                return self._cms_standin
+        self.credentials()
+        with self._lock:
+            access_key_id, access_key_secret, security_token = self._credentials
+            if self._cms_client is None:
+                from alibabacloud_cms20240330.client import Client as Cms20240330Client
+                from alibabacloud_tea_openapi import models as open_api_models
+
+                if not access_key_id or not access_key_secret:
+                    raise ValueError("请设置环境变量 ALIBABA_CLOUD_ACCESS_KEY_ID 和 ALIBABA_CLOUD_ACCESS_KEY_SECRET")
+
+                config = open_api_models.Config(
+                    access_key_id=access_key_id,
+                    access_key_secret=access_key_secret,
+                    security_token=security_token
+                )
+                config.endpoint = CMS_ENDPOINT
+                self._cms_client = Cms20240330Client(config)
+            return self._cms_client
+
+    def close(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """返回进程内唯一的 SessionManager"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = SessionManager()
+    return _session
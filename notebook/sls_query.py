@@ -0,0 +1,96 @@
+"""
+SLS查询语句的公共工具
+
+- phrase_match: 批量查询把多个服务合并到一条 GROUP BY 查询里，需要在本地把结果按原来的
+  `field : "value"` 条件拆回各个服务；本地SLS替身(sls_standin)也用同样的规则过滤。
+- window_stats_query: 时段统计模式（--window-stats / SLS_WINDOW_STATS=1）下，
+  前10分钟/目标时段/后10分钟 三个时段的统计值直接在SLS里算好，每条序列只返回三个数。
+"""
+import os
+import re
+
+SLS_WINDOW_STATS = os.getenv("SLS_WINDOW_STATS", "0") == "1"
+
+# 每分钟一个桶，与逐点查询的 date 列一致
+MINUTE_BUCKET = "(startTime/1000000 -startTime/1000000 %(15000 * 4))"
+
+WINDOW_STATISTICS = {
+    "median": "approx_percentile(value, 0.5)",
+    "mean": "avg(value)",
+    "sum": "sum(value)",
+}
+
+# SLS 默认分词符
+SLS_TOKEN_DELIMITERS = ",'\";=()[]{}?@&<>/: \n\t\r"
+
+_DELIMITER_RE = re.compile("[" + re.escape(SLS_TOKEN_DELIMITERS) + "]+")
+
+
+def tokenize(text):
+    """按SLS默认分词符切分，忽略大小写"""
+    return [token for token in _DELIMITER_RE.split(str(text).lower()) if token]
+
+
+def phrase_match(value, phrase):
+    """
+    `field : "phrase"` 是否命中 value
+
+    与SLS一致：忽略大小写，phrase 的分词需要在 value 的分词中连续出现。
+    """
+    tokens = tokenize(value)
+    needle = tokenize(phrase)
+    if not needle:
+        return True
+    width = len(needle)
+    return any(tokens[index:index + width] == needle for index in range(len(tokens) - width + 1))
+
+
+def enable_window_stats():
+    """打开时段统计模式（--window-stats）"""
+    global SLS_WINDOW_STATS
+    SLS_WINDOW_STATS = True
+
+
+def window_stats_query(search, value_sql, windows, statistic, field=None):
+    """
+    构造时段统计查询
+
+    内层查询按分钟（以及 field）算出每分钟的取值，外层用 CASE WHEN 给每分钟打上时段标签，
+    再对每个时段做一次聚合。
+
+    Args:
+        search: `|` 之前的搜索语句
+        value_sql: 每分钟取值的聚合表达式，如 avg(duration)
+        windows: [(时段名, 起始毫秒, 结束毫秒)]，左闭右开
+        statistic: median（approx_percentile）/ mean / sum
+        field: 需要分别统计的字段，如 serviceName
+    """
+    labels = " ".join(f"WHEN date >= {begin} AND date < {end} THEN '{name}'" for name, begin, end in windows)
+    keys = f"{field}, " if field else ""
+    return f"""
+    {search}
+    | SELECT {keys}CASE {labels} END as period, {WINDOW_STATISTICS[statistic]} as stat
+      FROM (SELECT {keys}{value_sql} as value, {MINUTE_BUCKET} as date FROM log GROUP BY {keys}date)
+      GROUP BY {keys}period LIMIT 0, 100000
+    """
+
+
+def parse_window_stats(rows, field=None):
+    """
+    解析 window_stats_query 的结果
+
+    Returns:
+        field 为空时返回 {时段名: 统计值}，否则返回 {field取值: {时段名: 统计值}}；没有数据的时段不出现
+    """
+    stats = {}
+    for contents in rows:
+        period = contents.get("period")
+        try:
+            value = float(contents.get("stat"))
+        except (TypeError, ValueError):
+            continue
+        if not period or period == "null" or value != value:
+            continue
+        key = contents.get(field, "") if field else None
+        stats.setdefault(key, {})[period] = value
+    return stats if field else stats.get(None, {})
@@ -0,0 +1,938 @@
+"""
+本地SLS替身服务
+
+实现分析模块用到的那一小部分 GetLogs 接口，数据来自本地 Parquet/JSONL/CSV 调用链文件或随机生成，
+用 pandas 按列计算查询结果，便于在没有线上日志库的情况下做端到端压测：
+
+    python sls_standin.py --data spans.parquet --port 8080
+    SLS_ENDPOINT=127.0.0.1:8080 python main.py ...
+
+支持的查询语法：
+- 搜索部分: field : "value"、field : 2、field > 1、startTime in [a b)、AND/OR/NOT、括号
+- SQL部分: SELECT ... FROM log [WHERE ...] [GROUP BY ...] [ORDER BY ...] [LIMIT [m,] n]，
+  FROM 也可以是一层子查询 FROM (SELECT ... FROM log ...)，表达式支持四则运算、%、比较、CASE WHEN、avg/count/sum/min/max/approx_percentile/count_if 等
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+import pandas as pd
+
+from sls_query import phrase_match
+
+# 没有 LIMIT 的SQL，SLS默认只返回100行
+DEFAULT_SQL_LIMIT = 100
+
+AGGREGATES = {"avg", "count", "sum", "min", "max", "approx_percentile", "count_if", "arbitrary"}
+
+_TOKEN_RE = re.compile(r"""
+    (?P<ws>\s+)
+  | (?P<dstr>"(?:[^"\\]|\\.)*")
+  | (?P<sstr>'(?:[^']|'')*')
+  | (?P<num>\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)
+  | (?P<ident>[A-Za-z_][A-Za-z0-9_.]*)
+  | (?P<op><=|>=|!=|<>|[=<>:()\[\],*/%+\-])
+""", re.VERBOSE)
+
+
+class QueryError(Exception):
+    """查询语法不在替身服务支持的范围内"""
+
+
+def tokenize(text):
+    tokens = []
+    pos = 0
+    while pos < len(text):
+        match = _TOKEN_RE.match(text, pos)
+        if match is None:
+            raise QueryError(f"无法解析的字符: {text[pos:pos + 20]}")
+        pos = match.end()
+        kind = match.lastgroup
+        value = match.group()
+        if kind == "ws":
+            continue
+        if kind == "dstr":
+            value = json.loads(value)
+        elif kind == "sstr":
+            value = value[1:-1].replace("''", "'")
+        elif kind == "num":
+            value = float(value) if any(c in value for c in ".eE") else int(value)
+        tokens.append((kind, value))
+    return tokens
+
+
+class _Parser:
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self, offset=0):
+        index = self.pos + offset
+        return self.tokens[index] if index < len(self.tokens) else (None, None)
+
+    def next(self):
+        token = self.peek()
+        self.pos += 1
+        return token
+
+    def at_keyword(self, *words):
+        kind, value = self.peek()
+        return kind == "ident" and value.lower() in words
+
+    def at_op(self, *ops):
+        kind, value = self.peek()
+        return kind == "op" and value in ops
+
+    def expect_keyword(self, word):
+        if not self.at_keyword(word):
+            raise QueryError(f"缺少 {word.upper()}，实际为 {self.peek()[1]}")
+        self.next()
+
+    def expect_op(self, op):
+        if not self.at_op(op):
+            raise QueryError(f"缺少 {op}，实际为 {self.peek()[1]}")
+        self.next()
+
+
+# ---------------------------------------------------------------- 搜索语句
+
+class _SearchParser(_Parser):
+    """解析 `|` 之前的搜索语句，得到语法树"""
+
+    def parse(self):
+        if not self.tokens:
+            return ("all",)
+        node = self.parse_or()
+        if self.peek()[0] is not None:
+            raise QueryError(f"多余的搜索条件: {self.peek()[1]}")
+        return node
+
+    def parse_or(self):
+        node = self.parse_and()
+        while self.at_keyword("or"):
+            self.next()
+            node = ("or", node, self.parse_and())
+        return node
+
+    def parse_and(self):
+        node = self.parse_not()
+        while self.at_keyword("and"):
+            self.next()
+            node = ("and", node, self.parse_not())
+        return node
+
+    def parse_not(self):
+        if self.at_keyword("not"):
+            self.next()
+            return ("not", self.parse_not())
+        return self.parse_primary()
+
+    def parse_primary(self):
+        if self.at_op("("):
+            self.next()
+            node = self.parse_or()
+            self.expect_op(")")
+            return node
+        if self.at_op("*"):
+            self.next()
+            return ("all",)
+        kind, field = self.next()
+        if kind != "ident":
+            raise QueryError(f"不支持的全文检索: {field}")
+        if self.at_op(":"):
+            self.next()
+            _, value = self.next()
+            return ("match", field, value)
+        if self.at_op("=", "!=", "<", ">", "<=", ">="):
+            _, op = self.next()
+            _, value = self.next()
+            return ("cmp", field, op, value)
+        if self.at_keyword("in"):
+            self.next()
+            _, left = self.next()
+            _, low = self.next()
+            _, high = self.next()
+            _, right = self.next()
+            return ("range", field, low, high, left == "[", right == "]")
+        raise QueryError(f"不支持的搜索条件: {field}")
+
+
+def _column(df, name):
+    if name in df.columns:
+        return df[name]
+    # SLS的SQL列名不区分大小写
+    for column in df.columns:
+        if column.lower() == name.lower():
+            return df[column]
+    return pd.Series([None] * len(df), index=df.index, dtype=object)
+
+
+def _compare(series, op, value):
+    if op in ("=", ":"):
+        return series == value
+    if op in ("!=", "<>"):
+        return series != value
+    if op == "<":
+        return series < value
+    if op == ">":
+        return series > value
+    if op == "<=":
+        return series <= value
+    return series >= value
+
+
+def eval_search(node, df):
+    """把搜索语法树计算为行掩码"""
+    kind = node[0]
+    if kind == "all":
+        return pd.Series(True, index=df.index)
+    if kind == "and":
+        return eval_search(node[1], df) & eval_search(node[2], df)
+    if kind == "or":
+        return eval_search(node[1], df) | eval_search(node[2], df)
+    if kind == "not":
+        return ~eval_search(node[1], df)
+    if kind == "match":
+        series = _column(df, node[1])
+        value = node[2]
+        if pd.api.types.is_numeric_dtype(series):
+            return series == pd.to_numeric(value, errors="coerce")
+        # 短语查询（规则见 sls_query.phrase_match）；服务名、span名等列的取值很少，只对去重后的值做匹配
+        matched = [v for v in series.dropna().unique() if phrase_match(v, value)]
+        return series.isin(matched)
+    if kind == "cmp":
+        series = pd.to_numeric(_column(df, node[1]), errors="coerce")
+        return _compare(series, node[2], node[3]).fillna(False).astype(bool)
+    if kind == "range":
+        _, field, low, high, include_low, include_high = node
+        series = pd.to_numeric(_column(df, field), errors="coerce")
+        mask = (series >= low) if include_low else (series > low)
+        mask &= (series <= high) if include_high else (series < high)
+        return mask.fillna(False).astype(bool)
+    raise QueryError(f"未知的搜索节点: {kind}")
+
+
+# ---------------------------------------------------------------- SQL
+
+class _SqlParser(_Parser):
+    """解析 `|` 之后的SQL"""
+
+    def parse(self):
+        statement = self.parse_select()
+        if self.peek()[0] is not None:
+            raise QueryError(f"不支持的SQL子句: {self.peek()[1]}")
+        return statement
+
+    def parse_select(self):
+        self.expect_keyword("select")
+        items = [self.parse_item()]
+        while self.at_op(","):
+            self.next()
+            items.append(self.parse_item())
+        self.expect_keyword("from")
+        source = None
+        if self.at_op("("):
+            # 子查询: FROM (SELECT ... FROM log ...) [别名]
+            self.next()
+            source = self.parse_select()
+            self.expect_op(")")
+            if self.peek()[0] == "ident" and not self.at_keyword("where", "group", "order", "limit"):
+                self.next()
+        else:
+            self.next()
+        statement = {"items": items, "from": source, "where": None, "group_by": [], "order_by": [], "limit": None}
+        if self.at_keyword("where"):
+            self.next()
+            statement["where"] = self.parse_expr()
+        if self.at_keyword("group"):
+            self.next()
+            self.expect_keyword("by")
+            statement["group_by"] = self.parse_list(self.parse_expr)
+        if self.at_keyword("order"):
+            self.next()
+            self.expect_keyword("by")
+            statement["order_by"] = self.parse_list(self.parse_order)
+        if self.at_keyword("limit"):
+            self.next()
+            _, first = self.next()
+            if self.at_op(","):
+                self.next()
+                _, second = self.next()
+                statement["limit"] = (int(first), int(second))
+            else:
+                statement["limit"] = (0, int(first))
+        return statement
+
+    def parse_list(self, parse_one):
+        values = [parse_one()]
+        while self.at_op(","):
+            self.next()
+            values.append(parse_one())
+        return values
+
+    def parse_item(self):
+        expr = self.parse_expr()
+        alias = None
+        if self.at_keyword("as"):
+            self.next()
+            alias = self.next()[1]
+        elif self.peek()[0] in ("ident", "dstr") and not self.at_keyword("from"):
+            alias = self.next()[1]
+        return expr, alias
+
+    def parse_order(self):
+        expr = self.parse_expr()
+        descending = False
+        if self.at_keyword("asc", "desc"):
+            descending = self.next()[1].lower() == "desc"
+        return expr, descending
+
+    def parse_expr(self):
+        node = self.parse_and()
+        while self.at_keyword("or"):
+            self.next()
+            node = ("or", node, self.parse_and())
+        return node
+
+    def parse_and(self):
+        node = self.parse_not()
+        while self.at_keyword("and"):
+            self.next()
+            node = ("and", node, self.parse_not())
+        return node
+
+    def parse_not(self):
+        if self.at_keyword("not"):
+            self.next()
+            return ("not", self.parse_not())
+        return self.parse_comparison()
+
+    def parse_comparison(self):
+        node = self.parse_additive()
+        if self.at_op("=", "!=", "<>", "<", ">", "<=", ">="):
+            op = self.next()[1]
+            return ("cmp", op, node, self.parse_additive())
+        negated = False
+        if self.at_keyword("not") and self.peek(1)[1] is not None and str(self.peek(1)[1]).lower() in ("in", "like"):
+            self.next()
+            negated = True
+        if self.at_keyword("in"):
+            self.next()
+            self.expect_op("(")
+            values = self.parse_list(self.parse_additive)
+            self.expect_op(")")
+            return ("in", node, values, negated)
+        if self.at_keyword("like"):
+            self.next()
+            return ("like", node, self.parse_additive(), negated)
+        if self.at_keyword("is"):
+            self.next()
+            negated = False
+            if self.at_keyword("not"):
+                self.next()
+                negated = True
+            self.expect_keyword("null")
+            return ("isnull", node, negated)
+        return node
+
+    def parse_additive(self):
+        node = self.parse_multiplicative()
+        while self.at_op("+", "-"):
+            op = self.next()[1]
+            node = ("bin", op, node, self.parse_multiplicative())
+        return node
+
+    def parse_multiplicative(self):
+        node = self.parse_unary()
+        while self.at_op("*", "/", "%"):
+            op = self.next()[1]
+            node = ("bin", op, node, self.parse_unary())
+        return node
+
+    def parse_unary(self):
+        if self.at_op("-"):
+            self.next()
+            return ("neg", self.parse_unary())
+        return self.parse_atom()
+
+    def parse_atom(self):
+        kind, value = self.next()
+        if kind == "num":
+            return ("lit", value)
+        if kind == "sstr":
+            return ("lit", value)
+        if kind == "dstr":
+            return ("col", value)
+        if kind == "op" and value == "(":
+            node = self.parse_expr()
+            self.expect_op(")")
+            return node
+        if kind == "op" and value == "*":
+            return ("star",)
+        if kind != "ident":
+            raise QueryError(f"无法解析的表达式: {value}")
+        word = value.lower()
+        if word == "case":
+            branches = []
+            default = ("lit", None)
+            while self.at_keyword("when"):
+                self.next()
+                condition = self.parse_expr()
+                self.expect_keyword("then")
+                branches.append((condition, self.parse_expr()))
+            if self.at_keyword("else"):
+                self.next()
+                default = self.parse_expr()
+            self.expect_keyword("end")
+            return ("case", branches, default)
+        if word == "null":
+            return ("lit", None)
+        if word in ("true", "false"):
+            return ("lit", word == "true")
+        if self.at_op("("):
+            self.next()
+            distinct = False
+            if self.at_keyword("distinct"):
+                self.next()
+                distinct = True
+            args = [] if self.at_op(")") else self.parse_list(self.parse_expr)
+            self.expect_op(")")
+            return ("call", word, args, distinct)
+        return ("col", value)
+
+
+def _is_integer(value):
+    if isinstance(value, pd.Series):
+        return pd.api.types.is_integer_dtype(value)
+    return isinstance(value, (int, np.integer)) and not isinstance(value, bool)
+
+
+def _numeric(value):
+    if isinstance(value, pd.Series) and not pd.api.types.is_numeric_dtype(value):
+        return pd.to_numeric(value, errors="coerce")
+    return value
+
+
+def _binary(op, left, right):
+    if op in ("/", "%") and _is_integer(left) and _is_integer(right):
+        # 与SLS(Presto)一致：整数除法向零取整，取模的符号跟随被除数
+        if op == "%":
+            return np.fmod(left, right)
+        quotient = np.abs(left) // np.abs(right)
+        return quotient * np.sign(left) * np.sign(right)
+    left, right = _numeric(left), _numeric(right)
+    if op == "+":
+        return left + right
+    if op == "-":
+        return left - right
+    if op == "*":
+        return left * right
+    if op == "/":
+        return left / right
+    return np.fmod(left, right)
+
+
+def _contains_aggregate(node):
+    if isinstance(node, list):
+        return any(_contains_aggregate(child) for child in node)
+    if not isinstance(node, tuple):
+        return False
+    if node and node[0] == "call" and node[1] in AGGREGATES:
+        return True
+    return any(_contains_aggregate(child) for child in node)
+
+
+class _Evaluator:
+    """
+    在一个DataFrame上计算SQL表达式
+
+    行级表达式返回与df等长的Series；聚合上下文中返回以分组编号为索引的Series。
+    """
+
+    def __init__(self, df, aliases=None):
+        self.df = df
+        self.aliases = aliases or {}
+
+    def row(self, node):
+        kind = node[0]
+        if kind == "lit":
+            return node[1]
+        if kind == "col":
+            if node[1] in self.aliases and node[1].lower() not in {c.lower() for c in self.df.columns}:
+                return self.row(self.aliases[node[1]])
+            return _column(self.df, node[1])
+        if kind == "star":
+            return pd.Series(1, index=self.df.index)
+        if kind == "neg":
+            return -_numeric(self.row(node[1]))
+        if kind == "bin":
+            return _binary(node[1], self.row(node[2]), self.row(node[3]))
+        if kind == "cmp":
+            return self._compare(node[1], self.row(node[2]), self.row(node[3]))
+        if kind == "and":
+            return self._bool(self.row(node[1])) & self._bool(self.row(node[2]))
+        if kind == "or":
+            return self._bool(self.row(node[1])) | self._bool(self.row(node[2]))
+        if kind == "not":
+            return ~self._bool(self.row(node[1]))
+        if kind == "in":
+            series = self.row(node[1])
+            mask = self._series(series).isin([self.row(value) for value in node[2]])
+            return ~mask if node[3] else mask
+        if kind == "like":
+            pattern = "^" + re.escape(str(self.row(node[2]))).replace("%", ".*").replace("_", ".") + "$"
+            mask = self._series(self.row(node[1])).astype(str).str.match(pattern)
+            return ~mask if node[3] else mask
+        if kind == "isnull":
+            mask = self._series(self.row(node[1])).isna()
+            return ~mask if node[2] else mask
+        if kind == "case":
+            conditions = [self._bool(self.row(condition)).to_numpy() for condition, _ in node[1]]
+            choices = [self._series(self.row(value)).to_numpy() for _, value in node[1]]
+            default = self._series(self.row(node[2])).to_numpy()
+            if not conditions:
+                return pd.Series(default, index=self.df.index)
+            return pd.Series(np.select(conditions, choices, default=default), index=self.df.index).infer_objects()
+        if kind == "call":
+            return self._scalar_call(node[1], [self.row(arg) for arg in node[2]])
+        raise QueryError(f"不支持的表达式: {kind}")
+
+    def _series(self, value):
+        if isinstance(value, pd.Series):
+            return value
+        return pd.Series([value] * len(self.df), index=self.df.index)
+
+    def _bool(self, value):
+        return self._series(value).fillna(False).astype(bool)
+
+    def _compare(self, op, left, right):
+        if isinstance(left, pd.Series) and pd.api.types.is_numeric_dtype(left) and isinstance(right, str):
+            right = pd.to_numeric(right, errors="coerce")
+        if isinstance(right, pd.Series) and pd.api.types.is_numeric_dtype(right) and isinstance(left, str):
+            left = pd.to_numeric(left, errors="coerce")
+        result = _compare(self._series(left) if not isinstance(left, pd.Series) else left, op, right)
+        return self._bool(result)
+
+    def _scalar_call(self, name, args):
+        if name == "round":
+            digits = int(args[1]) if len(args) > 1 else 0
+            return _numeric(args[0]).round(digits) if isinstance(args[0], pd.Series) else round(args[0], digits)
+        if name in ("abs", "floor", "ceil", "ceiling"):
+            func = {"abs": np.abs, "floor": np.floor, "ceil": np.ceil, "ceiling": np.ceil}[name]
+            return func(_numeric(args[0]))
+        if name == "coalesce":
+            result = self._series(args[0])
+            for arg in args[1:]:
+                result = result.fillna(arg if not isinstance(arg, pd.Series) else arg)
+            return result
+        if name == "lower":
+            return self._series(args[0]).astype(str).str.lower()
+        if name == "upper":
+            return self._series(args[0]).astype(str).str.upper()
+        raise QueryError(f"不支持的函数: {name}")
+
+    def aggregate(self, node, codes, groups):
+        """在分组上计算表达式，codes为每行的分组编号，groups为分组数"""
+        kind = node[0]
+        if kind == "lit":
+            return node[1]
+        if kind == "call" and node[1] in AGGREGATES:
+            return self._aggregate_call(node, codes, groups)
+        if not _contains_aggregate(node):
+            # 分组键或者常量表达式：取每组第一个值
+            return self._by_group(self._series(self.row(node)), codes, groups, "first")
+        if kind == "neg":
+            return -_numeric(self.aggregate(node[1], codes, groups))
+        if kind == "bin":
+            return _binary(node[1], self.aggregate(node[2], codes, groups), self.aggregate(node[3], codes, groups))
+        if kind == "cmp":
+            left = self._group_series(self.aggregate(node[2], codes, groups), groups)
+            return _compare(left, node[1], self.aggregate(node[3], codes, groups)).fillna(False).astype(bool)
+        if kind == "case":
+            conditions = [self._group_series(self.aggregate(c, codes, groups), groups).fillna(False).astype(bool)
+                          .to_numpy() for c, _ in node[1]]
+            choices = [self._group_series(self.aggregate(v, codes, groups), groups).to_numpy() for _, v in node[1]]
+            default = self._group_series(self.aggregate(node[2], codes, groups), groups).to_numpy()
+            return pd.Series(np.select(conditions, choices, default=default), index=pd.RangeIndex(groups)).infer_objects()
+        if kind == "call":
+            return self._scalar_call(node[1], [self.aggregate(arg, codes, groups) for arg in node[2]])
+        raise QueryError(f"不支持的聚合表达式: {kind}")
+
+    @staticmethod
+    def _group_series(value, groups):
+        if isinstance(value, pd.Series):
+            return value
+        return pd.Series([value] * groups, index=pd.RangeIndex(groups))
+
+    def _by_group(self, series, codes, groups, how, *args):
+        grouped = series.groupby(codes)
+        if how == "first":
+            result = grouped.first()
+        elif how == "quantile":
+            result = grouped.quantile(*args)
+        else:
+            result = getattr(grouped, how)()
+        return result.reindex(range(groups))
+
+    def _aggregate_call(self, node, codes, groups):
+        _, name, args, distinct = node
+        if name == "count":
+            if not args or args[0][0] == "star":
+                return pd.Series(np.bincount(codes, minlength=groups), index=range(groups))
+            series = self._series(self.row(args[0]))
+            how = "nunique" if distinct else "count"
+            return self._by_group(series, codes, groups, how).fillna(0).astype(int)
+        if name == "count_if":
+            series = self._bool(self.row(args[0])).astype(int)
+            return self._by_group(series, codes, groups, "sum").fillna(0).astype(int)
+        series = self._series(self.row(args[0]))
+        if name == "arbitrary":
+            return self._by_group(series, codes, groups, "first")
+        series = _numeric(series)
+        if name == "avg":
+            return self._by_group(series, codes, groups, "mean")
+        if name == "approx_percentile":
+            return self._by_group(series, codes, groups, "quantile", float(self.row(args[1])))
+        return self._by_group(series, codes, groups, name)
+
+
+def _format_value(value):
+    if value is None or (isinstance(value, float) and np.isnan(value)) or value is pd.NA:
+        return "null"
+    if isinstance(value, (bool, np.bool_)):
+        return "true" if value else "false"
+    if isinstance(value, (np.integer,)):
+        return str(int(value))
+    if isinstance(value, (float, np.floating)):
+        value = float(value)
+        return str(int(value)) if value.is_integer() and abs(value) < 1e15 else repr(value)
+    return str(value)
+
+
+def run_sql(statement, df, default_limit=DEFAULT_SQL_LIMIT):
+    """执行已解析的SQL，返回 [{列名: 字符串值}]"""
+    return _execute(statement, df, default_limit)[1]
+
+
+def _execute(statement, df, default_limit):
+    """执行已解析的SQL，返回 (列名列表, 结果行)"""
+    if statement["from"] is not None:
+        # 子查询不受默认 LIMIT 限制，结果还原成 DataFrame 后作为外层查询的数据
+        names, rows = _execute(statement["from"], df, None)
+        df = _prepare(pd.DataFrame(rows, columns=names).replace("null", None))
+    evaluator = _Evaluator(df)
+    if statement["where"] is not None:
+        df = df[evaluator._bool(evaluator.row(statement["where"]))]
+        evaluator = _Evaluator(df)
+
+    items = statement["items"]
+    names = []
+    for index, (expr, alias) in enumerate(items):
+        if alias:
+            names.append(alias)
+        elif expr[0] == "col":
+            names.append(expr[1])
+        else:
+            names.append(f"_col{index}")
+    evaluator.aliases = {name: expr for name, (expr, _) in zip(names, items)}
+
+    grouped = bool(statement["group_by"]) or any(_contains_aggregate(expr) for expr, _ in items)
+    if grouped:
+        if statement["group_by"]:
+            keys = [evaluator._series(evaluator.row(expr)) for expr in statement["group_by"]]
+            codes = pd.MultiIndex.from_arrays(keys).factorize()[0] if len(keys) > 1 else pd.factorize(keys[0])[0]
+            groups = int(codes.max()) + 1 if len(codes) else 0
+            # 分组键为空值时 factorize 返回 -1，单独作为一组
+            if (codes < 0).any():
+                codes = np.where(codes < 0, groups, codes)
+                groups += 1
+        else:
+            codes = np.zeros(len(df), dtype=int)
+            groups = 1
+        index = pd.RangeIndex(groups)
+        columns = {name: pd.Series(evaluator.aggregate(expr, codes, groups), index=index)
+                   for name, (expr, _) in zip(names, items)}
+        order_value = lambda expr: pd.Series(evaluator.aggregate(expr, codes, groups), index=index)
+    else:
+        index = df.index
+        columns = {name: evaluator._series(evaluator.row(expr)) for name, (expr, _) in zip(names, items)}
+        order_value = lambda expr: evaluator._series(evaluator.row(expr))
+    result = pd.DataFrame(columns, index=index)
+
+    if statement["order_by"]:
+        sort_columns = []
+        ascending = []
+        for position, (expr, descending) in enumerate(statement["order_by"]):
+            key = f"__order{position}"
+            if expr[0] == "col" and expr[1] in columns:
+                result[key] = columns[expr[1]]
+            elif expr[0] == "lit" and isinstance(expr[1], int) and 1 <= expr[1] <= len(names):
+                result[key] = columns[names[expr[1] - 1]]
+            else:
+                result[key] = order_value(expr).to_numpy()
+            sort_columns.append(key)
+            ascending.append(not descending)
+        result = result.sort_values(sort_columns, ascending=ascending, kind="mergesort", na_position="last")
+        result = result.drop(columns=sort_columns)
+
+    if statement["limit"] is not None:
+        offset, limit = statement["limit"]
+        result = result.iloc[offset:offset + limit]
+    elif default_limit is not None:
+        result = result.iloc[:default_limit]
+    return names, [{name: _format_value(value) for name, value in zip(names, row)}
+                   for row in result.itertuples(index=False, name=None)]
+
+
+def split_query(query):
+    """把 `搜索语句 | SQL` 拆成两部分"""
+    depth = 0
+    quote = None
+    for index, char in enumerate(query):
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in "\"'":
+            quote = char
+        elif char in "([":
+            depth += 1
+        elif char in ")]":
+            depth -= 1
+        elif char == "|" and depth <= 0:
+            return query[:index].strip(), query[index + 1:].strip()
+    return query.strip(), None
+
+
+def run_query(df, query, from_time=None, to_time=None, line=100, offset=0, reverse=False):
+    """
+    在调用链数据上执行一条SLS查询
+
+    Returns:
+        tuple: (结果行列表, 是否为SQL查询)
+    """
+    if from_time is not None and to_time is not None and "__time__" in df.columns:
+        times = df["__time__"]
+        df = df[(times >= int(from_time)) & (times < int(to_time))]
+    search, sql = split_query(query or "*")
+    df = df[eval_search(_SearchParser(tokenize(search)).parse(), df)]
+    if sql:
+        return run_sql(_SqlParser(tokenize(sql)).parse(), df), True
+
+    df = df.sort_values("__time__", ascending=not reverse, kind="mergesort") if "__time__" in df.columns else df
+    df = df.iloc[offset:offset + line]
+    rows = []
+    for record in df.to_dict("records"):
+        row = {key: _format_value(value) for key, value in record.items()}
+        row.setdefault("__source__", "")
+        rows.append(row)
+    return rows, False
+
+
+# ---------------------------------------------------------------- 数据
+
+def _prepare(df):
+    """把能转成数字的列转成数字，并补上SLS的 __time__ 字段（秒）"""
+    for name in df.columns:
+        if pd.api.types.is_object_dtype(df[name]) or pd.api.types.is_string_dtype(df[name]):
+            converted = pd.to_numeric(df[name], errors="coerce")
+            if converted.notna().sum() == df[name].notna().sum() and df[name].notna().any():
+                df[name] = converted
+    if "__time__" not in df.columns and "startTime" in df.columns:
+        df["__time__"] = (df["startTime"] // 1_000_000_000).astype("int64")
+    return df
+
+
+def load_spans(path):
+    """读取 Parquet/JSONL/CSV 调用链文件（Parquet 需要安装 pyarrow）"""
+    if path.endswith(".parquet"):
+        df = pd.read_parquet(path)
+    elif path.endswith(".csv"):
+        df = pd.read_csv(path)
+    else:
+        df = pd.read_json(path, lines=True, dtype=False)
+    return _prepare(df)
+
+
+SERVICES = ["frontend", "cart", "checkout", "currency", "payment", "product-catalog", "shipping",
+            "recommendation", "ad", "email", "quote", "fraud-detection", "inventory", "accounting"]
+
+
+def generate_spans(count, start, end, seed=0, services=SERVICES, pods_per_service=3):
+    """
+    随机生成调用链数据，用于压测
+
+    Args:
+        count: 生成的span数量
+        start, end: 时间范围(datetime)
+        seed: 随机种子
+    """
+    rng = np.random.default_rng(seed)
+    service_index = rng.integers(0, len(services), count)
+    service = np.array(services)[service_index]
+    pod = rng.integers(0, pods_per_service, count)
+    start_ns = int(start.timestamp()) * 1_000_000_000
+    end_ns = int(end.timestamp()) * 1_000_000_000
+    start_time = rng.integers(start_ns, end_ns, count, dtype=np.int64)
+    status_code = rng.choice([0, 1, 2], count, p=[0.9, 0.08, 0.02])
+    df = pd.DataFrame({
+        "serviceName": service,
+        "spanName": np.char.add(np.char.add("/oteldemo.", service), "/Call"),
+        "hostname": np.char.add(np.char.add(service, "-pod-"), pod.astype(str)),
+        "startTime": start_time,
+        "duration": rng.lognormal(mean=9, sigma=0.6, size=count).astype(np.int64),
+        "statusCode": status_code,
+        "statusMessage": np.where(status_code > 1, "14 UNAVAILABLE: read ECONNRESET", ""),
+    })
+    return _prepare(df)
+
+
+# ---------------------------------------------------------------- HTTP服务
+
+class StandinServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, datasets):
+        """datasets: {logstore: DataFrame}，键为None的数据集用于所有logstore"""
+        super().__init__(address, StandinHandler)
+        self.datasets = datasets
+        self.queries = 0
+        self._lock = threading.Lock()
+
+    def dataset(self, logstore):
+        if logstore in self.datasets:
+            return self.datasets[logstore]
+        return self.datasets.get(None)
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("x-log-requestid", f"standin-{time.time_ns()}")
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status, code, message):
+        self._send_json(status, {"errorCode": code, "errorMessage": message})
+
+    def _logstore(self, path):
+        match = re.match(r"^/logstores/([^/]+)(/logs)?$", path)
+        return (match.group(1), bool(match.group(2))) if match else (None, False)
+
+    def _query(self, logstore, params):
+        df = self.server.dataset(logstore)
+        if df is None:
+            self._error(404, "LogStoreNotExist", f"logstore {logstore} does not exist")
+            return None
+        started = time.perf_counter()
+        try:
+            rows, has_sql = run_query(df, params.get("query"), params.get("from"), params.get("to"),
+                                      int(params.get("line", 100)), int(params.get("offset", 0)),
+                                      str(params.get("reverse", "false")).lower() == "true")
+        except QueryError as e:
+            self._error(400, "ParameterInvalid", str(e))
+            return None
+        with self.server._lock:
+            self.server.queries += 1
+        meta = {
+            "progress": "Complete",
+            "count": len(rows),
+            "processedRows": len(df),
+            "elapsedMillisecond": int((time.perf_counter() - started) * 1000),
+            "hasSQL": has_sql,
+        }
+        return rows, meta
+
+    def do_POST(self):
+        logstore, is_logs = self._logstore(urlparse(self.path).path)
+        if logstore is None or not is_logs:
+            self._error(404, "NotFound", self.path)
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        params = json.loads(self.rfile.read(length) or b"{}")
+        result = self._query(logstore, params)
+        if result is not None:
+            rows, meta = result
+            self._send_json(200, {"meta": meta, "data": rows})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        logstore, is_logs = self._logstore(url.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        if logstore is None or is_logs or params.get("type") != "log":
+            self._error(404, "NotFound", self.path)
+            return
+        result = self._query(logstore, params)
+        if result is not None:
+            rows, meta = result
+            self._send_json(200, rows, {
+                "x-log-progress": meta["progress"],
+                "x-log-count": str(meta["count"]),
+                "x-log-processed-rows": str(meta["processedRows"]),
+                "x-log-elapsed-millisecond": str(meta["elapsedMillisecond"]),
+                "x-log-has-sql": "true" if meta["hasSQL"] else "false",
+            })
+
+
+def serve(datasets, host="127.0.0.1", port=8080):
+    """启动替身服务（阻塞），返回前不会退出"""
+    server = StandinServer((host, port), datasets)
+    print(f"🚀 SLS替身服务已启动: http://{host}:{server.server_address[1]}")
+    print(f"   使用方式: SLS_ENDPOINT={host}:{server.server_address[1]} python main.py ...")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"⏹️ SLS替身服务已停止，共处理 {server.queries} 次查询")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='本地SLS替身服务')
+    parser.add_argument('--data', action='append', default=[],
+                        help='调用链数据文件(Parquet/JSONL/CSV)，可用 logstore=路径 指定所属logstore，可重复')
+    parser.add_argument('--synthetic', type=int, default=0, help='随机生成的span数量')
+    parser.add_argument('--time-range', default=None,
+                        help='随机数据的时间范围，格式同input.jsonl: "2025-09-16 23:00:00 ~ 2025-09-16 23:30:00"')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    args = parser.parse_args()
+
+    datasets = {}
+    for spec in args.data:
+        logstore, _, path = spec.rpartition("=")
+        df = load_spans(path)
+        print(f"✅ 已加载 {len(df)} 条span: {path}")
+        datasets[logstore or None] = df
+    if args.synthetic:
+        if args.time_range:
+            start_str, end_str = args.time_range.split(' ~ ')
+            tz = timezone(timedelta(hours=8))
+            start = datetime.strptime(start_str.strip(), "%Y-%m-%d %H:%M:%S").replace(tzinfo=tz)
+            end = datetime.strptime(end_str.strip(), "%Y-%m-%d %H:%M:%S").replace(tzinfo=tz)
+        else:
+            end = datetime.now(timezone.utc)
+            start = end - timedelta(hours=1)
+        df = generate_spans(args.synthetic, start, end, args.seed)
+        print(f"✅ 已生成 {len(df)} 条随机span")
+        datasets[None] = pd.concat([datasets[None], df], ignore_index=True) if None in datasets else df
+    if not datasets:
+        parser.error("请通过 --data 或 --synthetic 提供数据")
+    serve(datasets, args.host, args.port)
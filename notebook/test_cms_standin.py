@@ -0,0 +1,71 @@
+"""
+测试本地CMS替身
+"""
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+# notebook 下的模块按顶层模块相互导入（与 main.py 的运行方式一致）
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cms_standin import CmsStandinClient, SeriesSource, parse_entity_filter
+
+START = 1758034800
+END = START + 30 * 60
+
+
+class TestCmsStandin(unittest.TestCase):
+    """测试替身返回的行布局"""
+
+    def setUp(self):
+        self.client = CmsStandinClient()
+
+    def test_entity_filter(self):
+        self.assertEqual(parse_entity_filter("deployment='a' or deployment='b'"),
+                         [{"deployment": "a"}, {"deployment": "b"}])
+        self.assertEqual(parse_entity_filter("pod_ip = ''10.0.0.1'' and namespace = ''demo''"),
+                         [{"pod_ip": "10.0.0.1", "namespace": "demo"}])
+
+    def test_get_metric_layout(self):
+        """每个实体一行，[2]/[3] 为时间戳和取值列表的字符串，与 get_result 的解析方式一致"""
+        header, data = self.client.execute("""
+            .entity_set with(domain='k8s', name='k8s.deployment', query=`deployment='cart' or deployment='ad'`)
+            | entity-call get_metric('k8s', 'k8s.metric.high_level_metric_deployment',
+                                     'deployment_cpu_usage_vs_requests', 'range', '1m')""", START, END)
+        self.assertEqual(header[2:], ["__ts__", "__value__"])
+        self.assertEqual([json.loads(row[0]) for row in data], [{"deployment": "cart"}, {"deployment": "ad"}])
+        ts, values = json.loads(data[0][2]), json.loads(data[0][3])
+        self.assertEqual(len(ts), 31)
+        self.assertEqual(len(ts), len(values))
+        self.assertEqual(ts[0], START * 1_000_000_000)
+
+    def test_promql_by_label(self):
+        _, data = self.client.execute("""
+            .metricstore with(project='p', metricstore='m')
+            | prom-call promql_query_range('sum(irate(node_netstat_Tcp_InErrs{instanceId=~"i-1|i-2"}[1m])) by (instanceId)', '60s')
+            """, START, END)
+        self.assertEqual([json.loads(row[0]) for row in data], [{"instanceId": "i-1"}, {"instanceId": "i-2"}])
+
+    def test_overlapping_windows_agree(self):
+        """同一条时序在重叠时间窗上的取值一致"""
+        ts_a, values_a = SeriesSource.synthetic({"deployment": "cart"}, "cpu", START, END)
+        ts_b, values_b = SeriesSource.synthetic({"deployment": "cart"}, "cpu", START + 600, END)
+        self.assertEqual(dict(zip(ts_a, values_a))[ts_b[0]], values_b[0])
+
+    def test_series_file(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False) as f:
+            f.write(json.dumps({"labels": {"deployment": "cart"}, "metric": "mem",
+                                "ts": [START, START + 60], "values": [1.5, 2.5]}) + "\n")
+        try:
+            source = SeriesSource(f.name)
+            self.assertEqual(source.get({"deployment": "cart"}, "mem", START, END)[1], [1.5, 2.5])
+            self.assertEqual(len(source.get({"deployment": "ad"}, "mem", START, END)[1]), 31)
+        finally:
+            os.unlink(f.name)
+
+
+if __name__ == "__main__":
+    unittest.main()
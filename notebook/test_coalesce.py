@@ -0,0 +1,82 @@
+"""
+测试单题范围内的查询合并
+"""
+
+import os
+import sys
+import threading
+import time
+import unittest
+
+# notebook 下的模块按顶层模块相互导入（与 main.py 的运行方式一致）
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pool
+from coalesce import coalesced, problem_scope
+
+PAYLOAD = {"data": [["a", "1"]]}
+
+
+class CountingLoader:
+    def __init__(self, result=PAYLOAD, delay=0.0):
+        self.result = result
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        return self.result
+
+
+class TestCoalesce(unittest.TestCase):
+
+    def test_concurrent_identical_queries_share_one_call(self):
+        loader = CountingLoader(delay=0.2)
+        with problem_scope():
+            with pool.query_executor() as executor:
+                futures = [executor.submit(coalesced, "k", loader) for _ in range(8)]
+                results = [future.result() for future in futures]
+        self.assertEqual(loader.calls, 1)
+        self.assertTrue(all(result == loader.result for result in results))
+
+    def test_completed_queries_reused_within_problem(self):
+        loader = CountingLoader()
+        with problem_scope() as scope:
+            first = coalesced("k", loader)
+            second = coalesced("k", loader)
+            coalesced("other", loader)
+        self.assertEqual(loader.calls, 2)
+        self.assertEqual(second, first)
+        # 共享的结果是副本，调用方修改不会影响其他调用方
+        self.assertIsNot(second, first)
+        self.assertEqual((scope.executed, scope.shared), (2, 1))
+
+        with problem_scope():
+            coalesced("k", loader)
+        self.assertEqual(loader.calls, 3)
+
+    def test_no_coalescing_outside_problem(self):
+        loader = CountingLoader()
+        coalesced("k", loader)
+        coalesced("k", loader)
+        self.assertEqual(loader.calls, 2)
+
+    def test_failed_queries_are_retried(self):
+        def failing():
+            raise RuntimeError("boom")
+
+        loader = CountingLoader(result=None)
+        with problem_scope():
+            self.assertIsNone(coalesced("k", loader))
+            self.assertIsNone(coalesced("k", loader))
+            self.assertEqual(loader.calls, 2)
+            with self.assertRaises(RuntimeError):
+                coalesced("e", failing)
+            self.assertEqual(coalesced("e", CountingLoader()), PAYLOAD)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+"""
+测试ECS节点指标的批量查询与逐个查询的结果一致
+"""
+
+import os
+import sys
+import unittest
+
+# notebook 下的模块按顶层模块相互导入（与 main.py 的运行方式一致）
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from test_get_entity import NORMAL_END, NORMAL_START, StandinCmsTester
+
+INSTANCES = ["i-m5ec00yjg8kxv34hyr0k", "i-m5e1ad1f2ewelwi8dr4a"]
+
+
+class TestEcsMetrics(unittest.TestCase):
+
+    def setUp(self):
+        import get_ecs
+        import get_prom
+
+        self.get_ecs = get_ecs
+        self.get_prom = get_prom
+        self.tester = StandinCmsTester()
+        for module in (get_ecs, get_prom):
+            self.addCleanup(setattr, module, "cms_tester", module.cms_tester)
+            module.cms_tester = self.tester
+
+    def test_node_metrics_batch_matches_single_queries(self):
+        analyzers = {"cpu": self.get_ecs.analyze_ecs_cpu, "memory": self.get_ecs.analyze_ecs_memory,
+                     "disk": self.get_ecs.analyze_ecs_disk}
+        for kind, metric in self.get_ecs.ECS_METRICS.items():
+            batch = self.get_ecs.get_ecs_metric(NORMAL_START, NORMAL_END, INSTANCES, metric)
+            self.assertEqual(sorted(batch), sorted(INSTANCES))
+            for instance in INSTANCES:
+                self.assertEqual(analyzers[kind](NORMAL_START, NORMAL_END, instance, False, series=batch[instance]),
+                                 analyzers[kind](NORMAL_START, NORMAL_END, instance, False))
+
+    def test_network_series_in_one_query(self):
+        series = self.get_prom.get_network_series(NORMAL_START, NORMAL_END, INSTANCES)
+        self.assertEqual(self.tester.queries, 1)
+        for instance in INSTANCES:
+            self.assertEqual(sorted(series[instance]), sorted(self.get_prom.NETWORK_METRICS))
+            self.assertEqual(self.get_prom.analyze_network(NORMAL_START, NORMAL_END, instance, False,
+                                                           series=series[instance]),
+                             self.get_prom.analyze_network(NORMAL_START, NORMAL_END, instance, False))
+        self.assertEqual(self.tester.queries, 1 + 4 * len(INSTANCES))
+
+    def test_ecs_stage_backend_calls(self):
+        import parallel_agent
+
+        # 灰色故障ECS阶段：3条 entity-set 查询加1条PromQL，与候选节点数无关
+        candidates = [instance + ".cpu" for instance in INSTANCES + ["i-m5e2fp2n7otqkyfbhu7f"]]
+        tasks = [(name, fn, args) for name, fn, args in
+                 parallel_agent.grey_failure_tasks(NORMAL_START, NORMAL_END, candidates) if name.startswith("ecs.")]
+        results = {name: fn(*args) for name, fn, args in tasks}
+        self.assertEqual(self.tester.queries, 4)
+        for instance in candidates:
+            instance = instance.split(".")[0]
+            self.get_ecs.analyze_ecs_cpu(NORMAL_START, NORMAL_END, instance, False,
+                                         series=results["ecs.cpu"].get(instance, ([], [])))
+            self.get_ecs.analyze_ecs_memory(NORMAL_START, NORMAL_END, instance, False,
+                                            series=results["ecs.memory"].get(instance, ([], [])))
+            self.get_ecs.analyze_ecs_disk(NORMAL_START, NORMAL_END, instance, False,
+                                          series=results["ecs.disk"].get(instance, ([], [])))
+            self.get_prom.analyze_network(NORMAL_START, NORMAL_END, instance, False,
+                                          series=results["ecs.network"].get(instance, {}))
+        self.assertEqual(self.tester.queries, 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+"""
+测试多个deployment的批量CMS查询与逐个查询的结果一致
+"""
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+from types import SimpleNamespace
+
+# notebook 下的模块按顶层模块相互导入（与 main.py 的运行方式一致）
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cms_standin import CmsStandinClient, SeriesSource
+
+NORMAL_START = datetime(2025, 9, 17, 10, 0, 0)
+NORMAL_END = datetime(2025, 9, 17, 10, 5, 0)
+
+
+class StandinCmsTester:
+    """按 CmsClient._execute_spl_query 的接口在本地CMS替身上回答查询，并记录查询次数"""
+
+    def __init__(self, source=None):
+        self.client = CmsStandinClient(source)
+        self.queries = 0
+
+    def _execute_spl_query(self, query, from_time, to_time):
+        self.queries += 1
+        header, data = self.client.execute(query, from_time, to_time)
+        return SimpleNamespace(header=header, data=data)
+
+
+class TestDeploymentMetric(unittest.TestCase):
+
+    def setUp(self):
+        import get_entity
+
+        self.get_entity = get_entity
+        self.tester = StandinCmsTester()
+        original = get_entity.cms_tester
+        get_entity.cms_tester = self.tester
+        self.addCleanup(setattr, get_entity, "cms_tester", original)
+
+    def test_batch_matches_single_queries(self):
+        services = ["cart", "ad", "checkout"]
+        for metric, analyze in ((self.get_entity.CPU_METRIC, self.get_entity.analyze_cpu),
+                                (self.get_entity.MEMORY_METRIC, self.get_entity.analyze_memory)):
+            batch = self.get_entity.get_deployment_metric(NORMAL_START, NORMAL_END, services, metric)
+            self.assertEqual(sorted(batch), sorted(services))
+            for service in services:
+                single = analyze(NORMAL_START, NORMAL_END, service, False)
+                self.assertEqual(analyze(NORMAL_START, NORMAL_END, service, False, series=batch[service]), single)
+
+    def test_one_query_per_metric(self):
+        self.get_entity.get_deployment_metric(NORMAL_START, NORMAL_END, ["cart", "ad", "cart"],
+                                              self.get_entity.CPU_METRIC)
+        self.assertEqual(self.tester.queries, 1)
+        self.assertEqual(self.get_entity.get_deployment_metric(NORMAL_START, NORMAL_END, [],
+                                                               self.get_entity.CPU_METRIC), {})
+        self.assertEqual(self.tester.queries, 1)
+
+    def test_unmatched_rows_are_skipped(self):
+        result = SimpleNamespace(header=["__labels__", "__name__", "__ts__", "__value__"],
+                                 data=[['{"deployment": "other"}', "m", "[1]", "[0.5]"],
+                                       ['{"deployment": "cart"}', "m", "[1758074400000000000]", "[0.25]"]])
+        series = self.get_entity.split_series_by_entity(result, ["cart", "ad"], "deployment")
+        self.assertEqual(list(series), ["cart"])
+        self.assertEqual(series["cart"][1], [0.25])
+
+
+class TestPodsComplete(unittest.TestCase):
+
+    def setUp(self):
+        import get_entity
+
+        self.get_entity = get_entity
+        start = int(NORMAL_START.timestamp())
+        # cart-1 在目标时段中途被终止，之后没有数据点
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False) as f:
+            f.write(json.dumps({"labels": {"name": "cart-1"}, "metric": "cpu_usage",
+                                "ts": list(range(start - 600, start + 120, 60)), "values": [0.1] * 12}) + "\n")
+        self.addCleanup(os.unlink, f.name)
+        self.tester = StandinCmsTester(SeriesSource(f.name))
+        self.addCleanup(setattr, get_entity, "cms_tester", get_entity.cms_tester)
+        get_entity.cms_tester = self.tester
+
+    def test_bulk_check_matches_get_pod(self):
+        pods = ["cart-0", "cart-1", "cart-2"]
+        complete = self.get_entity.check_pods_complete(NORMAL_START, NORMAL_END, pods)
+        self.assertEqual(complete, {"cart-0": True, "cart-1": False, "cart-2": True})
+        self.assertEqual(self.tester.queries, 1)
+        for pod in pods:
+            self.assertEqual(self.get_entity.get_pod(NORMAL_START, NORMAL_END, pod, False)[0], complete[pod])
+
+    def test_first_row_per_pod(self):
+        # 同一个pod有多行黄金指标时与 get_pod 一样只看第一行
+        header = ["__ts__", "__entity_id__", "cpu"]
+        data = [[json.dumps([1, 2, 3]), "cart-0", "[]"], [json.dumps(list(range(30))), "cart-0", "[]"]]
+        tester = SimpleNamespace(_execute_spl_query=lambda *args, **kwargs: SimpleNamespace(header=header, data=data))
+        self.get_entity.cms_tester = tester
+        self.assertEqual(self.get_entity.count_pod_points(NORMAL_START, NORMAL_END, ["cart-0"]), (25, {"cart-0": 3}))
+        self.assertEqual(self.get_entity.check_pods_complete(NORMAL_START, NORMAL_END, ["cart-0"]), {"cart-0": False})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,191 @@
+"""
+测试批量时延查询与逐个服务查询的结果一致
+"""
+
+import os
+import sys
+import unittest
+from datetime import datetime, timedelta, timezone
+
+# notebook 下的模块按顶层模块相互导入（与 main.py 的运行方式一致）
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pandas as pd
+
+import sls_query
+from sls_query import phrase_match
+from sls_standin import _prepare, run_query
+
+NS = 1_000_000_000
+START = "2025-09-17 10:00:00"
+END = "2025-09-17 10:05:00"
+
+
+def make_spans():
+    """目标时段内 cart 的时延上升三倍，其余服务保持平稳"""
+    start = datetime.strptime(START, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone(timedelta(hours=8)))
+    rows = []
+    for minute in range(-12, 18):
+        ts = int((start + timedelta(minutes=minute)).timestamp()) * NS
+        in_target = 0 <= minute < 5
+        for service, duration in (("cart", 100), ("cart-worker", 40), ("frontend", 200), ("frontend-proxy", 10)):
+            if service == "cart" and in_target:
+                duration *= 3
+            for offset in range(4):
+                rows.append({"serviceName": service, "startTime": ts + offset * NS, "duration": duration + offset * 2})
+    return _prepare(pd.DataFrame(rows))
+
+
+class _Log:
+    def __init__(self, contents):
+        self.contents = contents
+
+    def get_contents(self):
+        return self.contents
+
+
+class _Response:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def get_logs(self):
+        return [_Log(row) for row in self.rows]
+
+
+class StandinLogClient:
+    """在本地SLS替身的查询计算上回答 get_logs，并记录查询次数"""
+
+    def __init__(self, df):
+        self.df = df
+        self.queries = 0
+
+    def get_logs(self, request):
+        self.queries += 1
+        rows, _ = run_query(self.df, request.get_query(), request.get_from(), request.get_to())
+        return _Response(rows)
+
+
+FRONTEND_METHODS = ["grpc.oteldemo.ProductCatalogService/GetProduct", "grpc.oteldemo.CartService/GetCart",
+                    "grpc.oteldemo.CurrencyService/GetSupportedCurrencies",
+                    "grpc.oteldemo.RecommendationService/ListRecommendations", "grpc.oteldemo.AdService/GetAds"]
+
+
+def make_frontend_spans(slow_methods):
+    """frontend 对下游方法的调用，slow_methods 中的方法在目标时段内变慢"""
+    start = datetime.strptime(START, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone(timedelta(hours=8)))
+    rows = []
+    for minute in range(-12, 18):
+        ts = int((start + timedelta(minutes=minute)).timestamp()) * NS
+        for method in FRONTEND_METHODS:
+            duration = 100
+            if method in slow_methods and 0 <= minute < 5:
+                duration = 400
+            rows.append({"serviceName": "frontend", "spanName": method, "startTime": ts, "duration": duration})
+            rows.append({"serviceName": "frontend-proxy", "spanName": method, "startTime": ts, "duration": 1})
+    return _prepare(pd.DataFrame(rows))
+
+
+class TestPhraseMatch(unittest.TestCase):
+
+    def test_sls_tokens(self):
+        self.assertTrue(phrase_match("Cart", "cart"))
+        self.assertTrue(phrase_match("/oteldemo.CartService/GetCart", "/oteldemo.CartService/GetCart"))
+        self.assertFalse(phrase_match("frontend-proxy", "frontend"))
+        self.assertFalse(phrase_match("cart", "cart-worker"))
+
+
+class TestGetLogBatch(unittest.TestCase):
+
+    def setUp(self):
+        try:
+            import aliyun.log  # noqa: F401
+        except ImportError:
+            self.skipTest("缺少依赖 aliyun-log-python-sdk")
+        self.client = StandinLogClient(make_spans())
+
+    def test_batch_matches_single_queries(self):
+        from get_log import get_log, get_log_batch
+
+        services = ["cart", "frontend", "cart-worker"]
+        for is_median in (True, False):
+            batch = get_log_batch(self.client, "p", "logstore-tracing", services, START, END, is_median)
+            self.assertEqual(list(batch), services)
+            for service in services:
+                self.assertEqual(batch[service], get_log(self.client, "p", "logstore-tracing", service,
+                                                         START, END, is_median))
+        self.assertTrue(batch["cart"][0])
+        self.assertFalse(batch["frontend"][0])
+
+    def test_one_query_for_all_services(self):
+        from get_log import get_log_batch
+
+        get_log_batch(self.client, "p", "logstore-tracing", ["cart", "frontend", "cart"], START, END)
+        self.assertEqual(self.client.queries, 1)
+        self.assertEqual(get_log_batch(self.client, "p", "logstore-tracing", [], START, END), {})
+        self.assertEqual(self.client.queries, 1)
+
+
+class TestGetSpanLatency(unittest.TestCase):
+
+    def setUp(self):
+        try:
+            import aliyun.log  # noqa: F401
+        except ImportError:
+            self.skipTest("缺少依赖 aliyun-log-python-sdk")
+
+    def test_all_methods_slower(self):
+        from get_log import get_span_latency
+
+        client = StandinLogClient(make_frontend_spans(slow_methods=FRONTEND_METHODS))
+        self.assertTrue(get_span_latency(client, "p", "logstore-tracing", "frontend", START, END))
+        self.assertEqual(client.queries, 1)
+
+    def test_one_method_not_slower(self):
+        from get_log import get_span_latency
+
+        client = StandinLogClient(make_frontend_spans(slow_methods=FRONTEND_METHODS[1:]))
+        self.assertFalse(get_span_latency(client, "p", "logstore-tracing", "frontend", START, END))
+
+
+class TestWindowStats(unittest.TestCase):
+    """时段统计模式与逐点取回后在本地统计的结果一致"""
+
+    def setUp(self):
+        try:
+            import aliyun.log  # noqa: F401
+        except ImportError:
+            self.skipTest("缺少依赖 aliyun-log-python-sdk")
+        self.client = StandinLogClient(make_spans())
+        self.addCleanup(setattr, sls_query, "SLS_WINDOW_STATS", sls_query.SLS_WINDOW_STATS)
+
+    def test_latency_window_stats(self):
+        from get_log import get_log, get_log_batch
+
+        services = ["cart", "frontend", "cart-worker"]
+        for is_median in (True, False):
+            sls_query.SLS_WINDOW_STATS = False
+            expected = {service: get_log(self.client, "p", "logstore-tracing", service, START, END, is_median)
+                        for service in services}
+            sls_query.SLS_WINDOW_STATS = True
+            batch = get_log_batch(self.client, "p", "logstore-tracing", services, START, END, is_median)
+            for service in services:
+                single = get_log(self.client, "p", "logstore-tracing", service, START, END, is_median)
+                self.assertEqual(batch[service][:4], expected[service][:4])
+                self.assertEqual(single[:4], expected[service][:4])
+                self.assertEqual(batch[service][4], list(expected[service][1:4]))
+
+    def test_error_window_stats(self):
+        from get_error import get_error
+
+        df = make_spans()
+        df["statusCode"] = (df["duration"] > 250).astype(int) * 2
+        client = StandinLogClient(df)
+        sls_query.SLS_WINDOW_STATS = False
+        expected = get_error(client, "p", "logstore-tracing", "cart", START, END)
+        sls_query.SLS_WINDOW_STATS = True
+        self.assertEqual(get_error(client, "p", "logstore-tracing", "cart", START, END), expected)
+        self.assertTrue(expected[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+"""
+测试JVM指标的批量查询与一次性异常检测
+"""
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+# notebook 下的模块按顶层模块相互导入（与 main.py 的运行方式一致）
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cms_standin import SeriesSource
+from test_get_entity import NORMAL_END, NORMAL_START, StandinCmsTester
+
+SERVICES = ["ad", "fraud-detection", "inventory"]
+
+
+class TestJvmMetrics(unittest.TestCase):
+
+    def setUp(self):
+        import get_prom
+
+        self.get_prom = get_prom
+        start = int((NORMAL_START - timedelta(minutes=10)).timestamp())
+        end = int((NORMAL_END + timedelta(minutes=10)).timestamp())
+        ts = list(range(start, end + 1, 60))
+        # ad 在目标时段内GC次数明显上升
+        gc = [10.0 if NORMAL_START.timestamp() < t <= NORMAL_END.timestamp() else 2.0 for t in ts]
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False) as f:
+            f.write(json.dumps({"labels": {"service": "ad"}, "metric": "arms_jvm_gc_delta",
+                                "ts": ts, "values": gc}) + "\n")
+        self.addCleanup(os.unlink, f.name)
+        self.tester = StandinCmsTester(SeriesSource(f.name))
+        self.addCleanup(setattr, get_prom, "cms_tester", get_prom.cms_tester)
+        get_prom.cms_tester = self.tester
+
+    def test_jvm_services(self):
+        candidates = ["ad.LargeGc", "ad.cpu", "ad.jvmChaos", "fraud-detection.jvmChaos", "inventory.jvmChaos",
+                      "cart.cpu"]
+        self.assertEqual(self.get_prom.jvm_services(candidates), SERVICES)
+        # 与原先只检查 inventory 的GC一致，inventory 没有JVM类候选根因时也检查
+        self.assertEqual(self.get_prom.jvm_services(["ad.LargeGc", "cart.cpu"]), ["ad", "inventory"])
+        self.assertEqual(self.get_prom.jvm_faults(["cart.cpu"]), {"inventory": ["jvmChaos"]})
+
+    def test_one_query_per_metric(self):
+        series = self.get_prom.get_jvm_metrics(NORMAL_START, NORMAL_END, SERVICES)
+        self.assertEqual(self.tester.queries, len(self.get_prom.JVM_METRICS))
+        for service in SERVICES:
+            self.assertEqual(sorted(series[service]), sorted(self.get_prom.JVM_METRICS))
+        self.assertEqual(self.get_prom.get_jvm_metrics(NORMAL_START, NORMAL_END, []), {})
+
+    def test_vectorised_detection_matches_detect_anomaly(self):
+        series = self.get_prom.get_jvm_metrics(NORMAL_START, NORMAL_END, SERVICES)
+        anomalies = self.get_prom.detect_jvm_anomalies(NORMAL_START, NORMAL_END, series)
+        pre10_end = datetime.fromtimestamp(int(NORMAL_START.timestamp()))
+        normal_end = datetime.fromtimestamp(int(NORMAL_END.timestamp()))
+        for service in SERVICES:
+            for kind, (timestamps, values) in series[service].items():
+                pre, normal, post = self.get_prom.split_time_period_data(timestamps, values, pre10_end, normal_end)
+                factor, margin = self.get_prom.JVM_THRESHOLDS[kind]
+                expected = self.get_prom.detect_anomaly(normal, pre, post, factor)
+                if margin is None:
+                    # 只按相对倍数判断
+                    normal_avg, pre_avg, post_avg = expected[1:]
+                    expected = (normal_avg > (pre_avg + post_avg) / 2 * factor
+                                and pre_avg < normal_avg and post_avg < normal_avg,) + expected[1:]
+                self.assertEqual(anomalies[service][kind][0], expected[0])
+                for got, want in zip(anomalies[service][kind][1:], expected[1:]):
+                    self.assertAlmostEqual(got, want)
+        self.assertTrue(anomalies["ad"]["gc"][0])
+        self.assertFalse(anomalies["inventory"]["gc"][0])
+
+    def test_small_heap_and_thread_rise_not_flagged(self):
+        minutes = [NORMAL_START + timedelta(minutes=m) for m in range(-9, 15)]
+
+        def rising(base, step):
+            return [base + step if NORMAL_START < t <= NORMAL_END else base for t in minutes]
+
+        series = {"ad": {"gc": (minutes, rising(2.0, 30.0)),
+                         "heap": (minutes, rising(1e9, 1e6)),
+                         "threads": (minutes, rising(200.0, 21.0))}}
+        anomalies = self.get_prom.detect_jvm_anomalies(NORMAL_START, NORMAL_END, series)["ad"]
+        self.assertTrue(anomalies["gc"][0])
+        # 堆内存多1MB、线程数多21个都高于前后时段，但不算异常，因此只判为 LargeGc
+        self.assertFalse(anomalies["heap"][0])
+        self.assertFalse(anomalies["threads"][0])
+        self.assertEqual(self.get_prom.classify_jvm_fault(anomalies, ["LargeGc", "jvmChaos"]), "LargeGc")
+
+        series["ad"]["heap"] = (minutes, rising(1e9, 1e9))
+        anomalies = self.get_prom.detect_jvm_anomalies(NORMAL_START, NORMAL_END, series)["ad"]
+        self.assertTrue(anomalies["heap"][0])
+        self.assertEqual(self.get_prom.classify_jvm_fault(anomalies, ["LargeGc", "jvmChaos"]), "jvmChaos")
+
+    def test_faults_follow_candidates(self):
+        candidates = ["ad.LargeGc", "ad.jvmChaos", "fraud-detection.jvmChaos", "inventory.jvmChaos"]
+        faults = self.get_prom.jvm_faults(candidates)
+        self.assertEqual(faults, {"ad": ["LargeGc", "jvmChaos"], "fraud-detection": ["jvmChaos"],
+                                  "inventory": ["jvmChaos"]})
+        normal = (False, 1.0, 1.0, 1.0)
+        high = (True, 5.0, 1.0, 1.0)
+        gc_only = {"gc": high, "heap": normal, "threads": normal}
+        gc_and_heap = {"gc": high, "heap": high, "threads": normal}
+        classify = self.get_prom.classify_jvm_fault
+        # 只有GC异常为 LargeGc，堆内存/线程数同时升高为 jvmChaos
+        self.assertEqual(classify(gc_only, faults["ad"]), "LargeGc")
+        self.assertEqual(classify(gc_and_heap, faults["ad"]), "jvmChaos")
+        # 候选根因里只有 jvmChaos 的服务不会产生 LargeGc
+        self.assertEqual(classify(gc_only, faults["fraud-detection"]), "jvmChaos")
+        self.assertEqual(classify(gc_and_heap, ["LargeGc"]), "LargeGc")
+        self.assertIsNone(classify({"gc": normal, "heap": high}, faults["ad"]))
+        self.assertIsNone(classify(gc_only, []))
+
+        import parallel_agent
+        from collections import defaultdict
+
+        evidences = defaultdict(list)
+        jvm_list = parallel_agent.get_jvm_root_causes({"ad": gc_only, "inventory": gc_and_heap, "cart": gc_only},
+                                                      candidates, evidences)
+        self.assertEqual(jvm_list, ["ad.LargeGc", "inventory.jvmChaos"])
+        self.assertEqual(sorted(evidences), ["ad.LargeGc", "inventory.jvmChaos"])
+
+    def test_analyze_gc_with_batch_series(self):
+        series = self.get_prom.get_jvm_metric(NORMAL_START, NORMAL_END, SERVICES, self.get_prom.JVM_METRICS["gc"])
+        for service in SERVICES:
+            self.assertEqual(self.get_prom.analyze_gc(NORMAL_START, NORMAL_END, service, False, series=series[service]),
+                             self.get_prom.analyze_gc(NORMAL_START, NORMAL_END, service, False))
+
+
+if __name__ == "__main__":
+    unittest.main()
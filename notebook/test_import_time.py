@@ -0,0 +1,85 @@
+"""
+测试 main.py 的启动耗时
+
+用 `python -X importtime -c "import main"` 统计导入耗时，检查：
+1. 绘图、OpenAI客户端和阿里云SDK不会在启动时被导入（只在第一次使用时加载）
+2. main 的累计导入耗时不超过预算
+"""
+
+import os
+import subprocess
+import sys
+import unittest
+
+NOTEBOOK_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# main 的累计导入耗时预算（毫秒），可通过环境变量调整
+IMPORT_TIME_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "500"))
+
+# 只允许在第一次使用时才加载的重量级模块
+LAZY_MODULES = [
+    "matplotlib",
+    "openai",
+    "aliyun",
+    "aliyunsdkcore",
+    "aliyunsdksts",
+    "alibabacloud_cms20240330",
+    "alibabacloud_tea_openapi",
+    "alibabacloud_sts20150401",
+    "Tea",
+]
+
+
+def parse_importtime(stderr):
+    """
+    解析 -X importtime 的输出
+
+    Returns:
+        dict: {模块名: (self耗时us, 累计耗时us)}
+    """
+    timings = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # 表头行
+        module = fields[2].strip()
+        timings[module] = (int(fields[0]), int(fields[1]))
+    return timings
+
+
+class TestImportTime(unittest.TestCase):
+    """测试启动导入耗时"""
+
+    def setUp(self):
+        try:
+            import numpy  # noqa: F401
+        except ImportError:
+            self.skipTest("缺少依赖 numpy，请先执行 pip install -r requirements.txt")
+
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import main"],
+            cwd=NOTEBOOK_DIR,
+            capture_output=True,
+            text=True,
+            timeout=120,
+        )
+        self.assertEqual(completed.returncode, 0, completed.stderr[-2000:])
+        self.timings = parse_importtime(completed.stderr)
+
+    def test_heavy_modules_are_lazy(self):
+        """重量级依赖不应在启动时导入"""
+        imported = [module for module in LAZY_MODULES if module in self.timings]
+        self.assertEqual(imported, [], f"启动时导入了重量级模块: {imported}")
+
+    def test_import_time_budget(self):
+        """main 的累计导入耗时不超过预算"""
+        self.assertIn("main", self.timings)
+        cumulative_ms = self.timings["main"][1] / 1000
+        self.assertLessEqual(cumulative_ms, IMPORT_TIME_BUDGET_MS,
+                             f"import main 累计耗时 {cumulative_ms:.1f}ms 超过预算 {IMPORT_TIME_BUDGET_MS:.0f}ms")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+"""
+测试按后端的限流和AIMD并发调整
+"""
+
+import os
+import sys
+import threading
+import time
+import unittest
+from unittest import mock
+
+# notebook 下的模块按顶层模块相互导入（与 main.py 的运行方式一致）
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import limiter
+from limiter import EndpointLimiter, is_throttle_error
+
+
+class BackendError(Exception):
+    def __init__(self, code):
+        super().__init__("request failed")
+        self.code = code
+
+
+class TestLimiter(unittest.TestCase):
+
+    def test_throttle_errors(self):
+        self.assertTrue(is_throttle_error(BackendError("Throttling.User")))
+        self.assertTrue(is_throttle_error(BackendError(429)))
+        self.assertTrue(is_throttle_error(RuntimeError("ReadQuotaExceed: too many requests")))
+        self.assertFalse(is_throttle_error(BackendError("ParameterInvalid")))
+        self.assertFalse(is_throttle_error(RuntimeError("startTime in [1758034290 1758034429)")))
+
+    def test_additive_increase_multiplicative_decrease(self):
+        endpoint = EndpointLimiter("sls", rate=0, max_limit=8, initial_limit=4)
+        for _ in range(40):
+            with endpoint.slot():
+                pass
+        self.assertEqual(endpoint.snapshot()["limit"], 8)
+
+        with self.assertRaises(BackendError):
+            with endpoint.slot():
+                raise BackendError("Throttling")
+        self.assertEqual(endpoint.snapshot()["limit"], 4)
+        self.assertEqual(endpoint.snapshot()["throttled"], 1)
+
+        # 冷却时间内的第二次限流不再减半
+        with self.assertRaises(BackendError):
+            with endpoint.slot():
+                raise BackendError("Throttling")
+        self.assertEqual(endpoint.snapshot()["limit"], 4)
+
+        # 普通错误不调整上限
+        with self.assertRaises(ValueError):
+            with endpoint.slot():
+                raise ValueError("bad query")
+        self.assertEqual(endpoint.snapshot()["decreases"], 1)
+
+    def test_slow_responses_decrease_limit(self):
+        endpoint = EndpointLimiter("cms_entity", rate=0, max_limit=8, initial_limit=8)
+        with mock.patch.object(limiter, "QUERY_LATENCY_FLOOR", 0.01):
+            for latency in (0.001, 0.05):
+                endpoint.acquire()
+                endpoint.release(latency)
+        self.assertEqual(endpoint.snapshot()["limit"], 4)
+
+    def test_concurrency_bounded_by_limit(self):
+        endpoint = EndpointLimiter("sls", rate=0, max_limit=3, initial_limit=3)
+        peak = []
+        lock = threading.Lock()
+
+        def work():
+            with endpoint.slot():
+                with lock:
+                    peak.append(endpoint.in_flight)
+                time.sleep(0.01)
+
+        threads = [threading.Thread(target=work) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertLessEqual(max(peak), 3)
+        self.assertEqual(endpoint.snapshot()["in_flight"], 0)
+
+    def test_token_bucket_rate(self):
+        endpoint = EndpointLimiter("cms_metricstore", rate=100, max_limit=4)
+        started = time.monotonic()
+        for _ in range(130):
+            with endpoint.slot():
+                pass
+        # 桶里最初有100个令牌，其余30个按每秒100个补充
+        self.assertGreaterEqual(time.monotonic() - started, 0.25)
+
+    def test_endpoints(self):
+        self.assertEqual(limiter.cms_endpoint("\n .metricstore with(project='p') | prom-call ..."),
+                         limiter.CMS_METRICSTORE)
+        self.assertEqual(limiter.cms_endpoint(".entity_set with(domain='k8s') | entity-call ..."),
+                         limiter.CMS_ENTITY)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+"""
+测试边读边算时结果的写入时机
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+# notebook 下的模块按顶层模块相互导入（与 main.py 的运行方式一致）
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import main
+from results import ResultWriter, load_results
+
+
+def fake_analyze(problem_data, timeout=None):
+    return {"problem_id": problem_data["problem_id"], "root_causes": []}
+
+
+class TestAnalyzeStream(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.output = os.path.join(self.tmp_dir.name, "output.jsonl")
+
+    def wait_for_result(self, problem_id):
+        started = time.monotonic()
+        while time.monotonic() - started < 5:
+            if problem_id in load_results(self.output):
+                return True
+            time.sleep(0.01)
+        return False
+
+    def test_result_written_while_input_idle(self):
+        release = threading.Event()
+        written = []
+
+        def problems():
+            yield {"problem_id": "001"}
+            # 与 --follow 时一样，输入暂时没有新题目
+            written.append(self.wait_for_result("001"))
+            release.wait(5)
+            yield {"problem_id": "002"}
+
+        with mock.patch.object(main, "analyze_problem", side_effect=fake_analyze), \
+                ResultWriter(self.output) as writer:
+            reader = threading.Thread(target=lambda: written.append(main.analyze_stream(problems(), writer, workers=4)))
+            reader.start()
+            started = time.monotonic()
+            while not written and time.monotonic() - started < 5:
+                time.sleep(0.01)
+            release.set()
+            reader.join(5)
+        self.assertEqual(written, [True, 0])
+        self.assertEqual(list(load_results(self.output)), ["001", "002"])
+
+    def test_interrupted_drain_still_compacts(self):
+        def problems():
+            yield {"problem_id": "002"}
+            yield {"problem_id": "001"}
+
+        with mock.patch.object(main, "analyze_problem", side_effect=fake_analyze), \
+                mock.patch.object(main, "wait", side_effect=[KeyboardInterrupt]), \
+                ResultWriter(self.output) as writer:
+            writer.write({"problem_id": "001", "root_causes": []})
+            writer.write({"problem_id": "002", "root_causes": []})
+            with self.assertRaises(KeyboardInterrupt):
+                main.analyze_stream(problems(), writer, solved={"001", "002"})
+        # 再次 Ctrl+C 打断最后的等待时仍按输入顺序整理输出文件
+        self.assertEqual(list(load_results(self.output)), ["002", "001"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+"""
+测试空时序的负缓存
+"""
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+# notebook 下的模块按顶层模块相互导入（与 main.py 的运行方式一致）
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import negative_cache
+from negative_cache import NegativeCache
+from test_get_entity import NORMAL_END, NORMAL_START
+
+SOURCE = (("k8s", "k8s.deployment"), ("k8s", "k8s.metric.high_level_metric_deployment", "memory"), "deployment")
+
+
+class TestNegativeCache(unittest.TestCase):
+
+    def setUp(self):
+        self.addCleanup(setattr, negative_cache, "NEGATIVE_CACHE_ENABLED", negative_cache.NEGATIVE_CACHE_ENABLED)
+        self.addCleanup(setattr, negative_cache, "_cache", negative_cache._cache)
+        negative_cache.NEGATIVE_CACHE_ENABLED = True
+        negative_cache._cache = NegativeCache(ttl=600)
+        self.queries = []
+
+    def fetch(self, entities, from_time, to_time):
+        self.queries.append(list(entities))
+        return {entity: ([from_time], [1.0]) for entity in entities if entity != "email"}
+
+    def test_known_empty_entities_skipped(self):
+        result = negative_cache.fetch_series(SOURCE, ["cart", "email"], 1000, 2000, self.fetch)
+        self.assertEqual(list(result), ["cart"])
+
+        # 落在已记录时间窗内的请求不再带上 email
+        negative_cache.fetch_series(SOURCE, ["email", "ad"], 1200, 1800, self.fetch)
+        self.assertEqual(self.queries, [["cart", "email"], ["ad"]])
+
+        # 只请求已知为空的实体时不发出查询
+        self.assertEqual(negative_cache.fetch_series(SOURCE, ["email"], 1000, 2000, self.fetch), {})
+        self.assertEqual(len(self.queries), 2)
+        self.assertEqual(negative_cache.get_cache().hits, 2)
+
+        # 超出已记录时间窗时重新查询
+        negative_cache.fetch_series(SOURCE, ["email"], 1500, 2500, self.fetch)
+        self.assertEqual(self.queries[-1], ["email"])
+
+    def test_retried_after_cooldown(self):
+        negative_cache.fetch_series(SOURCE, ["email"], 1000, 2000, self.fetch)
+        with mock.patch.object(negative_cache.time, "monotonic", return_value=negative_cache.time.monotonic() + 601):
+            negative_cache.fetch_series(SOURCE, ["email"], 1000, 2000, self.fetch)
+        self.assertEqual(len(self.queries), 2)
+
+    def test_failures_not_cached(self):
+        self.assertIsNone(negative_cache.fetch_series(SOURCE, ["email"], 1000, 2000, lambda *args: None))
+        negative_cache.fetch_series(SOURCE, ["email"], 1000, 2000, self.fetch)
+        self.assertEqual(self.queries, [["email"]])
+
+    def test_empty_series_analyzed_without_special_case(self):
+        import get_entity
+
+        self.assertEqual(get_entity.analyze_memory(NORMAL_START, NORMAL_END, "email", False, series=([], [])),
+                         (False, 0, []))
+        self.assertEqual(get_entity.analyze_cpu(NORMAL_START, NORMAL_END, "email", False, series=([], [])),
+                         (False, 0, []))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+"""
+测试延迟分析流程的检测方式和不参与检测的指标
+"""
+
+import os
+import sys
+import threading
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+# notebook 下的模块按顶层模块相互导入（与 main.py 的运行方式一致）
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import parallel_agent
+
+NORMAL_START = datetime(2025, 9, 17, 10, 0, tzinfo=timezone(timedelta(hours=8)))
+NORMAL_END = NORMAL_START + timedelta(minutes=5)
+
+
+class TestExcludedSeries(unittest.TestCase):
+
+    def test_email_memory_and_latency_skipped(self):
+        memory_services = []
+
+        def analyze_memory(normal_start, normal_end, service, show, series=None):
+            memory_services.append(service)
+            return True, 90.0, [90.0]
+
+        def get_log_batch(log_client, project, logstore, services, start, end, isMedian=True, upper=True):
+            return {service: (True, 10, 100, 10, []) for service in services}
+
+        with mock.patch.object(parallel_agent, "get_log_batch", side_effect=get_log_batch), \
+                mock.patch.object(parallel_agent, "get_deployment_metric", return_value={}), \
+                mock.patch.object(parallel_agent, "analyze_cpu", return_value=(False, 0, [])), \
+                mock.patch.object(parallel_agent, "analyze_memory", side_effect=analyze_memory), \
+                mock.patch.object(parallel_agent, "get_jvm_metrics", return_value={}):
+            root_causes, _, _ = parallel_agent.analyze_latency_problem(
+                NORMAL_START, NORMAL_END, ["email.cpu", "email.memory", "email.networkLatency", "cart.cpu",
+                                           "cart.memory"])
+        # email 的内存序列再高也不读取，时延随内存一起跳过
+        self.assertEqual(memory_services, ["cart"])
+        self.assertEqual(root_causes, ["cart.memory"])
+        self.assertTrue(parallel_agent.is_excluded("email", "memory"))
+        self.assertFalse(parallel_agent.is_excluded("email", "cpu"))
+
+
+class TestQueryThreads(unittest.TestCase):
+
+    def test_detection_runs_on_calling_thread(self):
+        threads = set()
+
+        def analyze_cpu(normal_start, normal_end, service, show, upper=True, series=None):
+            if series is not None:
+                threads.add(threading.current_thread())
+            return False, 0, []
+
+        with mock.patch.object(parallel_agent, "get_log_batch",
+                               side_effect=lambda *args, **kwargs: {"cart": (False, 0, 0, 0, [])}), \
+                mock.patch.object(parallel_agent, "get_deployment_metric", return_value={}), \
+                mock.patch.object(parallel_agent, "analyze_cpu", side_effect=analyze_cpu), \
+                mock.patch.object(parallel_agent, "analyze_memory", return_value=(False, 0, [])), \
+                mock.patch.object(parallel_agent, "get_jvm_metrics", return_value={}):
+            parallel_agent.analyze_latency_problem(NORMAL_START, NORMAL_END, ["cart.cpu"])
+        # 查询线程只执行查询，检测批量查询取回的序列时不占用查询线程
+        self.assertEqual(threads, {threading.current_thread()})
+
+
+if __name__ == "__main__":
+    unittest.main()
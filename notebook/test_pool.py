@@ -0,0 +1,59 @@
+"""
+测试单题截止时间对单次查询的限制
+"""
+
+import os
+import sys
+import time
+import unittest
+
+# notebook 下的模块按顶层模块相互导入（与 main.py 的运行方式一致）
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from pool import Deadline, as_completed_until, call_until, query_executor, remaining
+
+
+def slow(value, seconds):
+    time.sleep(seconds)
+    return value
+
+
+class TestCallUntil(unittest.TestCase):
+
+    def test_returns_result_in_time(self):
+        deadline = Deadline(5)
+        self.assertEqual(call_until(deadline, None, slow, "ok", 0.01), "ok")
+        self.assertFalse(deadline.partial)
+        self.assertEqual(call_until(None, None, slow, "ok", 0.01), "ok")
+
+    def test_slow_call_abandoned_at_deadline(self):
+        deadline = Deadline(0.1)
+        started = time.monotonic()
+        self.assertEqual(call_until(deadline, [], slow, "late", 1), [])
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertTrue(deadline.partial)
+
+    def test_errors_propagate(self):
+        def broken():
+            raise TimeoutError("socket timeout")
+
+        with self.assertRaises(TimeoutError):
+            call_until(Deadline(5), None, broken)
+
+    def test_worker_timeout_ends_iteration(self):
+        # 任务等待批量查询时自己先到达截止时间，抛出的 TimeoutError 不应传给调用方
+        deadline = Deadline(0.1)
+        with query_executor() as executor:
+            batch = executor.submit(slow, {}, 1)
+            futures = [executor.submit(lambda: batch.result(timeout=remaining(deadline))) for _ in range(4)]
+            results = [future.result() for future in as_completed_until(futures, deadline)]
+        self.assertEqual(results, [])
+        self.assertTrue(deadline.partial)
+
+    def test_remaining(self):
+        self.assertIsNone(remaining(None))
+        self.assertLessEqual(remaining(Deadline(2)), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+"""
+测试整批预取的查询规划
+"""
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+# notebook 下的模块按顶层模块相互导入（与 main.py 的运行方式一致）
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import parallel_agent
+import prefetch
+from get_ecs import get_ecs_metric
+from get_entity import get_deployment_metric
+from get_error import get_error
+from get_log import get_log_batch
+from get_prom import get_jvm_metric, get_network_series
+
+CANDIDATES = ["cart.cpu", "cart.memory", "ad.cpu", "ad.jvmChaos", "inventory.cpu", "inventory.jvmChaos",
+              "load-generator.cpu", "i-m5ec00yjg8kxv34hyr0n.cpu"]
+
+
+def make_problem(problem_id, rule, time_range="2025-09-17 10:00:00 ~ 2025-09-17 10:05:00"):
+    return {"problem_id": problem_id, "time_range": time_range, "candidate_root_causes": CANDIDATES,
+            "alarm_rules": [rule]}
+
+
+class TestPlan(unittest.TestCase):
+
+    def test_latency_problem(self):
+        tasks = prefetch.plan_problem(make_problem("001", "service_avg_rt"))
+        functions = [fn for fn, _ in tasks]
+        self.assertEqual(functions.count(get_deployment_metric), 2)
+        self.assertEqual(functions.count(get_jvm_metric), 3)
+        _, args = tasks[functions.index(get_log_batch)]
+        self.assertEqual(args[3:], (("cart", "ad", "inventory"), "2025-09-17 10:00:00", "2025-09-17 10:05:00"))
+        self.assertEqual(tasks[functions.index(get_jvm_metric)][1][2], ("ad", "inventory"))
+
+    def test_grey_and_error_problems(self):
+        problem = make_problem("002", "greyFailure")
+        problem["candidate_root_causes"] = CANDIDATES + ["checkout.cpu"]
+        grey = prefetch.plan_problem(problem)
+        # 与 analyze_grey_failure 注册的数据节点完全相同
+        normal_start, normal_end = prefetch.problem_window(problem)
+        tasks = parallel_agent.grey_failure_tasks(normal_start, normal_end, problem["candidate_root_causes"])
+        self.assertEqual(grey, [(fn, args) for _, fn, args in tasks])
+        functions = [fn for fn, _ in grey]
+        for fn in (get_ecs_metric, get_network_series, parallel_agent.count_killed_pods, get_jvm_metric,
+                   get_log_batch):
+            self.assertIn(fn, functions)
+        self.assertEqual(grey[functions.index(parallel_agent.count_killed_pods)][1][2], "checkout")
+        self.assertEqual(len(set(grey)), len(grey))
+        errors = prefetch.plan_problem(make_problem("003", "overall_error_count"))
+        self.assertEqual([(fn, args[3]) for fn, args in errors],
+                         [(get_error, "cart"), (get_error, "ad"), (get_error, "inventory")])
+        self.assertEqual(prefetch.plan_problem(make_problem("004", "unknown")), [])
+
+    def test_batch_plan_deduplicates(self):
+        problems = [make_problem("001", "service_avg_rt"), make_problem("002", "frontend_avg_rt"),
+                    make_problem("003", "greyFailure"),
+                    make_problem("004", "greyFailure", "2999-01-01 10:00:00 ~ 2999-01-01 10:05:00")]
+        # 延迟题共6组；灰色故障另有14组，其中 deployment 和JVM指标的5组与延迟题相同
+        self.assertEqual(len(prefetch.plan(problems)), 15)
+
+    def test_prefetch_runs_planned_tasks(self):
+        calls = []
+
+        def failing():
+            raise RuntimeError("boom")
+
+        tasks = [(calls.append, ("a",)), (calls.append, ("b",)), (failing, ())]
+        with mock.patch.object(prefetch, "plan", return_value=tasks), \
+                mock.patch.object(prefetch.query_cache, "get_cache", return_value=object()):
+            self.assertEqual(prefetch.prefetch([]), (3, 1))
+        self.assertEqual(sorted(calls), ["a", "b"])
+
+        with mock.patch.object(prefetch.query_cache, "get_cache", return_value=None), \
+                mock.patch.object(prefetch.series_cache, "SERIES_CACHE_ENABLED", False):
+            self.assertEqual(prefetch.prefetch([make_problem("001", "service_avg_rt")]), (0, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+"""
+测试题目输入的流式读取
+"""
+
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+# notebook 下的模块按顶层模块相互导入（与 main.py 的运行方式一致）
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from problems import iter_problems, read_input_data
+
+
+class TestIterProblems(unittest.TestCase):
+    """测试 iter_problems"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.input = os.path.join(self.tmp_dir.name, "input.jsonl")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_skips_blank_and_broken_lines(self):
+        with open(self.input, "w", encoding="utf-8") as f:
+            f.write('{"problem_id": "001"}\n\nnot json\n{"problem_id": "002"}\n')
+        self.assertEqual([p["problem_id"] for p in iter_problems(self.input)], ["001", "002"])
+
+    def test_missing_file(self):
+        self.assertEqual(read_input_data(os.path.join(self.tmp_dir.name, "missing.jsonl")), [])
+
+    def test_stdin(self):
+        with mock.patch("sys.stdin", io.StringIO('{"problem_id": "001"}\n{"problem_id": "002"}\n')):
+            self.assertEqual([p["problem_id"] for p in iter_problems("-")], ["001", "002"])
+
+    def test_follow_waits_for_complete_lines(self):
+        """follow 模式下追加到文件末尾的题目会被读到，写了一半的行等写完再产出"""
+        with open(self.input, "w", encoding="utf-8") as f:
+            f.write('{"problem_id": "001"}\n')
+
+        def append():
+            with open(self.input, "a", encoding="utf-8") as f:
+                f.write('{"problem_id": ')
+                f.flush()
+                time.sleep(0.05)
+                f.write('"002"}\n')
+
+        problems = iter_problems(self.input, follow=True, poll_interval=0.01)
+        self.assertEqual(next(problems)["problem_id"], "001")
+        writer = threading.Thread(target=append)
+        writer.start()
+        self.assertEqual(next(problems)["problem_id"], "002")
+        writer.join()
+        problems.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+"""
+测试SLS/CMS查询结果的本地缓存
+"""
+
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+# notebook 下的模块按顶层模块相互导入（与 main.py 的运行方式一致）
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import query_cache
+from query_cache import QueryCache, make_key, normalize_query
+
+
+class TestQueryCache(unittest.TestCase):
+    """测试 QueryCache"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "queries.sqlite")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_normalized_query_shares_key(self):
+        a = make_key(kind="sls", query=normalize_query("\n    * | select 1\n    "), from_time=1, to_time=2)
+        b = make_key(kind="sls", query=normalize_query("* |  select 1"), from_time=1, to_time=2)
+        c = make_key(kind="sls", query=normalize_query("* | select 1"), from_time=1, to_time=3)
+        self.assertEqual(a, b)
+        self.assertNotEqual(a, c)
+
+    def test_persists_across_instances(self):
+        cache = QueryCache(self.path)
+        cache.put("k", {"data": [["a", "1"]]})
+        cache.close()
+
+        cache = QueryCache(self.path)
+        self.assertEqual(cache.get("k"), {"data": [["a", "1"]]})
+        self.assertIsNone(cache.get("missing"))
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+        cache.close()
+
+    def test_ttl(self):
+        cache = QueryCache(self.path, ttl_seconds=60)
+        cache.put("k", {"v": 1})
+        with mock.patch("time.time", return_value=time.time() + 120):
+            self.assertIsNone(cache.get("k"))
+        cache.close()
+
+    def test_lru_eviction(self):
+        cache = QueryCache(self.path)
+        cache.put("old", {"v": os.urandom(16).hex()})
+        cache.put("new", {"v": os.urandom(512).hex()})
+        cache.get("old")  # old 变为最近访问
+        cache.max_bytes = cache.stats()["bytes"]
+        cache.put("newest", {"v": os.urandom(16).hex()})
+        self.assertIsNotNone(cache.get("old"))
+        self.assertIsNone(cache.get("new"))
+        self.assertGreaterEqual(cache.stats()["evictions"], 1)
+        cache.close()
+
+    def test_cached_skips_recent_windows(self):
+        cache = QueryCache(self.path)
+        calls = []
+
+        def loader():
+            calls.append(1)
+            return {"v": len(calls)}
+
+        with mock.patch.object(query_cache, "get_cache", return_value=cache):
+            old = time.time() - 3600
+            self.assertEqual(query_cache.cached("old", old, loader), {"v": 1})
+            self.assertEqual(query_cache.cached("old", old, loader), {"v": 1})
+            now = time.time()
+            self.assertEqual(query_cache.cached("now", now, loader), {"v": 2})
+            self.assertEqual(query_cache.cached("now", now, loader), {"v": 3})
+        cache.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
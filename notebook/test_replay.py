@@ -0,0 +1,110 @@
+"""
+测试SLS/CMS查询的录制与回放
+"""
+
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+# notebook 下的模块按顶层模块相互导入（与 main.py 的运行方式一致）
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+try:
+    from aliyun.log import GetLogsRequest, GetLogsResponse
+    from alibabacloud_cms20240330 import models as cms_20240330_models
+except ImportError:
+    GetLogsRequest = None
+
+import query_cache
+import replay
+from session import CmsClient, SlsClient
+
+
+class FakeLogClient:
+    def __init__(self):
+        self.calls = 0
+
+    def get_logs(self, request):
+        self.calls += 1
+        return GetLogsResponse({"meta": {"progress": "Complete"},
+                                "data": [{"__time__": "1", "serviceName": "cart"}]}, {})
+
+
+class FakeCmsSdkClient:
+    def __init__(self):
+        self.calls = 0
+
+    def get_entity_store_data_with_options(self, workspace, request, headers, runtime):
+        self.calls += 1
+        body = cms_20240330_models.GetEntityStoreDataResponseBody(header=["__ts__"], data=[["[1]"]])
+        return cms_20240330_models.GetEntityStoreDataResponse(body=body)
+
+
+class FakeSession:
+    def __init__(self):
+        self.log_client = FakeLogClient()
+        self.cms_client = FakeCmsSdkClient()
+
+    def sls_client(self):
+        return self.log_client
+
+    def cms_sdk_client(self):
+        return self.cms_client
+
+
+class OfflineSession:
+    """回放时不允许访问任何客户端"""
+
+    def sls_client(self):
+        raise AssertionError("回放时不应访问SLS")
+
+    def cms_sdk_client(self):
+        raise AssertionError("回放时不应访问CMS")
+
+
+class TestRecordReplay(unittest.TestCase):
+    """录制后回放得到相同结果，且不访问网络"""
+
+    def setUp(self):
+        if GetLogsRequest is None:
+            self.skipTest("缺少阿里云SDK，请先执行 pip install -r requirements.txt")
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_enabled = query_cache.QUERY_CACHE_ENABLED
+        query_cache.disable()
+
+    def tearDown(self):
+        replay.configure()
+        query_cache.QUERY_CACHE_ENABLED = self.cache_enabled
+        self.tmp_dir.cleanup()
+
+    def test_record_then_replay(self):
+        end = int(time.time()) - 3600
+        request = GetLogsRequest(project="p", logstore="l", query="* | select serviceName",
+                                 fromTime=end - 600, toTime=end)
+
+        replay.configure(record=self.tmp_dir.name)
+        session = FakeSession()
+        logs = SlsClient(session).get_logs(request).get_logs()
+        body = CmsClient(session)._execute_spl_query(".entity_set", end - 600, end)
+        self.assertEqual(session.log_client.calls, 1)
+        self.assertEqual(session.cms_client.calls, 1)
+        self.assertEqual(len(os.listdir(self.tmp_dir.name)), 2)
+
+        replay.configure(replay=self.tmp_dir.name)
+        offline = OfflineSession()
+        replayed_logs = SlsClient(offline).get_logs(request).get_logs()
+        replayed_body = CmsClient(offline)._execute_spl_query(".entity_set", end - 600, end)
+        self.assertEqual([log.get_contents() for log in replayed_logs], [log.get_contents() for log in logs])
+        self.assertEqual(replayed_body.data, body.data)
+
+        # 没有录制过的查询按失败处理
+        self.assertIsNone(CmsClient(offline)._execute_spl_query(".entity_set", end - 60, end))
+        other = GetLogsRequest(project="p", logstore="l", query="* | select 1", fromTime=end - 600, toTime=end)
+        with self.assertRaises(replay.ReplayMiss):
+            SlsClient(offline).get_logs(other)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,180 @@
+"""
+测试查询的重试、退避和对冲
+"""
+
+import os
+import sys
+import threading
+import time
+import unittest
+from unittest import mock
+
+# notebook 下的模块按顶层模块相互导入（与 main.py 的运行方式一致）
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import resilience
+
+
+class BackendError(Exception):
+    def __init__(self, code):
+        super().__init__(f"request failed: {code}")
+        self.code = code
+
+
+class TestRetry(unittest.TestCase):
+
+    def setUp(self):
+        self.addCleanup(resilience.reset_breakers)
+        patcher = mock.patch.object(resilience.time, "sleep")
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_retries_until_success(self):
+        calls = []
+
+        def fn():
+            calls.append(1)
+            if len(calls) < 3:
+                raise BackendError("InternalServerError")
+            return "ok"
+
+        self.assertEqual(resilience.call(fn, "sls", attempts=3), "ok")
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(self.sleep.call_count, 2)
+
+    def test_gives_up_after_attempts(self):
+        calls = []
+
+        def fn():
+            calls.append(1)
+            raise BackendError("InternalServerError")
+
+        with self.assertRaises(BackendError):
+            resilience.call(fn, "sls", attempts=3)
+        self.assertEqual(len(calls), 3)
+
+    def test_parameter_errors_not_retried(self):
+        calls = []
+
+        def fn():
+            calls.append(1)
+            raise BackendError("ParameterInvalid")
+
+        with self.assertRaises(BackendError):
+            resilience.call(fn, "cms_entity", attempts=3)
+        self.assertEqual(len(calls), 1)
+        self.sleep.assert_not_called()
+
+    def test_backoff_bounds(self):
+        for attempt in range(10):
+            bound = min(resilience.QUERY_BACKOFF_CAP_SECONDS, resilience.QUERY_BACKOFF_BASE_SECONDS * 2 ** attempt)
+            for _ in range(20):
+                self.assertTrue(0 <= resilience.backoff_delay(attempt) <= bound)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def setUp(self):
+        self.addCleanup(resilience.reset_breakers)
+        resilience.reset_breakers()
+        patcher = mock.patch.object(resilience.time, "sleep")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_opens_after_consecutive_failures(self):
+        calls = []
+
+        def failing():
+            calls.append(1)
+            raise BackendError("InternalServerError")
+
+        for _ in range(resilience.BREAKER_FAILURES):
+            with self.assertRaises(BackendError):
+                resilience.call(failing, "cms_entity", attempts=1)
+        # 熔断后请求不再发出，也不重试
+        with self.assertRaises(resilience.CircuitOpen):
+            resilience.call(failing, "cms_entity", attempts=3)
+        self.assertEqual(len(calls), resilience.BREAKER_FAILURES)
+        # 其他后端不受影响
+        self.assertEqual(resilience.call(lambda: "ok", "sls"), "ok")
+
+    def test_half_open_probe(self):
+        breaker = resilience.CircuitBreaker("sls", failures=2, cooldown=0)
+        breaker.record_failure()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "open")
+        # 冷却后只放行一个试探请求
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "open")
+        self.assertTrue(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, "closed")
+        self.assertTrue(breaker.allow())
+
+    def test_parameter_errors_do_not_open(self):
+        def invalid():
+            raise BackendError("ParameterInvalid")
+
+        for _ in range(resilience.BREAKER_FAILURES + 1):
+            with self.assertRaises(BackendError):
+                resilience.call(invalid, "cms_entity")
+        self.assertEqual(resilience.get_breaker("cms_entity").state, "closed")
+
+
+class TestHedging(unittest.TestCase):
+
+    def setUp(self):
+        self.addCleanup(setattr, resilience, "QUERY_HEDGE", resilience.QUERY_HEDGE)
+        self.addCleanup(setattr, resilience, "_tracker", resilience._tracker)
+        resilience._tracker = resilience.LatencyTracker()
+
+    def test_slow_request_hedged(self):
+        resilience.enable_hedging()
+        for _ in range(resilience.HEDGE_MIN_SAMPLES):
+            resilience.call(lambda: None, "sls")
+
+        calls = []
+        lock = threading.Lock()
+
+        def fn():
+            with lock:
+                calls.append(1)
+                first = len(calls) == 1
+            # 第一次请求卡住，对冲请求立即返回
+            time.sleep(2 if first else 0)
+            return "hedge" if not first else "primary"
+
+        started = time.monotonic()
+        self.assertEqual(resilience.call(fn, "sls"), "hedge")
+        self.assertLess(time.monotonic() - started, 1.5)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual((resilience._tracker.hedges, resilience._tracker.hedge_wins), (1, 1))
+
+    def test_no_hedge_without_samples(self):
+        resilience.enable_hedging()
+        calls = []
+
+        def fn():
+            calls.append(1)
+            time.sleep(0.3)
+            return "primary"
+
+        self.assertEqual(resilience.call(fn, "cms_metricstore"), "primary")
+        self.assertEqual(len(calls), 1)
+
+
+class TestMissingResult(unittest.TestCase):
+
+    def test_get_result_none(self):
+        import get_ecs
+        import get_entity
+        import get_prom
+
+        for module in (get_entity, get_ecs, get_prom):
+            self.assertEqual(module.get_result(None), ([], []))
+
+
+if __name__ == "__main__":
+    unittest.main()
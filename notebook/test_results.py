@@ -0,0 +1,67 @@
+"""
+测试结果文件的流式写入与断点续跑
+"""
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+# notebook 下的模块按顶层模块相互导入（与 main.py 的运行方式一致）
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from results import ResultWriter, load_results, solved_problem_ids
+
+
+class TestResultWriter(unittest.TestCase):
+    """测试 ResultWriter"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.tmp_dir.name, "output.jsonl")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def read_lines(self):
+        with open(self.output, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def test_write_is_visible_immediately(self):
+        """每写一题，文件里立即可见"""
+        with ResultWriter(self.output) as writer:
+            writer.write({"problem_id": "002", "root_causes": ["a"]})
+            self.assertEqual(self.read_lines(), [{"problem_id": "002", "root_causes": ["a"]}])
+
+    def test_resume_after_crash(self):
+        """崩溃留下的半行被忽略，partial 结果需要重跑，compact 后按输入顺序输出"""
+        with open(self.output, "w", encoding="utf-8") as f:
+            f.write('{"problem_id": "003", "root_causes": ["c"]}\n')
+            f.write('{"problem_id": "001", "root_causes": [], "partial": true}\n')
+            f.write('{"problem_id": "002", "root_')
+
+        with ResultWriter(self.output, resume=True) as writer:
+            self.assertEqual(solved_problem_ids(writer.results), {"003"})
+            writer.write({"problem_id": "001", "root_causes": ["a"]})
+            writer.write({"problem_id": "002", "root_causes": ["b"]})
+            self.assertEqual(set(load_results(self.output)), {"001", "002", "003"})
+            writer.compact(["001", "002", "003"])
+
+        self.assertEqual(self.read_lines(), [
+            {"problem_id": "001", "root_causes": ["a"]},
+            {"problem_id": "002", "root_causes": ["b"]},
+            {"problem_id": "003", "root_causes": ["c"]},
+        ])
+
+    def test_without_resume_truncates(self):
+        """不带 --resume 时重新开始"""
+        with open(self.output, "w", encoding="utf-8") as f:
+            f.write('{"problem_id": "001", "root_causes": ["a"]}\n')
+        with ResultWriter(self.output) as writer:
+            self.assertEqual(writer.results, {})
+        self.assertEqual(self.read_lines(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+"""
+测试按时间区间缓存的时序只查询缺失的时间段，且拼接结果与直接查询一致
+"""
+
+import os
+import sys
+import unittest
+from datetime import datetime, timedelta, timezone
+
+# notebook 下的模块按顶层模块相互导入（与 main.py 的运行方式一致）
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import series_cache
+from series_cache import SeriesCache, _subtract
+from test_get_entity import NORMAL_END, NORMAL_START, StandinCmsTester
+
+
+class TestSubtract(unittest.TestCase):
+
+    def test_missing_segments(self):
+        self.assertEqual(_subtract(0, 600, [], 60), [(0, 600)])
+        self.assertEqual(_subtract(0, 600, [(120, 240)], 60), [(0, 60), (300, 600)])
+        self.assertEqual(_subtract(0, 600, [(0, 240), (360, 600)], 60), [(300, 300)])
+        self.assertEqual(_subtract(120, 240, [(0, 600)], 60), [])
+
+
+class TestSeriesCache(unittest.TestCase):
+
+    def setUp(self):
+        import get_entity
+
+        self.get_entity = get_entity
+        self.tester = StandinCmsTester()
+        self.addCleanup(setattr, get_entity, "cms_tester", get_entity.cms_tester)
+        get_entity.cms_tester = self.tester
+        self.addCleanup(setattr, series_cache, "SERIES_CACHE_ENABLED", series_cache.SERIES_CACHE_ENABLED)
+        self.addCleanup(setattr, series_cache, "_cache", series_cache._cache)
+        series_cache._cache = SeriesCache()
+
+    def fetch(self, start, end, services):
+        return self.get_entity.get_deployment_metric(start, end, services, self.get_entity.CPU_METRIC)
+
+    def test_overlapping_windows_fetch_only_missing_minutes(self):
+        windows = [(NORMAL_START, NORMAL_END),
+                   (NORMAL_START + timedelta(minutes=7, seconds=30), NORMAL_END + timedelta(minutes=9)),
+                   (NORMAL_START + timedelta(minutes=2), NORMAL_END - timedelta(minutes=1))]
+        services = ["cart", "ad"]
+        series_cache.SERIES_CACHE_ENABLED = False
+        expected = [self.fetch(start, end, services) for start, end in windows]
+        series_cache.SERIES_CACHE_ENABLED = True
+        self.tester.queries = 0
+
+        self.assertEqual(self.fetch(*windows[0], services), expected[0])
+        self.assertEqual(self.tester.queries, 1)
+        # 第二个时间窗只查询超出第一个时间窗的部分，两个服务合并为一次查询
+        self.assertEqual(self.fetch(*windows[1], services), expected[1])
+        self.assertEqual(self.tester.queries, 2)
+        # 完全被覆盖的时间窗不再查询
+        self.assertEqual(self.fetch(*windows[2], services), expected[2])
+        self.assertEqual(self.tester.queries, 2)
+        self.assertGreater(series_cache.get_cache().reused_minutes, 0)
+
+        # 新加入的服务单独查询完整时间窗，之后再查它也走缓存
+        self.assertEqual(self.fetch(*windows[0], services + ["checkout"]),
+                         {**expected[0], **self.get_entity.get_deployment_metric(
+                             *windows[0], ["checkout"], self.get_entity.CPU_METRIC)})
+        self.assertEqual(self.tester.queries, 3)
+
+    def test_single_minute_gap_queried_with_one_step(self):
+        calls = []
+
+        def fetch(entities, from_time, to_time):
+            # 与后端一样，from == to 的查询不返回任何点
+            calls.append((from_time, to_time))
+            minutes = range(from_time, to_time + 1, 60) if from_time < to_time else []
+            points = [datetime.fromtimestamp(t, tz=timezone.utc) for t in minutes]
+            return {entity: (points, [t / 60 for t in minutes]) for entity in entities}
+
+        series_cache.SERIES_CACHE_ENABLED = True
+        series_cache.fetch_series("cpu", ["cart"], 0, 240, fetch)
+        series_cache.fetch_series("cpu", ["cart"], 360, 600, fetch)
+        timestamps, values = series_cache.fetch_series("cpu", ["cart"], 0, 600, fetch)["cart"]
+        # 只缺 300 这一分钟，向前多查一个步长
+        self.assertEqual(calls[-1], (240, 300))
+        self.assertEqual(values, [t / 60 for t in range(0, 601, 60)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+"""
+测试STS凭证的获取和刷新
+"""
+
+import os
+import sys
+import threading
+import time
+import unittest
+from unittest import mock
+
+# notebook 下的模块按顶层模块相互导入（与 main.py 的运行方式一致）
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import session
+from session import SessionManager
+
+
+class TestCredentials(unittest.TestCase):
+
+    def setUp(self):
+        self.manager = SessionManager()
+        self.addCleanup(self.manager.close)
+
+    def test_refresh_does_not_block_readers(self):
+        started = threading.Event()
+        release = threading.Event()
+        tokens = iter(["first", "second"])
+
+        def assume_role():
+            token = next(tokens)
+            if token == "second":
+                started.set()
+                release.wait(5)
+            return "ak", "sk", token
+
+        with mock.patch.object(session, "get_sts_credentials", side_effect=assume_role):
+            self.assertEqual(self.manager.credentials(), ("ak", "sk", "first"))
+            refresher = threading.Thread(target=self.manager.refresh)
+            refresher.start()
+            self.assertTrue(started.wait(5))
+            # AssumeRole 进行中，其他线程仍立即拿到旧凭证
+            begin = time.monotonic()
+            self.assertEqual(self.manager.credentials(), ("ak", "sk", "first"))
+            self.assertLess(time.monotonic() - begin, 1)
+            release.set()
+            refresher.join()
+        self.assertEqual(self.manager.credentials(), ("ak", "sk", "second"))
+
+    def test_concurrent_callers_assume_role_once(self):
+        calls = []
+
+        def assume_role():
+            calls.append(1)
+            time.sleep(0.1)
+            return "ak", "sk", "token"
+
+        with mock.patch.object(session, "get_sts_credentials", side_effect=assume_role):
+            threads = [threading.Thread(target=self.manager.credentials) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(calls), 1)
+
+    def test_sts_failure(self):
+        with mock.patch.object(session, "get_sts_credentials", return_value=(None, None, None)), \
+                mock.patch.dict(os.environ, {"ALIBABA_CLOUD_ACCESS_KEY_ID": "main-ak",
+                                             "ALIBABA_CLOUD_ACCESS_KEY_SECRET": "main-sk"}):
+            with mock.patch.object(session, "STS_REQUIRED", True):
+                with self.assertRaises(RuntimeError):
+                    self.manager.credentials()
+            with mock.patch("builtins.print") as printed:
+                self.assertEqual(self.manager.credentials(), ("main-ak", "main-sk", None))
+            self.assertIn("主账号", printed.call_args[0][0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+"""
+测试本地SLS替身服务
+"""
+
+import os
+import sys
+import threading
+import unittest
+
+# notebook 下的模块按顶层模块相互导入（与 main.py 的运行方式一致）
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pandas as pd
+
+from sls_standin import StandinServer, run_query, _prepare
+
+NS = 1_000_000_000
+
+
+def make_spans():
+    base = 1758034800 * NS
+    rows = []
+    for minute in range(3):
+        for host, duration in (("cart-0", 100), ("cart-1", 300)):
+            rows.append({"serviceName": "cart", "spanName": "/oteldemo.CartService/GetCart", "hostname": host,
+                         "startTime": base + minute * 60 * NS, "duration": duration * (minute + 1),
+                         "statusCode": 2 if host == "cart-1" and minute == 2 else 0,
+                         "statusMessage": "14 UNAVAILABLE" if host == "cart-1" and minute == 2 else ""})
+    rows.append({"serviceName": "cart-worker", "spanName": "job", "hostname": "w-0", "startTime": base,
+                 "duration": 5, "statusCode": 0, "statusMessage": ""})
+    rows.append({"serviceName": "checkout", "spanName": "/oteldemo.CheckoutService/PlaceOrder",
+                 "hostname": "checkout-0", "startTime": base, "duration": 50, "statusCode": 0, "statusMessage": ""})
+    return _prepare(pd.DataFrame(rows))
+
+
+class TestRunQuery(unittest.TestCase):
+    """测试查询计算"""
+
+    def setUp(self):
+        self.df = make_spans()
+
+    def test_latency_by_minute(self):
+        start, end = 1758034800 * NS, 1758034980 * NS
+        rows, has_sql = run_query(self.df, f"""
+            ((serviceName : "cart") AND startTime in [{start} {end}) AND (spanName : "/oteldemo.CartService/GetCart"))
+            | SELECT avg(duration) as avg_duration, (startTime/1000000 -startTime/1000000 %(15000 * 4)) as date
+              FROM log GROUP BY date LIMIT 0, 999""")
+        self.assertTrue(has_sql)
+        self.assertEqual(rows, [
+            {"avg_duration": "200", "date": "1758034800000"},
+            {"avg_duration": "400", "date": "1758034860000"},
+            {"avg_duration": "600", "date": "1758034920000"},
+        ])
+
+    def test_phrase_match_uses_sls_tokens(self):
+        """与SLS默认分词一致，- 不是分词符，cart 不会匹配到 cart-worker"""
+        rows, _ = run_query(self.df, '(serviceName : "cart") | SELECT hostname, count(*) as invoke FROM log '
+                                     'GROUP BY hostname ORDER BY hostname')
+        self.assertEqual([row["hostname"] for row in rows], ["cart-0", "cart-1"])
+        rows, _ = run_query(self.df, '(spanName : "GetCart") | SELECT count(*) as c FROM log')
+        self.assertEqual(rows, [{"c": "6"}])
+
+    def test_error_info(self):
+        rows, _ = run_query(self.df, '(serviceName : "cart") AND statusCode>1 | SELECT statusmessage as info '
+                                     'FROM log group by info order by count(info) DESC LIMIT 0, 999')
+        self.assertEqual(rows, [{"info": "14 UNAVAILABLE"}])
+
+    def test_case_when_and_percentile(self):
+        rows, _ = run_query(self.df, '* | SELECT serviceName, sum(CASE WHEN statusCode > 1 THEN 1 ELSE 0 END) as err, '
+                                     'approx_percentile(duration, 0.5) as p50 FROM log '
+                                     'GROUP BY serviceName ORDER BY serviceName')
+        self.assertEqual(rows[0], {"serviceName": "cart", "err": "1", "p50": "300"})
+
+    def test_subquery(self):
+        rows, _ = run_query(self.df, '(serviceName : "cart") | SELECT CASE WHEN m < 1758034860000 THEN \'first\' '
+                                     'ELSE \'rest\' END as period, max(d) as peak FROM '
+                                     '(SELECT avg(duration) as d, (startTime/1000000 -startTime/1000000 %60000) as m '
+                                     'FROM log GROUP BY m) GROUP BY period ORDER BY period')
+        self.assertEqual(rows, [{"period": "first", "peak": "200"}, {"period": "rest", "peak": "600"}])
+
+    def test_empty_aggregate(self):
+        rows, _ = run_query(self.df, 'serviceName : "none" | SELECT avg(duration) as a, count(*) as c FROM log')
+        self.assertEqual(rows, [{"a": "null", "c": "0"}])
+
+
+class TestStandinServer(unittest.TestCase):
+    """通过SLS SDK访问替身服务"""
+
+    def test_get_logs_over_http(self):
+        try:
+            from aliyun.log import LogClient, GetLogsRequest
+        except ImportError:
+            self.skipTest("缺少依赖 aliyun-log-python-sdk")
+
+        server = StandinServer(("127.0.0.1", 0), {None: make_spans()})
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            client = LogClient(f"127.0.0.1:{server.server_address[1]}", "id", "secret")
+            client._isRowIp = True
+            request = GetLogsRequest(project="p", logstore="logstore-tracing", fromTime=1758034000, toTime=1758036000,
+                                     query='serviceName : "checkout" | SELECT count(*) as c FROM log')
+            logs = client.get_logs(request).get_logs()
+            self.assertEqual([log.get_contents() for log in logs], [{"c": "1"}])
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == "__main__":
+    unittest.main()
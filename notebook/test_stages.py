@@ -0,0 +1,97 @@
+"""
+测试按阶段回退的DAG执行器
+"""
+
+import os
+import sys
+import threading
+import time
+import unittest
+
+# notebook 下的模块按顶层模块相互导入（与 main.py 的运行方式一致）
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from pool import Deadline, query_executor
+from stages import StageGraph
+
+
+def slow(value, seconds=0.2):
+    time.sleep(seconds)
+    return value
+
+
+class TestStageGraph(unittest.TestCase):
+
+    def test_fetches_start_in_parallel(self):
+        with query_executor() as executor:
+            graph = StageGraph(executor)
+            for name in ("a", "b", "c"):
+                graph.data(name, slow, [])
+            graph.stage("first", lambda a: a, inputs=["a"])
+            graph.stage("second", lambda b: b, inputs=["b"], after=["first"])
+            graph.stage("third", lambda c: ["c.cpu"] + c, inputs=["c"], after=["second"])
+
+            started = time.monotonic()
+            self.assertEqual(graph.run(), ["c.cpu"])
+            # 三个阶段的数据同时获取，总耗时接近一次查询而不是三次之和
+            self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(graph.results, {"first": [], "second": [], "third": ["c.cpu"]})
+
+    def test_later_stages_skipped_after_result(self):
+        calls = []
+        release = threading.Event()
+
+        def blocked():
+            release.wait(5)
+            calls.append("late")
+            return []
+
+        with query_executor() as executor:
+            graph = StageGraph(executor)
+            graph.data("a", slow, ["a.memory"], 0)
+            graph.data("b", blocked)
+            graph.stage("first", lambda a: a, inputs=["a"])
+            graph.stage("second", lambda b: self.fail("不应执行"), inputs=["b"], after=["first"])
+            graph.stage("third", lambda: self.fail("不应执行"), after=["second"])
+            self.assertEqual(graph.run(), ["a.memory"])
+            release.set()
+        self.assertEqual(list(graph.results), ["first"])
+
+    def test_stage_errors_only_when_used(self):
+        def broken():
+            raise RuntimeError("query failed")
+
+        with query_executor() as executor:
+            graph = StageGraph(executor)
+            graph.data("a", slow, ["a.cpu"], 0)
+            graph.data("b", broken)
+            graph.stage("first", lambda a: a, inputs=["a"])
+            graph.stage("second", lambda b: b, inputs=["b"], after=["first"])
+            self.assertEqual(graph.run(), ["a.cpu"])
+
+            graph = StageGraph(executor)
+            graph.data("b", broken)
+            graph.stage("first", lambda b: b, inputs=["b"])
+            with self.assertRaises(RuntimeError):
+                graph.run()
+
+    def test_deadline(self):
+        deadline = Deadline(0.1)
+        with query_executor() as executor:
+            graph = StageGraph(executor, deadline)
+            graph.data("a", slow, [], 0.5)
+            graph.stage("first", lambda a: self.fail("不应执行"), inputs=["a"])
+            self.assertIsNone(graph.run())
+        self.assertTrue(deadline.partial)
+
+    def test_unknown_names_rejected(self):
+        with query_executor() as executor:
+            graph = StageGraph(executor)
+            with self.assertRaises(ValueError):
+                graph.stage("first", lambda: [], inputs=["missing"])
+            with self.assertRaises(ValueError):
+                graph.stage("second", lambda: [], after=["first"])
+
+
+if __name__ == "__main__":
+    unittest.main()
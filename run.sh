@@ -5,16 +5,28 @@ set -e
 INPUT_FILE=${1:-"input.jsonl"}
 OUTPUT_FILE=${2:-"output.jsonl"}
 TIMEOUT=${3:-300}
+WORKERS=${4:-1}
+# 第5个参数为 resume 时跳过输出文件中已完成的题目
+RESUME=${5:-""}
 
 echo "开始运行故障根因分析程序..."
 echo "输入文件: $INPUT_FILE"
 echo "输出文件: $OUTPUT_FILE"
 echo "超时时间: $TIMEOUT秒"
+echo "并行题目数: $WORKERS"
+
+RESUME_ARGS=()
+if [ "$RESUME" = "resume" ]; then
+    echo "断点续跑: 跳过已完成的题目"
+    RESUME_ARGS=(--resume)
+fi
 
 # 运行主程序
 python notebook/main.py \
     --input "$INPUT_FILE" \
     --output "$OUTPUT_FILE" \
-    --timeout "$TIMEOUT"
+    --timeout "$TIMEOUT" \
+    --workers "$WORKERS" \
+    "${RESUME_ARGS[@]}"
 
 echo "程序运行完成，结果已保存到$OUTPUT_FILE"
\ No newline at end of file